@@ -25,6 +25,21 @@ class _RemoteBaseTool(BaseTool):
             raise ValueError(json.dumps(data, ensure_ascii=False))
         return data
 
+    def _get_json(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.base_url}{path}"
+        response = requests.get(
+            url,
+            params={key: value for key, value in params.items() if value is not None},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict):
+            raise ValueError(f"Unexpected response: {data}")
+        if data.get("success") is False:
+            raise ValueError(json.dumps(data, ensure_ascii=False))
+        return data
+
 
 class _GetStateInput(BaseModel):
     agent_id: str = Field(..., description="账号 ID")
@@ -60,6 +75,10 @@ class _ActionInput(BaseModel):
         None,
         description="目标对象，repost/comment/like 为 uid/weibo_id，关注类为 uid",
     )
+    idempotency_key: Optional[str] = Field(
+        None,
+        description="幂等键，可选；重试同一个动作时传入相同的值可避免重复执行",
+    )
 
 
 class WeiboActionTool(_RemoteBaseTool):
@@ -73,6 +92,7 @@ class WeiboActionTool(_RemoteBaseTool):
         action_type: str,
         action_content: Optional[str] = None,
         target_object: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
     ) -> str:
         data = self._post_json(
             "/action",
@@ -81,6 +101,7 @@ class WeiboActionTool(_RemoteBaseTool):
                 "action_type": action_type,
                 "action_content": action_content,
                 "target_object": target_object,
+                "idempotency_key": idempotency_key,
             },
         )
         return json.dumps(data, ensure_ascii=False)
@@ -95,6 +116,10 @@ class _FeedbackInput(BaseModel):
         None,
         description="微博 ID，可选。提供时返回互动数据，缺省时返回粉丝变化。",
     )
+    full: Optional[bool] = Field(
+        None,
+        description="可选。获取粉丝变化时是否完整扫描粉丝列表，完整扫描才能发现取关。",
+    )
 
 
 class WeiboFeedbackTool(_RemoteBaseTool):
@@ -102,12 +127,13 @@ class WeiboFeedbackTool(_RemoteBaseTool):
     description: str = "通过后台获取粉丝变化或单条微博互动反馈。"
     args_schema: type[_FeedbackInput] = _FeedbackInput
 
-    def _run(self, agent_id: str, weibo_id: Optional[str] = None) -> str:
+    def _run(self, agent_id: str, weibo_id: Optional[str] = None, full: Optional[bool] = None) -> str:
         data = self._post_json(
             "/feedback",
             {
                 "agent_id": agent_id,
                 "weibo_id": weibo_id,
+                "full": full,
             },
         )
         return json.dumps(data.get("data"), ensure_ascii=False)
@@ -133,6 +159,34 @@ class WeiboRecordTool(_RemoteBaseTool):
         raise NotImplementedError("weibo_get_record 不支持异步。")
 
 
+class _SearchInput(BaseModel):
+    query: str = Field(..., description="检索词，多个词用空格分隔，需同时出现")
+    limit: int = Field(10, description="返回条数")
+    source: Optional[str] = Field(None, description="限定来源：text 为正文，comment 为评论，缺省时两者都查")
+    uid: Optional[str] = Field(None, description="限定微博作者 uid，可选")
+
+
+class WeiboSearchTool(_RemoteBaseTool):
+    name: str = "weibo_search"
+    description: str = "在已浏览过的微博正文和评论中全文检索，返回 uid/weibo_id 及原文，不需要重新抓取。"
+    args_schema: type[_SearchInput] = _SearchInput
+
+    def _run(self, query: str, limit: int = 10, source: Optional[str] = None, uid: Optional[str] = None) -> str:
+        data = self._get_json(
+            "/search",
+            {
+                "q": query,
+                "limit": limit,
+                "source": source,
+                "uid": uid,
+            },
+        )
+        return json.dumps(data.get("data"), ensure_ascii=False)
+
+    async def _arun(self, *args: Any, **kwargs: Any) -> str:
+        raise NotImplementedError("weibo_search 不支持异步。")
+
+
 class WeiboServiceToolkit:
     """
     返回一组调用后台服务的 LangChain 工具。
@@ -162,4 +216,5 @@ class WeiboServiceToolkit:
             WeiboActionTool(self.base_url, self.timeout),
             WeiboFeedbackTool(self.base_url, self.timeout),
             WeiboRecordTool(self.base_url, self.timeout),
+            WeiboSearchTool(self.base_url, self.timeout),
         ]
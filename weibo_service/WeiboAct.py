@@ -1,274 +1,175 @@
-import sqlite3
 import random
+import sqlite3
 from time import sleep
 
-POST, LIKE, COMMENT, REPOST, FOLLOW, UNFOLLOW = 1, 2, 3, 4, 5, 6
+from weibo_service.repository import (
+    BROWSE_HOMEPAGE,
+    BROWSE_HOT,
+    COMMENT,
+    FOLLOW,
+    LIKE,
+    POST,
+    REPOST,
+    UNFOLLOW,
+    action_item,
+    browse_items,
+    get_repository,
+)
+from weibo_service.detail_cache import COMMENTS, COUNTERS, FIELD_CLASSES, STATIC, get_detail_cache
+from weibo_service.engagement import engagement_items
+from weibo_service.idempotency import ActionLogError, request_done_item
+from weibo_service.search import search_items
+from weibo_service.writer import get_writer
+
+# 记录交给后台写入线程批量提交，请求不再等待数据库提交；
+# 带幂等键的动作与其结果在同一事务中同步提交
+def _log_action(action, info, time, action_content=None, object=None, object_content=None, idempotency_key=None):
+    item = action_item(
+        action,
+        info['account_id'],
+        info['username'],
+        time,
+        action_content,
+        object,
+        object_content,
+    )
+    if idempotency_key is None:
+        get_writer().submit([item])
+        return
 
-def post(bot, post_content):
+    try:
+        get_repository().write_batch([item, request_done_item(idempotency_key, info)])
+    except sqlite3.Error as e:
+        raise ActionLogError(str(e)) from e
+
+def _log_browses(bot, feeds):
+    """
+    feeds 为 [(微博详情列表, 浏览类型), ...]，每个信息流各写一行浏览记录，browse_time 为这次浏览的时间。
+
+    全文索引、互动观测和评论与浏览记录在同一批次中更新，只写入这次真正抓取到的字段类别：
+    沿用详情缓存的类别（info['cached']）在抓取时已经写入过，同时出现在多个信息流中的微博只在第一次出现时写入。
+    """
+    items, observed, seen = [], [], set()
+    for weibo_infos, browse_type in feeds:
+        for info in weibo_infos:
+            if info is None:
+                continue
+            key = (str(info['account_id']), str(info['weibo_id']))
+            reused = tuple(FIELD_CLASSES) if key in seen else tuple(info.get('cached') or ())
+            seen.add(key)
+            if COMMENTS in reused:
+                info = dict(info, comment=[])
+            items.extend(browse_items([info], bot.account_id, browse_type))
+            if len(reused) < len(FIELD_CLASSES):
+                observed.append((info, reused))
+
+    search = [dict(info, text='') if STATIC in reused else info for info, reused in observed]
+    engagement = [info for info, reused in observed if COUNTERS not in reused]
+    get_writer().submit(items + search_items(search) + engagement_items(engagement))
+
+
+def _refresher(bot, tabs=None):
+    """详情缓存中只有计数或评论过期时的刷新函数：计数过期时重新读取详情但不抓评论，评论过期时只抓评论。"""
+    def refresh(items):
+        results = [{} for _ in items]
+        counters = [index for index, (_, stale) in enumerate(items) if COUNTERS in stale]
+        if counters:
+            infos = bot.get_weibo_infos([items[index][0] for index in counters], max_num=0, tabs=tabs)
+            for index, info in zip(counters, infos):
+                results[index] = None if info is None else {name: info[name] for name in FIELD_CLASSES[COUNTERS]}
+
+        for index, (weibo, stale) in enumerate(items):
+            if COMMENTS in stale and results[index] is not None:
+                comments = bot.get_comments(weibo['account_id'], weibo['weibo_id'])
+                results[index] = None if comments is None else dict(results[index], comment=comments)
+        return results
+    return refresh
+
+def post(bot, post_content, idempotency_key=None):
     # sleep(random.uniform(5, 10))
     info = bot.post(post_content)
 
-    try:
-        conn = sqlite3.connect('WeiboAct.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ActionLog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action INTEGER,
-                uid VARCHAR(12),
-                user_name VARCHAR(30),
-                time TIMESTAMP,
-                action_content VARCHAR(2000),
-                object VARCHAR(12),
-                object_content VARCHAR(2000)
-            )
-        ''')
-
-        cursor.execute('''
-            INSERT INTO ActionLog 
-            (action, uid, user_name, time, action_content, object)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+    if info is not None:
+        _log_action(
             POST,
-            info['account_id'],
-            info['username'],
+            info,
             info['post_time'],
-            info['post_content'],
-            info['weibo_id'],
-        ))
- 
-        conn.commit()
-    except sqlite3.Error as e:
-        print("Database error:", e)
-        conn.rollback()
+            action_content=info['post_content'],
+            object=info['weibo_id'],
+            idempotency_key=idempotency_key,
+        )
 
-    finally:
-        cursor.close()
-        conn.close()
-    
     return info
 
-def repost(bot, repost_account_id, repost_weibo_id, repost_content=''):
+def repost(bot, repost_account_id, repost_weibo_id, repost_content='', idempotency_key=None):
     # sleep(random.uniform(5, 10))
     info = bot.repost(repost_account_id, repost_weibo_id, repost_content)
 
-    try:
-        conn = sqlite3.connect('WeiboAct.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ActionLog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action INTEGER,
-                uid VARCHAR(12),
-                user_name VARCHAR(30),
-                time TIMESTAMP,
-                action_content VARCHAR(2000),
-                object VARCHAR(12),
-                object_content VARCHAR(2000)
-            )
-        ''')
-
-        cursor.execute('''
-            INSERT INTO ActionLog 
-            (action, uid, user_name, time, action_content, object, object_content)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    if info is not None:
+        _log_action(
             REPOST,
-            info['account_id'],
-            info['username'],
+            info,
             info['repost_time'],
-            info['repost_content'],
-            info['repost_account_id'] + '/' + info['repost_weibo_id'],
-            info['weibo_content']
-        ))
+            action_content=info['repost_content'],
+            object=info['repost_account_id'] + '/' + info['repost_weibo_id'],
+            object_content=info['weibo_content'],
+            idempotency_key=idempotency_key,
+        )
 
-        conn.commit()
-    except sqlite3.Error as e:
-        print("Database error:", e)
-        conn.rollback()
-
-    finally:
-        cursor.close()
-        conn.close()
-    
     return info
-    
-def comment(bot, comment_account_id, comment_weibo_id, comment_content):
+
+def comment(bot, comment_account_id, comment_weibo_id, comment_content, idempotency_key=None):
     # sleep(random.uniform(5, 10))
     info = bot.comment(comment_account_id, comment_weibo_id, comment_content)
-    
-    try:
-        conn = sqlite3.connect('WeiboAct.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ActionLog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action INTEGER,
-                uid VARCHAR(12),
-                user_name VARCHAR(30),
-                time TIMESTAMP,
-                action_content VARCHAR(2000),
-                object VARCHAR(12),
-                object_content VARCHAR(2000)
-            )
-        ''')
-
-        cursor.execute('''
-            INSERT INTO ActionLog 
-            (action, uid, user_name, time, action_content, object, object_content)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+
+    if info is not None:
+        _log_action(
             COMMENT,
-            info['account_id'],
-            info['username'],
+            info,
             info['comment_time'],
-            info['comment_content'],
-            info['comment_account_id'] + '/' + info['comment_weibo_id'],
-            info['weibo_content']
-        ))
-
-        conn.commit()
-    
-    except sqlite3.Error as e:
-        print("Database error:", e)
-        conn.rollback()
-
-    finally:
-        cursor.close()
-        conn.close()
+            action_content=info['comment_content'],
+            object=info['comment_account_id'] + '/' + info['comment_weibo_id'],
+            object_content=info['weibo_content'],
+            idempotency_key=idempotency_key,
+        )
 
     return info
 
-def like(bot, like_account_id, like_weibo_id):
+def like(bot, like_account_id, like_weibo_id, idempotency_key=None):
     # sleep(random.uniform(5, 10))
     info = bot.like(like_account_id, like_weibo_id)
 
-    try:
-        conn = sqlite3.connect('WeiboAct.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ActionLog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action INTEGER,
-                uid VARCHAR(12),
-                user_name VARCHAR(30),
-                time TIMESTAMP,
-                action_content VARCHAR(2000),
-                object VARCHAR(12),
-                object_content VARCHAR(2000)
-            )
-        ''')
-
-        cursor.execute('''
-            INSERT INTO ActionLog 
-            (action, uid, user_name, time, object, object_content)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+    if info is not None:
+        _log_action(
             LIKE,
-            info['account_id'],
-            info['username'],
+            info,
             info['like_time'],
-            info['like_account_id'] + '/' + info['like_weibo_id'],
-            info['weibo_content']
-        ))
-
-        conn.commit()
-    
-    except sqlite3.Error as e:
-        print("Database error:", e)
-        conn.rollback()
-
-    finally:
-        cursor.close()
-        conn.close()
+            object=info['like_account_id'] + '/' + info['like_weibo_id'],
+            object_content=info['weibo_content'],
+            idempotency_key=idempotency_key,
+        )
 
     return info
 
-def follow(bot, follow_account_id):
+def follow(bot, follow_account_id, idempotency_key=None):
     # sleep(random.uniform(5, 10))
     info = bot.follow(follow_account_id)
 
-    try:
-        conn = sqlite3.connect('WeiboAct.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ActionLog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action INTEGER,
-                uid VARCHAR(12),
-                user_name VARCHAR(30),
-                time TIMESTAMP,
-                action_content VARCHAR(2000),
-                object VARCHAR(12),
-                object_content VARCHAR(2000)
-            )
-        ''')
-
-        cursor.execute('''
-            INSERT INTO ActionLog 
-            (action, uid, user_name, time, object)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            FOLLOW,
-            info['account_id'],
-            info['username'],
-            info['follow_time'],
-            info['follow_account_id'],
-        ))
-
-        conn.commit()
-    
-    except sqlite3.Error as e:
-        print("Database error:", e)
-        conn.rollback()
-
-    finally:
-        cursor.close()
-        conn.close()
+    if info is not None:
+        _log_action(
+            FOLLOW, info, info['follow_time'], object=info['follow_account_id'], idempotency_key=idempotency_key
+        )
 
     return info
 
-def unfollow(bot, unfollow_account_id):
+def unfollow(bot, unfollow_account_id, idempotency_key=None):
     # sleep(random.uniform(5, 10))
     info = bot.unfollow(unfollow_account_id)
 
-    try:
-        conn = sqlite3.connect('WeiboAct.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ActionLog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action INTEGER,
-                uid VARCHAR(12),
-                user_name VARCHAR(30),
-                time TIMESTAMP,
-                action_content VARCHAR(2000),
-                object VARCHAR(12),
-                object_content VARCHAR(2000)
-            )
-        ''')
-
-        cursor.execute('''
-            INSERT INTO ActionLog 
-            (action, uid, user_name, time, object)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            UNFOLLOW,
-            info['account_id'],
-            info['username'],
-            info['unfollow_time'],
-            info['unfollow_account_id'],
-        ))
-
-        conn.commit()
-    
-    except sqlite3.Error as e:
-        print("Database error:", e)
-        conn.rollback()
-
-    finally:
-        cursor.close()
-        conn.close()
+    if info is not None:
+        _log_action(
+            UNFOLLOW, info, info['unfollow_time'], object=info['unfollow_account_id'], idempotency_key=idempotency_key
+        )
 
     return info
 
@@ -276,133 +177,45 @@ def get_hot_weibos(bot, max_num=10):
     # sleep(random.uniform(5, 10))
     weibos = bot.get_hot_weibos(max_num=max_num)
 
-    weibo_infos = []
-    for weibo in weibos:
-        info = bot.get_weibo_info(weibo['account_id'], weibo['weibo_id'])
-        weibo_infos.append(info)
-    
-    for info in weibo_infos:
-        try:
-            conn = sqlite3.connect('WeiboAct.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS BrowseInformation (
-                    uid VARCHAR(12),
-                    weibo_id VARCHAR(12),
-                    user_name VARCHAR(30),
-                    user_tag VARCHAR(100),
-                    time TIMESTAMP,
-                    text VARCHAR(2000),
-                    img VARCHAR(200),
-                    video VARCHAR(200),
-                    repost VARCHAR(12),
-                    like VARCHAR(12),
-                    comment VARCHAR(12),
-                    comment_content VARCHAR(50000),
-                    browse_time TIMESTAMP,
-                    browser_uid VARCHAR(12),
-                    browse_type INTEGER,
-                    PRIMARY KEY(uid, weibo_id, browser_uid, browse_type)
-                )
-            ''')
-            cursor.execute('''
-                INSERT INTO BrowseInformation 
-                (uid, weibo_id, user_name, user_tag, time, text, img, video, repost, like, comment, comment_content, browse_time, browser_uid, browse_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                info['account_id'],
-                info['weibo_id'],
-                info['username'],
-                info['user_tag'],
-                info['time'],
-                info['text'],
-                str(info['imgs']),
-                info['video'],
-                info['repost_num'],
-                info['like_num'],
-                info['comment_num'],
-                str(info['comment']),
-                info['browse_time'],
-                bot.account_id,
-                0
-            ))
-            conn.commit()
-        except sqlite3.IntegrityError:
-            conn.rollback()
-        except sqlite3.Error as e:
-            print("Database error:", e)
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
+    # 其他 bot 刚抓过的微博直接取缓存
+    weibo_infos = get_detail_cache().fetch_many(weibos, bot.get_weibo_infos, _refresher(bot))
+    _log_browses(bot, [(weibo_infos, BROWSE_HOT)])
 
     return weibo_infos
 
 def get_homepage_weibos(bot, max_num=10):
     weibos = bot.get_homepage_weibos(max_num=max_num)
 
-    weibo_infos = []
-    for weibo in weibos:
-        info = bot.get_weibo_info(weibo['account_id'], weibo['weibo_id'])
-        weibo_infos.append(info)
-    
-    for info in weibo_infos:
-        try:
-            conn = sqlite3.connect('WeiboAct.db')
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS BrowseInformation (
-                    uid VARCHAR(12),
-                    weibo_id VARCHAR(12),
-                    user_name VARCHAR(30),
-                    user_tag VARCHAR(100),
-                    time TIMESTAMP,
-                    text VARCHAR(2000),
-                    img VARCHAR(200),
-                    video VARCHAR(200),
-                    repost VARCHAR(12),
-                    like VARCHAR(12),
-                    comment VARCHAR(12),
-                    comment_content VARCHAR(50000),
-                    browse_time TIMESTAMP,
-                    browser_uid VARCHAR(12),
-                    browse_type INTEGER,
-                    PRIMARY KEY(uid, weibo_id, browser_uid, browse_type)
-                )
-            ''')
-            cursor.execute('''
-                INSERT INTO BrowseInformation 
-                (uid, weibo_id, user_name, user_tag, time, text, img, video, repost, like, comment, comment_content, browse_time, browser_uid, browse_type)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                info['account_id'],
-                info['weibo_id'],
-                info['username'],
-                info['user_tag'],
-                info['time'],
-                info['text'],
-                str(info['imgs']),
-                info['video'],
-                info['repost_num'],
-                info['like_num'],
-                info['comment_num'],
-                str(info['comment']),
-                info['browse_time'],
-                bot.account_id,
-                1,
-            ))
-            conn.commit()
-        except sqlite3.IntegrityError:
-            conn.rollback()
-        except sqlite3.Error as e:
-            print("Database error:", e)
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
-    
+    # 其他 bot 刚抓过的微博直接取缓存
+    weibo_infos = get_detail_cache().fetch_many(weibos, bot.get_weibo_infos, _refresher(bot))
+    _log_browses(bot, [(weibo_infos, BROWSE_HOMEPAGE)])
+
     return weibo_infos
 
+def get_feed_weibos(bot, n_following=10, n_recommend=10):
+    """
+    同时获取首页和热门微博，返回 (首页微博详情, 热门微博详情)。
+
+    两个信息流的链接在不同标签页中重叠发现，详情合并为一条标签页流水线抓取，
+    标签页数是单个信息流的两倍，哪个标签页先加载完就先提取，结果再按各自信息流的顺序放回。
+    """
+    feeds = bot.get_feeds({'homepage': n_following, 'hot': n_recommend})
+
+    # 同时出现在两个信息流中的微博只抓取一次
+    unique = {}
+    for weibo in feeds['homepage'] + feeds['hot']:
+        unique.setdefault((weibo['account_id'], weibo['weibo_id']), weibo)
+    weibos = list(unique.values())
+    infos = get_detail_cache().fetch_many(
+        weibos, lambda items: bot.get_weibo_infos(items, tabs=bot.tabs * 2), _refresher(bot, tabs=bot.tabs * 2)
+    )
+    by_key = dict(zip(unique, infos))
+
+    homepage_infos = [by_key[(weibo['account_id'], weibo['weibo_id'])] for weibo in feeds['homepage']]
+    hot_infos = [by_key[(weibo['account_id'], weibo['weibo_id'])] for weibo in feeds['hot']]
+    _log_browses(bot, [(homepage_infos, BROWSE_HOMEPAGE), (hot_infos, BROWSE_HOT)])
+    return homepage_infos, hot_infos
+
 def update_fans_list(bot):
     # sleep(random.uniform(5, 10))
     info = bot.update_fans_list()
@@ -1,147 +1,323 @@
 # -*- coding: utf-8 -*-
 
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 
+import os
 import threading
-from time import sleep
+from collections import deque
 from datetime import datetime
+from time import perf_counter, sleep
+
+from weibo_service.driver_pool import apply_cookie_jar, apply_cookies, build_firefox_options
+from weibo_service.extractor import (
+    WEIBO_DETAIL_FIELDS,
+    WEIBO_DETAIL_REQUIRED,
+    extract_comments,
+    extract_links,
+    fields_present,
+)
+from weibo_service.fans_store import FanStore
+from weibo_service.resource_profiles import operation_profile
+from weibo_service.scheduler import BrowserLock
+from weibo_service.selector_registry import LOCATE_SCRIPT, QUERY_JS, default_registry
+from weibo_service.sessions import cookie_string
+from weibo_service.transport import build_transport
+from weibo_service.waits import STALE_SCRIPT, WaitEngine, js_condition, page_loaded, scroll_height_grows
+
+# 未登录时会被重定向到 passport 页面；登录状态下导航栏会出现用户名
+VALIDATE_SCRIPT = QUERY_JS + """
+    if (window.__weiboStale) return false;
+    if (location.hostname.indexOf('passport') !== -1) return 'expired';
+    return __weiboRace(arguments[0])[0] !== null ? 'valid' : false;
+"""
+
+def fragment_only(url, current_url):
+    """url 与当前地址只差片段（#...）时，浏览器只滚动到锚点而不重新加载文档。"""
+    return '#' in url and url.split('#')[0] == current_url.split('#')[0]
+
+FEED_URLS = {'homepage': 'https://weibo.com/', 'hot': 'https://weibo.com/hot'}
+FEED_NAMES = {'homepage': "首页微博", 'hot': "热门微博"}
 
 class WeiboBot:
-    def __init__(self, bot_info):
+    def __init__(self, bot_info, driver_pool=None, fan_store=None, session_store=None, selectors=None,
+                 browser_gate=None):
         self.account_id=bot_info['account_id']
         self.cookie=bot_info['cookie']
+        self._account_cookie = self.cookie
+
+        # 有会话快照时使用上次验证过的 cookie，登录时跳过注入和抓取
+        self.session_store = session_store
+        self.session = session_store.load(self.account_id) if session_store is not None else None
+        self._session_pending = False
+        if self.session is not None:
+            self.cookie = self.session['cookie']
             
         self.proxy = bot_info.get('proxy', None)
         self.online_state = bot_info.get('online_state', 'off')
         self.run_states = False
-
-        self.seleniumLock = threading.Lock()
-        self.bot = self._init_bot(proxy=self.proxy)
-        self.bot.maximize_window()
-        self.bot.implicitly_wait(10)
+        self.username = str(self.account_id)
+        self.tabs = bot_info.get('tabs', 3)
+        self.resource_profile = bot_info.get('resource_profile', 'scrape')
+        # 动作已经点击提交时置为 True，之后的失败意味着结果未知（由 WeiboBots 在每个动作前重置）
+        self.action_submitted = False
+
+        # 持有该锁期间同时占用 browser_gate 的一个全局名额
+        self.seleniumLock = BrowserLock(browser_gate, self.account_id)
+        self.waits = WaitEngine(
+            budgets=bot_info.get('wait_budgets'),
+            jitter=bot_info.get('wait_jitter'),
+        )
+        self.fan_store = fan_store if fan_store is not None else FanStore()
+        self.selectors = selectors if selectors is not None else default_registry()
+
+        # 只读操作优先走 HTTP 传输层，失败后在冷却时间内直接使用浏览器
+        self.transport = build_transport(
+            bot_info.get('transport', os.getenv("WEIBO_READ_TRANSPORT", "http")),
+            self.cookie,
+            base_url=bot_info.get('http_base_url'),
+            proxy=self.proxy,
+        )
+        self.transport_cooldown = bot_info.get('transport_cooldown', 60)
+        self._transport_failed_at = None
+        # 多个标签页线程可能同时读取，冷却状态的读写需要加锁
+        self._transport_lock = threading.Lock()
+        self.driver_pool = driver_pool
+        self.profile_dir = None
+        if driver_pool is None and session_store is not None:
+            self.profile_dir = session_store.profile_dir(self.account_id)
+        # 浏览器在第一次使用时才启动：从会话快照恢复的账号在真正操作前不占用 Firefox
+        self._driver = None
+
+    @property
+    def bot(self):
+        if self._driver is None:
+            if self.driver_pool is not None:
+                self._driver = self.driver_pool.lease(proxy=self.proxy, profile=self.resource_profile)
+            else:
+                self._driver = self._init_bot(proxy=self.proxy)
+                self._driver.maximize_window()
+                self._driver.implicitly_wait(10)
+        return self._driver
+
+    @bot.setter
+    def bot(self, driver):
+        self._driver = driver
 
     def _init_bot(self, proxy):
-        firefox_options = FirefoxOptions()
+        return webdriver.Firefox(options=build_firefox_options(proxy, self.resource_profile, self.profile_dir))
+
+    def _tick_driver(self):
+        # 使用驱动池时，操作次数或内存超限后换用新的浏览器
+        if self.driver_pool is not None and self.driver_pool.tick(self.bot):
+            self.bot = self.driver_pool.recycle(
+                self.bot, cookie=self.cookie, proxy=self.proxy, profile=self.resource_profile
+            )
+
+    def _open(self, url, operation):
+        """
+        按操作的资源配置打开页面（url 为 None 时刷新当前页）。
+
+        会话以 'none' 策略启动，这里先标记旧文档，再等待新文档达到该操作要求的加载阶段。
+        打开与当前相同的地址也会重新加载，同样要标记，否则会在旧文档上判定加载完成；
+        只有仅片段不同的跳转不会产生新文档，不做标记。
+        """
+        if url is None or not fragment_only(url, self.bot.current_url):
+            self.bot.execute_script(STALE_SCRIPT)
+
+        if url is None:
+            self.bot.refresh()
+        else:
+            self.bot.get(url)
+        self._await_page(operation)
+
+    def _await_page(self, operation):
+        """等待当前标签页中的新文档达到该操作要求的加载阶段。"""
+        strategy = operation_profile(operation)['page_load_strategy']
+        self.waits.until(self.bot, f'{operation}.open', page_loaded(strategy), message=f"{operation} 页面加载超时")
+
+    def _find(self, name, step=None, clickable=False):
+        """按选择器注册表等待元素出现；所有候选都不可能命中时提前失败。"""
+        return self.waits.until(
+            self.bot,
+            step or name,
+            self.selectors.locate(name, clickable=clickable),
+            message=f"未找到元素 {name}",
+        )
+
+    def _await_element(self, name, step, predicate):
+        """
+        点击后等待注册表中的元素满足 predicate（输入框被清空、按钮状态改变等），确认操作已生效；
+        超时抛出 TimeoutException，不把没有生效的点击当作成功。
+        """
+        locate = self.selectors.locate(name)
+
+        def condition(driver):
+            element = locate(driver)
+            try:
+                return bool(element) and predicate(element)
+            except StaleElementReferenceException:
+                return False
 
-        firefox_options.set_preference('permissions.default.image', 2)
-        firefox_options.set_preference('dom.webnotifications.enabled', False) 
+        return self.waits.until(self.bot, step, condition, message=f"{step} 未确认生效")
 
-        firefox_options.set_preference("general.useragent.override", 
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0")
-        firefox_options.set_preference("intl.accept_languages", "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7")
-        
-        firefox_options.set_preference("dom.webdriver.enabled", False)
-        firefox_options.set_preference('useAutomationExtension', False)
-        
-        firefox_options.set_preference("privacy.resistFingerprinting", True)
-        
-        firefox_options.add_argument("--disable-dev-shm-usage")
-        firefox_options.add_argument("--disable-web-security")
-        firefox_options.add_argument("--disable-blink-features")
-        firefox_options.add_argument("--disable-blink-features=AutomationControlled")
-        firefox_options.set_preference('security.enterprise_roots.enabled', True)
-        
-        firefox_options.add_argument('--headless')
-
-        firefox_options.add_argument('--disable-gpu')
-        firefox_options.add_argument("--disable-images")
-
-        if proxy is not None:
-            host, port = proxy.split(":")
-            firefox_options.set_preference('network.proxy.type', 1)
-            firefox_options.set_preference('network.proxy.http', host)
-            firefox_options.set_preference('network.proxy.http_port', int(port))
-            firefox_options.set_preference('network.proxy.ssl', host)
-            firefox_options.set_preference('network.proxy.ssl_port', int(port))
-        
-        return webdriver.Firefox(options=firefox_options)
+    def _await_closed(self, name, step, cleared=False):
+        """
+        点击发送后等待弹出的编辑框关闭（元素消失或隐藏）；cleared 为真时输入框被清空也算生效，
+        用于输入过内容、发送后编辑框仍留在页面上的情况。超时抛出 TimeoutException。
+        """
+        candidates = self.selectors.candidates(name)
 
-    def login(self):
-        with self.seleniumLock:
+        def condition(driver):
+            index, area, _ = driver.execute_script(LOCATE_SCRIPT, candidates, False)
+            if index is None:
+                return True
             try:
-                self.bot.get('https://weibo.com/')
-                self.bot.delete_all_cookies()
-                sleep(10)
-
-                for element in self.cookie.split('; '):
-                    name, value = element.split('=', 1)
-                    cookie_dict = {
-                        'domain': '.weibo.com',
-                        'name': name,
-                        'value': value,
-                        "expires": '',
-                        'path': '/',
-                        'httpOnly': True,
-                        'HostOnly': False,
-                        'Secure': False
-                    }
-                    self.bot.add_cookie(cookie_dict)
-                
-                self.bot.refresh()
-                sleep(10)
-
-                self.username = WebDriverWait(self.bot, 50).until(
-                    lambda driver: driver.find_element(
-                        By.XPATH, 
-                        "//*[@id='app']/div[2]/div[1]/div/div[1]/div/div/div[2]/div/div[1]/a[5]/div/div/div"
-                    ).get_attribute('title'),
-                    "获取用户名超时"
-                )
+                return not area.is_displayed() or (cleared and area.get_attribute('value') == '')
+            except StaleElementReferenceException:
+                return True
 
-                self.online_state = 'on'
-                self.run_states = True
+        return self.waits.until(self.bot, step, condition, message=f"{step} 未确认生效")
+
+    def _await_toggle(self, name, step, before):
+        """等待按钮的 outerHTML 与点击前不同，再等待网络空闲，让请求发送完成。"""
+        self._await_element(name, step, lambda element: element.get_attribute('outerHTML') != before)
+        self.waits.page_ready(self.bot, f'{step.split(".")[0]}.idle')
+
+    def _read(self, name, read):
+        """
+        通过传输层执行只读操作；未启用、未登录、冷却中或失败时返回 None，由调用方回退到浏览器
+        （浏览器路径会再次检查登录状态并报告未登录）。
+        """
+        if self.transport is None or self.online_state != 'on':
+            return None
+        with self._transport_lock:
+            if self._transport_failed_at is not None:
+                if perf_counter() - self._transport_failed_at < self.transport_cooldown:
+                    return None
+                self._transport_failed_at = None
+
+        start = perf_counter()
+        try:
+            result = read(self.transport)
+        except Exception as e:
+            with self._transport_lock:
+                self._transport_failed_at = perf_counter()
+            self.waits.record(f'{self.transport.name}.read', perf_counter() - start, timed_out=True)
+            print(self.username, f"{self.transport.name} 读取{name}失败，回退到浏览器:", str(e))
+            return None
 
-                self.fans = []
-                self._get_fans_list()
+        self.waits.record(f'{self.transport.name}.read', perf_counter() - start)
+        return result
 
-                print(self.username, "登陆")
+    def close(self):
+        with self.seleniumLock:
+            self.online_state = 'off'
+            if self._driver is None:
+                return
+            if self.driver_pool is not None:
+                self.driver_pool.release(self._driver)
+            else:
+                self._driver.quit()
+            self._driver = None
 
-                return True
-        
-            except TimeoutException as e:
-                print(f"{self.account_id} 登录超时:", str(e))
-                return False
+    def login(self):
+        with self.seleniumLock:
+            if self.session is not None:
+                return self._rehydrate()
+            return self._login()
+
+    def _rehydrate(self):
+        """从会话快照恢复登录状态，不操作浏览器；会话在第一次浏览器操作时验证。"""
+        self.username = self.session['username']
+        self.fans = self.fan_store.fans(self.account_id)
+        self.online_state = 'on'
+        self.run_states = True
+        self._session_pending = True
+
+        print(self.username, "从会话快照恢复登录")
+        return True
+
+    def _validate_session(self):
+        if not self._session_pending:
+            return
+
+        apply_cookie_jar(self.bot, self.session['cookies'])
+        self._open(None, 'login')
+        state = self.waits.until(
+            self.bot, 'login.validate', js_condition(VALIDATE_SCRIPT, self.selectors.candidates('login.username')), message="验证会话超时"
+        )
+        self._session_pending = False
+        if state == 'valid':
+            return
+
+        print(self.username, "会话已失效，重新登录")
+        self.session_store.invalidate(self.account_id)
+        self.session = None
+        self.cookie = self._account_cookie
+        if not self._login():
+            raise Exception("会话已失效且重新登录失败")
+
+    def _login(self):
+        try:
+            apply_cookies(self.bot, self.cookie)
+            self._open(None, 'login')
+            self.waits.page_ready(self.bot, 'login.refresh')
 
+            self.username = self._find('login.username').get_attribute('title')
+
+            self.online_state = 'on'
+            self.run_states = True
+
+            # 已有快照时只扫描最新一页粉丝，否则做一次完整扫描
+            self.fans = self.fan_store.fans(self.account_id)
+            try:
+                self._sync_fans(full=not self.fan_store.has_snapshot(self.account_id))
             except Exception as e:
-                print(f"{self.account_id} 登录发生错误:", str(e))
-                return False
+                print(self.username, "获取粉丝列表发生错误:", str(e))
+
+            # 保存浏览器中的最新 cookie，下次启动时直接恢复
+            if self.session_store is not None:
+                jar = self.bot.get_cookies()
+                self.session_store.save(self.account_id, self.username, jar)
+                self.session = self.session_store.load(self.account_id)
+                self.cookie = cookie_string(jar)
+                if self.transport is not None:
+                    self.transport.set_cookie(self.cookie)
+
+            print(self.username, "登陆")
+
+            return True
+    
+        except TimeoutException as e:
+            print(f"{self.account_id} 登录超时:", str(e))
+            return False
+
+        except Exception as e:
+            print(f"{self.account_id} 登录发生错误:", str(e))
+            return False
 
     def post(self, content):
         with self.seleniumLock:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
+                self._tick_driver()
+                self._validate_session()
                     
-                self.bot.get('https://weibo.com')
+                self._open('https://weibo.com', 'post')
                 
-                content_area = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.CSS_SELECTOR,
-                        "[placeholder='有什么新鲜事想分享给大家？']"
-                    ))
-                )
+                content_area = self._find('post.textarea')
                 content_area.send_keys(content)
                 
-                post_button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='homeWrap']/div[1]/div/div[4]/div/div[5]/button"
-                    ))
-                )
+                post_button = self._find('post.button')
+                self.action_submitted = True
                 post_button.click()
-                sleep(5)
+                # 发布成功后输入框会被清空
+                self._await_element('post.textarea', 'post.submit', lambda area: area.get_attribute('value') == '')
+                self.waits.page_ready(self.bot, 'post.idle')
                 
-                weibo_id = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='woo-box-flex woo-box-alignCenter woo-box-justifyCenter head-info_info_2AspQ']/a"
-                    ))
-                ).get_attribute('href').split('/')[-1]
+                weibo_id = self._find('feed.link').get_attribute('href').split('/')[-1]
 
                 username = self.username
                 post_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -169,34 +345,23 @@ class WeiboBot:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
+                self._tick_driver()
+                self._validate_session()
                     
-                self.bot.get(f'https://weibo.com/{account_id}/{weibo_id}#repost')
+                self._open(f'https://weibo.com/{account_id}/{weibo_id}#repost', 'repost')
 
                 if repost_text != '':
-                    content_area = WebDriverWait(self.bot, 50).until(
-                        EC.presence_of_element_located((
-                            By.CSS_SELECTOR,
-                            "[placeholder='说说分享心得']"
-                        ))
-                    )
+                    content_area = self._find('repost.textarea')
                     content_area.send_keys(repost_text)
-                sleep(5)
 
-                post_button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='composerEle']/div[2]/div/div[3]/div/button"
-                    ))
-                )
+                post_button = self._find('composer.submit', 'repost.button', clickable=True)
+                self.action_submitted = True
                 post_button.click()
-                sleep(5)
+                # 转发成功后编辑框关闭；输入过内容时编辑框被清空也说明已经发出
+                self._await_closed('repost.textarea', 'repost.submit', cleared=repost_text != '')
+                self.waits.page_ready(self.bot, 'repost.idle')
 
-                weibo_content = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='detail_wbtext_4CRf9']"
-                    ))
-                ).text
+                weibo_content = self._find('detail.text').text
 
                 print(self.username, f"转发微博{account_id}/{weibo_id}:", repost_text)
 
@@ -223,32 +388,24 @@ class WeiboBot:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
+                self._tick_driver()
+                self._validate_session()
                     
-                self.bot.get(f'https://weibo.com/{account_id}/{weibo_id}')
+                self._open(f'https://weibo.com/{account_id}/{weibo_id}', 'comment')
                 
-                content_area = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.CSS_SELECTOR,
-                        "[placeholder='发布你的评论']"
-                    ))
-                )
+                content_area = self._find('comment.textarea')
                 content_area.send_keys(comment)
-                sleep(5)
                 
-                post_button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='composerEle']/div[2]/div/div[3]/div/button"
-                    ))
-                )
+                post_button = self._find('composer.submit', 'comment.button', clickable=True)
+                self.action_submitted = True
                 post_button.click()
-                
-                weibo_content = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='detail_wbtext_4CRf9']"
-                    ))
-                ).text
+                # 评论发出后输入框会被清空
+                self._await_element(
+                    'comment.textarea', 'comment.submit', lambda area: area.get_attribute('value') == ''
+                )
+                self.waits.page_ready(self.bot, 'comment.idle')
+
+                weibo_content = self._find('detail.text').text
 
                 print(self.username, f"评论微博{account_id}/{weibo_id}:", comment)
 
@@ -275,23 +432,18 @@ class WeiboBot:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
+                self._tick_driver()
+                self._validate_session()
                     
-                self.bot.get(f'https://weibo.com/{account_id}/{weibo_id}')
+                self._open(f'https://weibo.com/{account_id}/{weibo_id}', 'like')
 
-                like_button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/article/footer/div/div[1]/div/div[3]/div/button"
-                    ))
-                )
+                like_button = self._find('like.button')
+                before = like_button.get_attribute('outerHTML')
+                self.action_submitted = True
                 like_button.click()
+                self._await_toggle('like.button', 'like.submit', before)
 
-                weibo_content = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='detail_wbtext_4CRf9']"
-                    ))
-                ).text
+                weibo_content = self._find('detail.text').text
 
                 print(self.username, f"点赞微博{account_id}/{weibo_id}")
 
@@ -318,16 +470,16 @@ class WeiboBot:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
+                self._tick_driver()
+                self._validate_session()
                     
-                self.bot.get(f'https://weibo.com/u/{account_id}')
+                self._open(f'https://weibo.com/u/{account_id}', 'follow')
                 
-                follow_button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/div[2]/div[3]/span/button"
-                    ))
-                )                    
+                follow_button = self._find('profile.follow_button')
+                before = follow_button.get_attribute('outerHTML')
+                self.action_submitted = True
                 follow_button.click()
+                self._await_toggle('profile.follow_button', 'follow.submit', before)
                 
                 print(self.username, "关注用户:", account_id)
 
@@ -350,32 +502,23 @@ class WeiboBot:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
+                self._tick_driver()
+                self._validate_session()
                     
-                self.bot.get(f'https://weibo.com/u/{account_id}')
+                self._open(f'https://weibo.com/u/{account_id}', 'unfollow')
 
-                button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/div[2]/div[3]/span/button"
-                    ))
-                )
+                button = self._find('profile.follow_button')
+                before = button.get_attribute('outerHTML')
                 button.click() 
 
-                unfollow_button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/div[2]/div[3]/div/div/div[4]"
-                    ))
-                )
+                unfollow_button = self._find('profile.unfollow_item')
                 unfollow_button.click()
 
-                confirm_button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='app']/div[4]/div[1]/div/div[2]/button[2]"
-                    ))
-                )
+                confirm_button = self._find('dialog.confirm')
+                self.action_submitted = True
                 confirm_button.click()
+                # 取关生效后关注按钮恢复为未关注状态
+                self._await_toggle('profile.follow_button', 'unfollow.submit', before)
 
                 print(self.username, "取关用户:", account_id)
 
@@ -394,201 +537,191 @@ class WeiboBot:
                 print(self.username, "取关发生错误:", str(e))
                 return None
         
-    def _get_comment(self, max_num=10):
+    def _scroll_scan(self, extract, key, step, scroll=500, plateau=3):
+        """
+        通用滚动扫描：每次滚动只执行一次 extract 脚本，按 key 去重后逐个产出 (key, 元素)。
+
+        extract 返回 (滚动高度, 是否已到底部, 元素列表)；滚动高度连续 plateau 次不再增长
+        且没有新元素时结束，调用方也可以随时中断迭代。
+        """
+        seen = set()
+        stale = 0
+
+        while True:
+            height, at_bottom, batch = extract()
+
+            new_items = 0
+            for item in batch:
+                item_key = key(item)
+                if item_key in seen:
+                    continue
+                seen.add(item_key)
+                new_items += 1
+                yield item_key, item
+
+            self.bot.execute_script(f'window.scrollBy(0, {scroll});')
+            if at_bottom:
+                grew = self.waits.try_until(self.bot, step, scroll_height_grows(height))
+            else:
+                grew = True
+
+            if new_items == 0 and not grew:
+                stale += 1
+                if stale == plateau:
+                    return
+            else:
+                stale = 0
+
+    def _iter_locked(self, steps, reopen):
+        """
+        逐步推进 steps（在当前标签页上打开页面并滚动扫描的生成器）并产出结果。
+
+        每一步在 seleniumLock 内执行，产出结果时不持有锁和全局名额，调用方处理结果期间
+        其他请求可以使用浏览器，中途放弃迭代也不会占着锁。恢复时如果页面已被其他操作切走，
+        先用 reopen(url) 重新打开再继续；扫描按 key 去重，已经产出的不会重复。
+        """
+        page = None
         try:
-            js_script = """
-                var processNode = function(node) {
-                    var text = '';
-                    if (node.nodeType === Node.TEXT_NODE) {
-                        var trimmed = node.textContent.trim();
-                        if (trimmed) text += trimmed + ' ';
-                    }
-                    else if (node.tagName === 'IMG') {
-                        var alt = node.getAttribute('alt') || '';
-                        if (alt) text += alt + ' ';
-                    }
-                    else if (node.nodeType === Node.ELEMENT_NODE) {
-                        for (var i = 0; i < node.childNodes.length; i++) {
-                            text += processNode(node.childNodes[i]);
-                        }
-                    }
-                    return text;
-                };
-
-                var span = arguments[0];
-                var rawText = processNode(span);
-                return rawText.replace(/\s+/g, ' ').trim();
-            """
-            
-            comments = []
-            fail_cnt = 0
-
-            while (len(comments) < max_num):
-                try:
-                    elements = WebDriverWait(self.bot, 20).until(
-                        EC.presence_of_all_elements_located((
-                            By.XPATH,
-                            "//*[@class='con1 woo-box-item-flex']"
-                        ))
-                    )
-                except Exception:
-                    elements = []
-                
-                new_comment = 0
-                for element in elements:
-                    span = WebDriverWait(element, 10).until(
-                        EC.presence_of_element_located((
-                            By.XPATH, 
-                            ".//*[@class='text']/span"
-                        ))
-                    )
-                    comment = self.bot.execute_script(js_script, span)
-        
-                    if comment not in comments:
-                        comments.append(comment)
-                        new_comment += 1
+            while True:
+                with self.seleniumLock:
+                    if self.online_state != 'on':
+                        raise Exception("未登录")
+                    if page is None:
+                        self._tick_driver()
+                        self._validate_session()
+                    elif self.bot.current_url != page:
+                        reopen(page)
+                    try:
+                        item = next(steps)
+                    except StopIteration:
+                        return
+                    page = self.bot.current_url
+                yield item
+        finally:
+            steps.close()
+
+    def _iter_comments(self, max_num=10):
+        """逐条产出当前微博页面的评论，按评论 id（缺失时按内容）去重。"""
+        scan = self._scroll_scan(
+            lambda: extract_comments(self.bot, self.selectors),
+            key=lambda item: item['id'] or item['text'],
+            step='comment.scroll',
+        )
+        for count, (_, item) in enumerate(scan, 1):
+            yield item['text']
+            if count == max_num:
+                return
 
-                    if len(comments) == max_num:
-                        break
-                
-                if new_comment == 0:
-                    fail_cnt += 1
-                    if fail_cnt == 3:
-                        break
-                
-                self.bot.execute_script('window.scrollBy(0, 500);')
-                sleep(3)
-            
-            return comments
+    def _get_comment(self, max_num=10):
+        if max_num <= 0:
+            return []
+        try:
+            return list(self._iter_comments(max_num))
     
         except Exception as e:
             print(self.username, "获取微博评论发生错误:", str(e))
             return []
 
+    def iter_comments(self, account_id, weibo_id, max_num=10):
+        """
+        逐条产出微博的评论。先通过传输层读取，读不到时才打开微博详情页，
+        调用方可以边抓取边处理，处理期间不持有浏览器锁。
+        """
+        comments = self._read("微博评论", lambda transport: transport.get_comments(account_id, weibo_id, max_num))
+        if comments is not None:
+            yield from comments
+            return
+
+        def reopen(page):
+            self._open(page, 'detail')
+            self.waits.page_ready(self.bot, 'comment.load')
+
+        def steps():
+            reopen(f'https://weibo.com/{account_id}/{weibo_id}')
+            yield from self._iter_comments(max_num)
+
+        yield from self._iter_locked(steps(), reopen)
+
+    def get_comments(self, account_id, weibo_id, max_num=10):
+        """抓取微博的前 max_num 条评论，失败时返回 None。"""
+        try:
+            return list(self.iter_comments(account_id, weibo_id, max_num))
+        except Exception as e:
+            print(self.username, "获取微博评论发生错误:", str(e))
+            return None
+
+    def _read_weibo_info(self, account_id, weibo_id, fields, max_num=10):
+        """把详情页提取到的字段整理成微博信息，并在当前标签页抓取评论。"""
+        username = fields['username']
+        user_tag = fields['user_tag']
+        weibo_text = fields['text']
+        weibo_imgs = fields['imgs']
+
+        dt = datetime.strptime(fields['time'], "%y-%m-%d %H:%M")
+        time = dt.strftime("%Y-%m-%d %H:%M:%S")
+
+        weibo_video = fields['video']
+        if 'video' not in weibo_video:
+            weibo_video = ''
+
+        repost_num = fields['repost_num']
+        if repost_num == '转发':
+            repost_num = '0'
+
+        comment_num = fields['comment_num']
+        if comment_num == '评论':
+            comment_num = '0'
+
+        like_num = fields['like_num']
+        if like_num == '赞':
+            like_num = '0'
+
+        comment = self._get_comment(max_num)
+        
+        print(self.username, "浏览微博", account_id, weibo_id)
+
+        return {
+            "account_id": account_id,
+            "weibo_id": weibo_id,
+
+            "username": username,
+            "user_tag": user_tag,
+            "time": time,
+
+            "text": weibo_text,
+            "imgs": weibo_imgs,
+            "video": weibo_video,
+
+            "repost_num": repost_num,
+            "comment_num": comment_num,
+            "comment": comment,
+            "like_num": like_num,
+
+            "browse_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
     def get_weibo_info(self, account_id, weibo_id, max_num=10):
+        info = self._read("微博信息", lambda transport: transport.get_weibo_info(account_id, weibo_id, max_num))
+        if info is not None:
+            print(self.username, "浏览微博", account_id, weibo_id)
+            return info
+
         with self.seleniumLock:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
+                self._tick_driver()
+                self._validate_session()
                 
-                self.bot.get(f'https://weibo.com/{account_id}/{weibo_id}')
-                sleep(10)
-
-                username = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='ALink_default_2ibt1 head_cut_2Zcft head_name_24eEB']/span"
-                    ))
-                ).text
-            
-                time = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='woo-box-flex woo-box-alignCenter woo-box-justifyCenter head-info_info_2AspQ']/a"
-                    ))
-                ).text
-                dt = datetime.strptime(time, "%y-%m-%d %H:%M")
-                time = dt.strftime("%Y-%m-%d %H:%M:%S")
-            
-                weibo_text = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='detail_wbtext_4CRf9']"
-                    ))
-                ).text
-            
-                try:
-                    self.bot.implicitly_wait(0)
-                    user_tag = WebDriverWait(self.bot, 20).until(
-                        EC.presence_of_element_located((
-                            By.XPATH,
-                            "//*[@class='con woo-box-item-flex']"
-                        ))
-                    ).text
-                except Exception:
-                    user_tag = ''
-                finally:
-                    self.bot.implicitly_wait(10)
-
-                try:
-                    self.bot.implicitly_wait(0)
-                    weibo_img_elements = WebDriverWait(self.bot, 20).until(
-                        EC.presence_of_all_elements_located((
-                            By.XPATH,
-                            "//*[@class='picture picture-box_row_30Iwo']//*[@class='woo-picture-img']"
-                        ))
-                    )
-                    weibo_imgs = [img_element.get_attribute('src') for img_element in weibo_img_elements]
-                except Exception:
-                    weibo_imgs = []
-                finally:
-                    self.bot.implicitly_wait(10)
-
-                try:
-                    self.bot.implicitly_wait(0)
-                    weibo_video = WebDriverWait(self.bot, 20).until(
-                        lambda driver: driver.find_element(
-                            By.XPATH, 
-                            "(//*[contains(@class,'detail_wbtext_')]//a[@target='_blank'])[last()]"
-                        ).get_attribute('href')
-                    )
-                    if 'video' not in weibo_video:
-                        weibo_video = ''
-                except Exception as e:
-                    weibo_video = ''
-                finally:
-                    self.bot.implicitly_wait(10)
-
-                repost_num = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='woo-box-flex woo-box-alignCenter woo-box-justifyCenter toolbar_retweet_1L_U5 toolbar_wrap_np6Ug']/span"
-                    ))
-                ).text
-                if repost_num == '转发':
-                    repost_num = '0'
-            
-                comment_num = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='woo-box-flex woo-box-alignCenter woo-box-justifyCenter toolbar_wrap_np6Ug toolbar_cur_JoD5A']/span"
-                    ))
-                ).text
-                if comment_num == '评论':
-                    comment_num = '0'
-
-                like_num = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@class='woo-like-main toolbar_btn_Cg9tz']/span[2]"
-                    ))
-                ).text
-                if like_num == '赞':
-                    like_num = '0'
-
-                comment = self._get_comment(max_num)
-                
-                print(self.username, "浏览微博", account_id, weibo_id)
-
-                return {
-                    "account_id": account_id,
-                    "weibo_id": weibo_id,
-
-                    "username": username,
-                    "user_tag": user_tag,
-                    "time": time,
-
-                    "text": weibo_text,
-                    "imgs": weibo_imgs,
-                    "video": weibo_video,
+                self._open(f'https://weibo.com/{account_id}/{weibo_id}', 'detail')
 
-                    "repost_num": repost_num,
-                    "comment_num": comment_num,
-                    "comment": comment,
-                    "like_num": like_num,
-
-                    "browse_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
+                fields = self.waits.until(
+                    self.bot,
+                    'detail.extract',
+                    fields_present(WEIBO_DETAIL_FIELDS, WEIBO_DETAIL_REQUIRED, self.selectors),
+                    message="获取微博信息超时"
+                )
+                return self._read_weibo_info(account_id, weibo_id, fields, max_num)
         
             except TimeoutException as e:
                 print(self.username, "获取微博信息超时:", str(e))
@@ -598,211 +731,326 @@ class WeiboBot:
                 print(self.username, "获取微博信息发生错误:", str(e))
                 return None
 
-    def get_hot_weibos(self, max_num=10):
+    def get_weibo_infos(self, weibos, max_num=10, tabs=None):
+        """
+        抓取一批微博详情，结果按输入顺序返回，失败项为 None。
+
+        先通过传输层读取，读取失败的微博再交给浏览器标签页流水线。
+        """
+        results = [None] * len(weibos)
+        for index, weibo in enumerate(weibos):
+            results[index] = self._read("微博信息", lambda transport: transport.get_weibo_info(
+                weibo['account_id'], weibo['weibo_id'], max_num
+            ))
+            if results[index] is not None:
+                print(self.username, "浏览微博", weibo['account_id'], weibo['weibo_id'])
+
+        remaining = [index for index, info in enumerate(results) if info is None]
+        if remaining:
+            browsed = self._browse_weibo_infos([weibos[index] for index in remaining], max_num, tabs)
+            for index, info in zip(remaining, browsed):
+                results[index] = info
+        return results
+
+    def _browse_weibo_infos(self, weibos, max_num=10, tabs=None):
+        """
+        用多个标签页流水线式抓取一批微博详情，结果按输入顺序返回，失败项为 None。
+
+        各标签页通过脚本跳转同时加载页面，驱动只在某个标签页加载完成时切换过去提取，
+        提取完成后该标签页立即开始加载下一条。
+        """
+        tabs = max(1, min(tabs or self.tabs, len(weibos)))
+        results = [None] * len(weibos)
+        if not weibos:
+            return results
+
+        with self.seleniumLock:
+            if self.online_state != 'on':
+                print(self.username, "获取微博信息发生错误: 未登录")
+                return results
+            self._tick_driver()
+            self._validate_session()
+
+            main_handle = self.bot.current_window_handle
+            handles = [main_handle]
+            for _ in range(tabs - 1):
+                self.bot.switch_to.new_window('tab')
+                handles.append(self.bot.current_window_handle)
+
+            pending = deque(enumerate(weibos))
+            loading = {}
+            budget = self.waits.budget('detail.tab')
+
+            def load_next(handle):
+                if not pending:
+                    return
+                index, weibo = pending.popleft()
+                self.bot.switch_to.window(handle)
+                self.bot.execute_script(
+                    STALE_SCRIPT + "window.location.href = arguments[0];",
+                    f"https://weibo.com/{weibo['account_id']}/{weibo['weibo_id']}"
+                )
+                # 每个标签页各自判断页面加载完成后的宽限时间
+                ready = fields_present(WEIBO_DETAIL_FIELDS, WEIBO_DETAIL_REQUIRED, self.selectors)
+                loading[handle] = (index, weibo, perf_counter(), ready)
+
+            try:
+                for handle in handles:
+                    load_next(handle)
+
+                while loading:
+                    extracted = False
+                    for handle in list(loading):
+                        index, weibo, start, ready = loading[handle]
+                        self.bot.switch_to.window(handle)
+                        try:
+                            fields = ready(self.bot)
+                            if not fields:
+                                if perf_counter() - start < budget:
+                                    continue
+                                raise TimeoutException("获取微博信息超时")
+
+                            self.waits.record('detail.tab', perf_counter() - start)
+                            results[index] = self._read_weibo_info(
+                                weibo['account_id'], weibo['weibo_id'], fields, max_num
+                            )
+                        except TimeoutException as e:
+                            self.waits.record('detail.tab', perf_counter() - start, timed_out=True)
+                            print(self.username, "获取微博信息超时:", str(e))
+                        except Exception as e:
+                            print(self.username, "获取微博信息发生错误:", str(e))
+
+                        extracted = True
+                        del loading[handle]
+                        load_next(handle)
+
+                    if not extracted:
+                        sleep(self.waits.poll_frequency)
+            finally:
+                for handle in handles[1:]:
+                    try:
+                        self.bot.switch_to.window(handle)
+                        self.bot.close()
+                    except Exception:
+                        pass
+                self.bot.switch_to.window(main_handle)
+
+        return results
+
+    def _iter_feed(self, url, step, max_num=10, preloaded=False):
+        """
+        打开信息流页面并逐个产出 (account_id, weibo_id)，信息流到底时自动结束。
+        preloaded 为真时当前标签页已经开始加载该页面，只等待加载完成。
+        """
+        if preloaded:
+            self._await_page('feed')
+        else:
+            self._open(url, 'feed')
+        self.waits.page_ready(self.bot, f'{step}.load')
+        self._find('feed.link')
+
+        scan = self._scroll_scan(
+            lambda: extract_links(self.bot, self.selectors, 'feed.link'),
+            key=lambda url: tuple(url.split('/')[-2:]),
+            step='feed.scroll',
+            scroll=1000,
+        )
+        for count, (weibo, _) in enumerate(scan, 1):
+            yield weibo
+            if count == max_num:
+                return
+
+    def _read_feed(self, feed, max_num, name):
+        return self._read(name, lambda transport: [
+            {"account_id": account_id, "weibo_id": weibo_id}
+            for account_id, weibo_id in transport.iter_feed(feed, max_num)
+        ])
+
+    def _get_feed(self, url, step, max_num, name):
+        weibos = self._read_feed(step, max_num, name)
+        if weibos is not None:
+            print(self.username, f"获取{name}:", weibos)
+            return weibos
+
         with self.seleniumLock:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
-                
-                self.bot.get('https://weibo.com/hot')
-                sleep(10)
-
-                weibos = []
-                while len(weibos) < max_num:
-                    cur_weibos = WebDriverWait(self.bot, 50).until(
-                        EC.presence_of_all_elements_located((
-                            By.XPATH,
-                            "//*[@class='woo-box-flex woo-box-alignCenter woo-box-justifyCenter head-info_info_2AspQ']/a"
-                        ))
-                    )
-                    for cur_weibo in cur_weibos:  
-                        url = cur_weibo.get_attribute('href')
-                        weibo = {
-                            "account_id": url.split('/')[-2],
-                            "weibo_id": url.split('/')[-1]
-                        }
-
-                        if weibo not in weibos:
-                            weibos.append(weibo)
+                self._tick_driver()
+                self._validate_session()
 
-                        if (len(weibos) == max_num):
-                            break
-
-                    self.bot.execute_script('window.scrollBy(0, 1000);')
-                    sleep(5)
-                
-                print(self.username, "获取热门微博:", weibos)
+                weibos = [
+                    {"account_id": account_id, "weibo_id": weibo_id}
+                    for account_id, weibo_id in self._iter_feed(url, step, max_num)
+                ]
+                print(self.username, f"获取{name}:", weibos)
 
                 return weibos
 
             except TimeoutException as e:
-                print(self.username, "获取热门微博超时:", str(e))
+                print(self.username, f"获取{name}超时:", str(e))
                 return []
             except Exception as e:
-                print(self.username, "获取热门微博发生错误:", str(e))
+                print(self.username, f"获取{name}发生错误:", str(e))
                 return []
 
+    def get_hot_weibos(self, max_num=10):
+        return self._get_feed(FEED_URLS['hot'], 'hot', max_num, FEED_NAMES['hot'])
+
     def get_homepage_weibos(self, max_num=10):
+        return self._get_feed(FEED_URLS['homepage'], 'homepage', max_num, FEED_NAMES['homepage'])
+
+    def get_feeds(self, feeds):
+        """
+        一次获取多个信息流，feeds 为 {信息流: 数量}（信息流为 'homepage' 或 'hot'），返回 {信息流: [微博, ...]}。
+
+        传输层读不到的信息流由浏览器获取：第一个在当前标签页扫描，其余的先在新标签页中开始加载，
+        轮到它们时页面通常已经就绪，页面加载与前一个信息流的滚动扫描相互重叠。
+        """
+        results = {}
+        for feed, max_num in feeds.items():
+            weibos = self._read_feed(feed, max_num, FEED_NAMES[feed])
+            if weibos is not None:
+                print(self.username, f"获取{FEED_NAMES[feed]}:", weibos)
+                results[feed] = weibos
+
+        remaining = [feed for feed in feeds if feed not in results]
+        if not remaining:
+            return results
+
         with self.seleniumLock:
             try:
                 if self.online_state != 'on':
                     raise Exception("未登录")
-
-                self.bot.get('https://weibo.com/')
-                sleep(10)
-                
-                weibos = []
-                while len(weibos) < max_num:
-                    cur_weibos = WebDriverWait(self.bot, 50).until(
-                        EC.presence_of_all_elements_located((
-                            By.XPATH,
-                            "//*[@class='woo-box-flex woo-box-alignCenter woo-box-justifyCenter head-info_info_2AspQ']/a"
-                        ))
-                    )
-                    for cur_weibo in cur_weibos:  
-                        url = cur_weibo.get_attribute('href')
-                        weibo = {
-                            "account_id": url.split('/')[-2],
-                            "weibo_id": url.split('/')[-1]
-                        }
-
-                        if weibo not in weibos:
-                            weibos.append(weibo)
-
-                        if (len(weibos) == max_num):
-                            break
-
-                    self.bot.execute_script('window.scrollBy(0, 1000);')
-                    sleep(5)
-                
-                print(self.username, "获取首页微博:", weibos)
-                
-                return weibos
-            
-            except TimeoutException as e:
-                print(self.username, "获取首页微博超时:", str(e))
-                return []
+                self._tick_driver()
+                self._validate_session()
             except Exception as e:
-                print(self.username, "获取首页微博发生错误:", str(e))
-                return []
+                print(self.username, "获取信息流发生错误:", str(e))
+                return dict(results, **{feed: [] for feed in remaining})
 
-    def _get_fans_list(self):
+            main_handle = self.bot.current_window_handle
+            handles = {remaining[0]: main_handle}
+            try:
+                for feed in remaining[1:]:
+                    self.bot.switch_to.new_window('tab')
+                    self.bot.execute_script(
+                        STALE_SCRIPT + "window.location.href = arguments[0];", FEED_URLS[feed]
+                    )
+                    handles[feed] = self.bot.current_window_handle
+
+                for feed in remaining:
+                    name = FEED_NAMES[feed]
+                    self.bot.switch_to.window(handles[feed])
+                    try:
+                        results[feed] = [
+                            {"account_id": account_id, "weibo_id": weibo_id}
+                            for account_id, weibo_id in self._iter_feed(
+                                FEED_URLS[feed], feed, feeds[feed], preloaded=handles[feed] != main_handle
+                            )
+                        ]
+                        print(self.username, f"获取{name}:", results[feed])
+                    except TimeoutException as e:
+                        print(self.username, f"获取{name}超时:", str(e))
+                        results[feed] = []
+                    except Exception as e:
+                        print(self.username, f"获取{name}发生错误:", str(e))
+                        results[feed] = []
+            finally:
+                for handle in handles.values():
+                    if handle == main_handle:
+                        continue
+                    try:
+                        self.bot.switch_to.window(handle)
+                        self.bot.close()
+                    except Exception:
+                        pass
+                self.bot.switch_to.window(main_handle)
+
+        return results
+
+    def iter_feed_weibos(self, feed='hot', max_num=10):
+        """逐个产出信息流中的 (account_id, weibo_id)；feed 为 'hot' 或 'homepage'。"""
+        url = FEED_URLS['hot'] if feed == 'hot' else FEED_URLS['homepage']
+        weibos = self._read_feed(feed, max_num, "信息流")
+        if weibos is not None:
+            for weibo in weibos:
+                yield weibo['account_id'], weibo['weibo_id']
+            return
+
+        def reopen(page):
+            self._open(page, 'feed')
+            self.waits.page_ready(self.bot, f'{feed}.load')
+
+        yield from self._iter_locked(self._iter_feed(url, feed, max_num), reopen)
+
+    def _scan_fans(self, known=None):
+        """
+        按最新关注顺序滚动粉丝列表。
+
+        传入 known 时，一旦看到已知粉丝就提前停止（更早的粉丝都已在上次快照中）。
+        返回 (扫描到的粉丝集合, 是否滚动到了列表末尾)。
+        """
+        self._open(f'https://weibo.com/u/page/follow/{self.account_id}?relate=fans', 'fans')
+
+        button = self._find('fans.sort_button') 
+        button.click()
+        
+        button = self._find('fans.sort_latest') 
+        button.click()
+
+        self._find('fans.item')
+
+        scanned = set()
+        scan = self._scroll_scan(
+            lambda: extract_links(self.bot, self.selectors, 'fans.item'),
+            key=lambda href: href.split('/')[-1],
+            step='fans.scroll',
+        )
+        for fan, _ in scan:
+            if known and fan in known:
+                return scanned, False
+            scanned.add(fan)
+
+        return scanned, True
+
+    def _record_fans(self, scanned, complete):
+        info = self.fan_store.record(self.account_id, scanned, complete)
+        self.fans = set(info['fans'])
+        return info
+
+    def _read_fans(self, known):
+        return self._read("粉丝列表", lambda transport: transport.scan_fans(self.account_id, known))
+
+    def _sync_fans(self, full=False):
+        """登录时调用，调用方已持有 seleniumLock。"""
+        known = None if full else self.fan_store.fans(self.account_id)
+        result = self._read_fans(known)
+        return self._record_fans(*(result if result is not None else self._scan_fans(known)))
+
+    def update_fans_list(self, full=False):
+        # 传输层读取成功时不占用浏览器，也不会为此启动浏览器
+        known = None if full else self.fan_store.fans(self.account_id)
+        result = self._read_fans(known)
         try:
-            self.bot.get(f'https://weibo.com/u/page/follow/{self.account_id}?relate=fans')
-            
-            button = WebDriverWait(self.bot, 50).until(
-                EC.presence_of_element_located((
-                    By.XPATH,
-                    "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/div/div[1]/div/div/span/div/button"
-                ))
-            ) 
-            button.click()
-            
-            button = WebDriverWait(self.bot, 50).until(
-                EC.presence_of_element_located((
-                    By.XPATH,
-                    "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/div/div[1]/div/div/div/div/button[2]"
-                ))
-            ) 
-            button.click()
-
-            fail_cnt = 0
-            while True:
-                fans = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_all_elements_located((
-                        By.XPATH,
-                        "//*[@class='ALink_none_1w6rm UserCard_item_TrVS0']"
-                    ))
-                )
-                new_fan_cnt = 0
-                for fan in fans:
-                    fan_account_id = fan.get_attribute('href').split('/')[-1]                            
-                    if fan_account_id not in self.fans:
-                        self.fans.append(fan_account_id)
-                        new_fan_cnt += 1
-
-                if new_fan_cnt == 0:
-                    fail_cnt += 1
-                if fail_cnt == 3:
-                    break
-
-                self.bot.execute_script('window.scrollBy(0, 500);')
-                sleep(2)
+            if result is None:
+                with self.seleniumLock:
+                    if self.online_state != 'on':
+                        raise Exception("未登录")
+                    self._tick_driver()
+                    self._validate_session()
+                    result = self._scan_fans(known)
+
+            info = self._record_fans(*result)
+            print(f"{self.username} 获取粉丝列表")
+            return info
 
         except TimeoutException as e:
             print(self.username, "获取粉丝列表超时:", str(e))
+            return None
         except Exception as e:
             print(self.username, "获取粉丝列表发生错误:", str(e))
+            return None
 
-    def update_fans_list(self):
-        with self.seleniumLock:
-            try:
-                if self.online_state != 'on':
-                    raise Exception("未登录")
-
-                self.bot.get(f'https://weibo.com/u/page/follow/{self.account_id}?relate=fans')
-
-                button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/div/div[1]/div/div/span/div/button"
-                    ))
-                ) 
-                button.click()
-                
-                button = WebDriverWait(self.bot, 50).until(
-                    EC.presence_of_element_located((
-                        By.XPATH,
-                        "//*[@id='app']/div[2]/div[2]/div[2]/main/div/div/div[2]/div/div[1]/div/div/div/div/button[2]"
-                    ))
-                ) 
-                button.click()
-
-                cur_fans = []
-                fail_cnt = 0
-                while True:
-                    fans = WebDriverWait(self.bot, 50).until(
-                        EC.presence_of_all_elements_located((
-                            By.XPATH,
-                            "//*[@class='ALink_none_1w6rm UserCard_item_TrVS0']"
-                        ))
-                    )
-                    new_fan_cnt = 0
-                    for fan in fans:
-                        fan_account_id = fan.get_attribute('href').split('/')[-1]                            
-                        if fan_account_id not in cur_fans:
-                            cur_fans.append(fan_account_id)
-                            new_fan_cnt += 1
-
-                    if new_fan_cnt == 0:
-                        fail_cnt += 1
-                    if fail_cnt == 3:
-                        break
-
-                    self.bot.execute_script('window.scrollBy(0, 500);')
-                    sleep(2)
-
-                follows = []
-                unfollows = []
-                
-                for fan in cur_fans:
-                    if fan not in self.fans:
-                        follows.append(fan)
-                for fan in self.fans:
-                    if fan not in cur_fans:
-                        unfollows.append(fan)
-
-                self.fans = cur_fans
-                print(f"{self.username} 获取粉丝列表")
-                return {
-                    "fans": self.fans,
-                    "follows": follows,
-                    "unfollows": unfollows,
-                }
-
-            except TimeoutException as e:
-                print(self.username, "获取粉丝列表超时:", str(e))
-                return None
-            except Exception as e:
-                print(self.username, "获取粉丝列表发生错误:", str(e))
-                return None
+    def get_fans_deltas(self, since=None):
+        """直接从粉丝快照库读取关注/取关变化，不操作浏览器。"""
+        return self.fan_store.deltas(self.account_id, since)
@@ -1,200 +1,409 @@
 from weibo_service.WeiboBot import WeiboBot
 from weibo_service.WeiboAct import *
+from weibo_service.analytics import AnalyticsStore
+from weibo_service.detail_cache import get_detail_cache
+from weibo_service.engagement import EngagementStore
+from weibo_service.fans_store import FanStore
+from weibo_service.idempotency import ActionLogError, get_idempotency_store
+from weibo_service.repository import parse_count
+from weibo_service.retention import RetentionManager
+from weibo_service.scheduler import ACTION, FEEDBACK, READ, AccountScheduler, BrowserGate
+from weibo_service.search import get_search_index
+from weibo_service.selector_registry import default_registry
+from weibo_service.sessions import SessionStore
+from weibo_service.writer import get_writer
 
+import os
 import threading
 import random
-from time import sleep
+from concurrent.futures import Future
+from contextlib import contextmanager
+from time import monotonic, sleep
 
-class WeiboActThread(threading.Thread):
-    def __init__(self, group=None, target=None, name=None, args=(), kwargs={}):
-        super(WeiboActThread, self).__init__(group, target, name, args, kwargs)
+class WeiboBots:
+    """
+    账号 bot 注册表。
 
-    def run(self):
-        if self._target:
-            self._return = self._target(*self._args, **self._kwargs)
-    
-    def join(self, *args):
-        threading.Thread.join(self, *args)
-        return self._return
+    默认按需启动：账号第一次被请求时才创建浏览器并登录（WEIBO_LAZY_BOTS=0 时启动即全部登录）。
+    空闲超过 WEIBO_BOT_IDLE_TTL 秒（默认 1800，0 表示不休眠）的 bot 会被休眠：关闭浏览器，
+    会话快照保留在库中，下次请求时直接恢复。
 
-class WeiboBots:
-    def __init__(self, account_list):
+    每个账号的请求在该账号自己的队列中依次执行（见 scheduler.py），
+    全局的浏览器并发上限只在 bot 实际操作浏览器时占用。
+    submit_* 接口把请求放进账号队列后立即返回 concurrent.futures.Future，同步接口等价于 submit_*().result()。
+    """
+
+    def __init__(self, account_list, driver_pool=None, lazy=None, idle_ttl=None, feedback_max_age=None,
+                 state_fanout=None):
+        self.account_infos = {str(bot_info['account_id']): bot_info for bot_info in account_list}
         self.bots = {}
+        self.driver_pool = driver_pool
+        self.fan_store = FanStore()
+        self.engagement_store = EngagementStore()
+        self.idempotency_store = get_idempotency_store()
+        # 只读统计查询，不经过 bot
+        self.analytics = AnalyticsStore()
+        self.session_store = SessionStore()
+        self.selectors = default_registry()
         self.init_lock = threading.Lock()
-        self.semaphore = threading.Semaphore(10)
+        self.browser_gate = BrowserGate()
+        self.scheduler = AccountScheduler()
+
+        self.lazy = lazy if lazy is not None else os.getenv("WEIBO_LAZY_BOTS", "1") != "0"
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.getenv("WEIBO_BOT_IDLE_TTL", "1800"))
+        # 互动数据在该秒数内观测过时直接从库中返回（默认 0，每次都重新抓取）
+        self.feedback_max_age = (
+            feedback_max_age if feedback_max_age is not None
+            else float(os.getenv("WEIBO_FEEDBACK_MAX_AGE", "0"))
+        )
+        # 粉丝反馈默认增量扫描，只能发现新增关注；距上次完整扫描超过该秒数时改为完整扫描以发现取关
+        self.fans_full_scan_interval = float(os.getenv("WEIBO_FANS_FULL_SCAN_INTERVAL", "86400"))
+        # get_state 同时获取首页和热门微博（WEIBO_STATE_FANOUT=0 时依次获取）
+        self.state_fanout = (
+            state_fanout if state_fanout is not None else os.getenv("WEIBO_STATE_FANOUT", "1") != "0"
+        )
+        self._start_locks = {account_id: threading.Lock() for account_id in self.account_infos}
+        self._last_used = {}
+        self._in_use = {}
+        self._closed = threading.Event()
+
+        if not self.lazy:
+            futures = {
+                account_id: self.scheduler.submit(account_id, self._get_bot, account_id)
+                for account_id in self.account_infos
+            }
+            for account_id, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Bot {account_id} 启动失败:", str(e))
+
+        if self.idle_ttl > 0:
+            threading.Thread(target=self._reap_idle, daemon=True).start()
 
-        threads = []
-        for bot_info in account_list:
-            thread = threading.Thread(target=self._start_bot, args=(bot_info,))
-            threads.append(thread)
-            thread.start()  
-        
-        for thread in threads:
-            thread.join()
+        # WEIBO_RETENTION_INTERVAL 秒（默认 0，不自动执行）归档一次过期数据
+        retention_interval = float(os.getenv("WEIBO_RETENTION_INTERVAL", "0"))
+        self._retention_stop = RetentionManager().start(retention_interval) if retention_interval > 0 else None
 
     def _start_bot(self, bot_info):
-        with self.semaphore:
-            bot = WeiboBot(bot_info)
+        bot = WeiboBot(
+            bot_info,
+            driver_pool=self.driver_pool,
+            fan_store=self.fan_store,
+            session_store=self.session_store,
+            selectors=self.selectors,
+            browser_gate=self.browser_gate,
+        )
+        print(f"Bot {bot_info['account_id']} initialized.")
+
+        if bot_info['online_state'] == 'on':
+            bot.login()
+        return bot
+
+    def _get_bot(self, agent_id):
+        """返回账号对应的 bot，尚未启动或已休眠时现在启动。"""
+        key = str(agent_id)
+        if key not in self.account_infos:
+            raise KeyError(agent_id)
+
+        with self._start_locks[key]:
+            with self.init_lock:
+                bot = self.bots.get(key)
+            if bot is None:
+                bot = self._start_bot(self.account_infos[key])
+                with self.init_lock:
+                    self.bots[key] = bot
+            with self.init_lock:
+                self._last_used[key] = monotonic()
+        return bot
+
+    @contextmanager
+    def _use_bot(self, agent_id):
+        """使用期间该 bot 不会被休眠。"""
+        key = str(agent_id)
+        with self.init_lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        try:
+            yield self._get_bot(agent_id)
+        finally:
+            with self.init_lock:
+                self._in_use[key] -= 1
+                self._last_used[key] = monotonic()
+
+    def hibernate(self, agent_id):
+        """关闭账号的浏览器，会话快照和粉丝快照保留在库中。"""
+        key = str(agent_id)
+        with self._start_locks[key]:
+            with self.init_lock:
+                if self._in_use.get(key):
+                    return False
+                bot = self.bots.pop(key, None)
+            if bot is None:
+                return False
+            bot.close()
+            print(f"Bot {key} hibernated.")
+            return True
 
+    def _reap_idle(self):
+        while not self._closed.wait(min(self.idle_ttl / 2, 60)):
+            now = monotonic()
             with self.init_lock:
-                self.bots[bot_info['account_id']] = bot
-                print(f"Bot {bot_info['account_id']} initialized.")
+                idle = [
+                    key for key in self.bots
+                    if not self._in_use.get(key) and now - self._last_used.get(key, now) >= self.idle_ttl
+                ]
+            for key in idle:
+                try:
+                    self.hibernate(key)
+                except Exception as e:
+                    print(f"Bot {key} 休眠发生错误:", str(e))
 
-            if bot_info['online_state'] == 'on':
-                bot.login()
+    def active_accounts(self):
+        with self.init_lock:
+            return list(self.bots)
+
+    def close(self):
+        self._closed.set()
+        # 已排队的请求执行完后再关闭浏览器
+        self.scheduler.close()
+        if self._retention_stop is not None:
+            self._retention_stop.set()
+        for key in self.active_accounts():
+            self.hibernate(key)
+        get_writer().flush()
     
-    def get_state(self, agent_id, n_following=2, n_recommend=2):
-        with self.semaphore:
-            print(agent_id)
-            try:
-                bot = self.bots[agent_id]
-            except KeyError:
-                print(f"Bot {agent_id} not found.")
-                return None
-            print("get_homepage_weibos")
-            following_infos = get_homepage_weibos(bot, n_following)
-            print("get_hot_weibos")
-            hot_infos = get_hot_weibos(bot, n_recommend)
+    @staticmethod
+    def _completed(result):
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def _submit(self, agent_id, fn, priority=READ):
+        """
+        把 fn() 放进账号自己的队列，返回 Future。
+        结果在账号队列的工作线程中算好，调用方不需要占着线程等待。
+        """
+        if str(agent_id) not in self.account_infos:
+            raise KeyError(agent_id)
+        return self.scheduler.submit(agent_id, fn, priority=priority)
+
+    def _submit_bot(self, agent_id, fn, priority=READ):
+        """同 _submit，fn 以账号的 bot 为参数。"""
+        def work():
+            with self._use_bot(agent_id) as bot:
+                return fn(bot)
+        return self._submit(agent_id, work, priority)
 
+    def submit_state(self, agent_id, n_following=10, n_recommend=10):
+        print(agent_id)
+        if str(agent_id) not in self.account_infos:
+            print(f"Bot {agent_id} not found.")
+            return self._completed(None)
+
+        def browse(bot):
+            if self.state_fanout:
+                print("get_feed_weibos")
+                following_infos, hot_infos = get_feed_weibos(bot, n_following, n_recommend)
+            else:
+                print("get_homepage_weibos")
+                following_infos = get_homepage_weibos(bot, n_following)
+                print("get_hot_weibos")
+                hot_infos = get_hot_weibos(bot, n_recommend)
             return {
-                'post_from_followings': [{
-                    'uid': info['account_id'],
-                    'weibo_id': info['weibo_id'],
-                    'user_name': info['username'],
-                    'user_tag': info['user_tag'],
-                    'time': info['time'],
-                    'text': info['text'],
-                    'img': info['imgs'],
-                    'video': info['video'],
-                    'like': info['like_num'],
-                    'comment': info['comment_num'],
-                    'repost': info['repost_num'],
-                } for info in following_infos],
-
-                'post_from_recommends': [{
-                    'uid': info['account_id'],
-                    'weibo_id': info['weibo_id'],
-                    'user_name': info['username'],
-                    'user_tag': info['user_tag'],
-                    'time': info['time'],
-                    'text': info['text'],
-                    'img': info['imgs'],
-                    'video': info['video'],
-                    'like': info['like_num'],
-                    'comment': info['comment_num'],
-                    'repost': info['repost_num'],
-                } for info in hot_infos],
+                'post_from_followings': [self._weibo_record(info) for info in following_infos if info is not None],
+                'post_from_recommends': [self._weibo_record(info) for info in hot_infos if info is not None],
             }
+        return self._submit_bot(agent_id, browse)
 
-    def update_state(self, action):
-        with self.semaphore:
-            bot = self.bots[action['agent_id']]
+    def get_state(self, agent_id, n_following=2, n_recommend=2):
+        return self.submit_state(agent_id, n_following, n_recommend).result()
+
+    @staticmethod
+    def _weibo_record(info):
+        # 抓取到的计数是页面文字，缓存和库中的是整数，统一转换为整数
+        return {
+            'uid': info['account_id'],
+            'weibo_id': info['weibo_id'],
+            'user_name': info['username'],
+            'user_tag': info['user_tag'],
+            'time': info['time'],
+            'text': info['text'],
+            'img': info['imgs'],
+            'video': info['video'],
+            'like': parse_count(info['like_num']),
+            'comment': parse_count(info['comment_num']),
+            'repost': parse_count(info['repost_num']),
+        }
+
+    @staticmethod
+    def _action_result(action_type, info):
+        if info is None:
+            return False
+        if action_type == 'post':
+            return info['weibo_id']
+        if action_type in ('follow', 'unfollow'):
+            return info
+        return True
+
+    def _perform(self, bot, action, key):
+        if action['type'] == 'post':
+            return post(bot, action['action_content'], idempotency_key=key)
+
+        if action['type'] == 'repost':
+            account_id, weibo_id = action['object'].split('/')
+            return repost(bot, account_id, weibo_id, action['action_content'], idempotency_key=key)
+
+        if action['type'] == 'comment':
+            account_id, weibo_id = action['object'].split('/')
+            return comment(bot, account_id, weibo_id, action['action_content'], idempotency_key=key)
+
+        if action['type'] == 'like':
+            account_id, weibo_id = action['object'].split('/')
+            return like(bot, account_id, weibo_id, idempotency_key=key)
+
+        if action['type'] == 'follow':
+            return follow(bot, action['object'], idempotency_key=key)
+
+        if action['type'] == 'unfollow':
+            return unfollow(bot, action['object'], idempotency_key=key)
+
+    def submit_action(self, action):
+        """
+        执行一个动作。action 带 idempotency_key 时，同一个键只执行一次，重试直接返回第一次的结果；
+        键冲突、仍在执行或结果未知时 Future 抛出 IdempotencyError。
+        """
+        def run():
+            key = action.get('idempotency_key')
+            if key:
+                recorded = self.idempotency_store.begin(key, action)
+                if recorded is not None:
+                    return self._action_result(action['type'], recorded)
+
+            info = None
+            submitted = False
             try:
-                if action['type'] == 'post':
-                    info = post(bot, action['action_content'])
-                    if info == None:
-                        return False
-                    return info['weibo_id']
-            
-                if action['type'] == 'repost':
-                    account_id, weibo_id = action['object'].split('/')
-                    info = repost(bot, account_id, weibo_id, action['action_content'])
-                    if info == None:
-                        return False
-                    return True
-            
-                if action['type'] == 'comment':
-                    account_id, weibo_id = action['object'].split('/')
-                    info = comment(bot, account_id, weibo_id, action['action_content'])
-                    if info == None:
-                        return False
-                    return True
-                
-                if action['type'] == 'like':
-                    account_id, weibo_id = action['object'].split('/')
-                    info = like(bot, account_id, weibo_id)
-                    if info == None:
-                        return False
-                    return True
-                
-                if action['type'] == 'follow':
-                    info = follow(bot, action['object'])
-                    if info == None:
-                        return False
-                    return info
-                
-                if action['type'] == 'unfollow':
-                    info = unfollow(bot, action['object'])
-                    if info == None:
-                        return False
-                    return info
-            except Exception:
-                return False
+                with self._use_bot(action['agent_id']) as bot:
+                    bot.action_submitted = False
+                    try:
+                        info = self._perform(bot, action, key)
+                    except ActionLogError as e:
+                        # 动作已经执行，保留 pending 记录，避免客户端重试时重复执行
+                        print(bot.username, "动作已执行但记录失败:", str(e))
+                        key = None
+                    except Exception:
+                        info = None
+                    submitted = bot.action_submitted
+            finally:
+                if key and info is None:
+                    if submitted:
+                        # 已经点击提交，动作可能已生效，不能让客户端用同一个键重试
+                        self.idempotency_store.mark_unknown(key)
+                    else:
+                        self.idempotency_store.release(key)
+            return self._action_result(action['type'], info)
+        return self._submit(action['agent_id'], run, priority=ACTION)
+
+    def update_state(self, action):
+        return self.submit_action(action).result()
+
+    def submit_feedback(self, agent_id, weibo_id=None, max_age=None, full=None):
+        """
+        weibo_id 为空时返回粉丝变化，否则返回该微博的互动数据及相对上一次观测的变化（delta）。
+        max_age 秒内观测过的微博直接从库中返回，不再抓取。
+        full 指定粉丝列表是否完整扫描（只有完整扫描能发现取关），为空时按 WEIBO_FANS_FULL_SCAN_INTERVAL 定期完整扫描。
+        """
+        max_age = self.feedback_max_age if max_age is None else max_age
+        if weibo_id is not None:
+            cached = self.engagement_store.fresh(agent_id, weibo_id, max_age)
+            if cached is not None:
+                info = self.engagement_store.delta(agent_id, weibo_id)
+                info['comment_content'] = self.engagement_store.comments(agent_id, weibo_id)
+                return self._completed(info)
 
-    def get_feedback(self, agent_id, weibo_id=None):
-        with self.semaphore:
-            bot = self.bots[agent_id]
-            
-            if weibo_id  == None:
-                info = bot.update_fans_list()
+        if weibo_id  == None:
+            def scan(bot):
+                full_scan = full
+                if full_scan is None:
+                    full_scan = self.fan_store.needs_full_scan(agent_id, self.fans_full_scan_interval)
+                info = bot.update_fans_list(full=full_scan)
+                if info is None:
+                    return None
                 info['fans_number'] = len(info['fans'])
                 return info
-            else:
-                info = bot.get_weibo_info(agent_id, weibo_id, 100)
-                return {
-                    'like': int(info['like_num']),
-                    'comment': int(info['comment_num']),
-                    'repost': int(info['repost_num']),
-                    'comment_content': info['comment']
-                }
+            return self._submit_bot(agent_id, scan, priority=FEEDBACK)
 
-    def get_record(self, object):
-        with self.semaphore:
-            bot = random.choice(list(self.bots.values()))
+        def observe(bot):
+            info = bot.get_weibo_info(agent_id, weibo_id, 100)
+            if info is None:
+                return None
+            result = self.engagement_store.observe(
+                agent_id, weibo_id, info['like_num'], info['comment_num'], info['repost_num'], get_writer()
+            )
+            result['comment_content'] = info['comment']
+            return result
+        return self._submit_bot(agent_id, observe, priority=FEEDBACK)
+
+    def get_feedback(self, agent_id, weibo_id=None, max_age=None, full=None):
+        return self.submit_feedback(agent_id, weibo_id, max_age, full).result()
+
+    def get_engagement(self, uid, weibo_id, granularity='hour', since=None):
+        """从时间序列中读取互动曲线和相对 since 的变化，不占用浏览器。"""
+        return {
+            'latest': self.engagement_store.delta(uid, weibo_id, since),
+            'history': self.engagement_store.history(uid, weibo_id, granularity, since),
+        }
+
+    def get_engagement_growth(self, granularity='day', since=None, metric='like', limit=20):
+        return self.engagement_store.top_growth(granularity, since, metric, limit)
+
+    def get_fans_deltas(self, agent_id, since=None):
+        return self.fan_store.deltas(agent_id, since)
+
+    def search(self, query, limit=20, offset=0, source=None, uid=None):
+        # 只读本地索引，不占用浏览器
+        return get_search_index().search(query, limit=limit, offset=offset, source=source, uid=uid)
+
+    def submit_record(self, object):
+        def read():
+            # 解析和缓存查询都在任务中执行，格式错误等异常通过 Future 抛出
             agent_id, weibo_id = object.split('/')
-            info = bot.get_weibo_info(agent_id, weibo_id)
-            return {
-                'uid': info['account_id'],
-                'weibo_id': info['weibo_id'],
-                'user_name': info['username'],
-                'user_tag': info['user_tag'],
-                'time': info['time'],
-                'text': info['text'],
-                'img': info['imgs'],
-                'video': info['video'],
-                'like': info['like_num'],
-                'comment': info['comment_num'],
-                'repost': info['repost_num'],
-            }
+            info = get_detail_cache().get(agent_id, weibo_id)
+            if info is None:
+                with self._use_bot(reader) as bot:
+                    info = bot.get_weibo_info(agent_id, weibo_id)
+                if info is None:
+                    return None
+                get_detail_cache().put(info)
+            return self._weibo_record(info)
 
-    def get_state_thread(self, agent_id, n_following=10, n_recommend=10):
-        thread = WeiboActThread(target=self.get_state, args=(
-            agent_id,
-            n_following,
-            n_recommend,
-        ))
-        thread.start()
-        return thread
-
-    def update_state_thread(self, action):
-        thread = WeiboActThread(target=self.update_state, args=(
-            action,
-        ))
-        thread.start()
-        return thread
-
-    def get_feedback_thread(self, agent_id, weibo_id=None):
-        thread = WeiboActThread(target=self.get_feedback, args=(
-            agent_id,
-            weibo_id,
-        ))
-        thread.start()
-        return thread
-    
-    def get_record_thread(self, object):
-        thread = WeiboActThread(target=self.get_record, args=(
-            object,
-        ))
-        thread.start()
-        return thread
-    
+        # 优先使用已经启动的 bot，避免为一次查询启动新的浏览器
+        reader = random.choice(self.active_accounts() or list(self.account_infos))
+        return self._submit(reader, read)
+
+    def get_record(self, object):
+        return self.submit_record(object).result()
+
+    def wait_stats(self):
+        with self.init_lock:
+            bots = dict(self.bots)
+        return {account_id: bot.waits.stats() for account_id, bot in bots.items()}
+
+    def selector_stats(self):
+        return self.selectors.stats()
+
+    def writer_stats(self):
+        return get_writer().stats()
+
+    def detail_cache_stats(self):
+        return get_detail_cache().stats()
+
+    def scheduler_stats(self):
+        return {
+            'browser': self.browser_gate.stats(),
+            'accounts': self.scheduler.stats(),
+            'queue': self.scheduler.pending_stats(),
+        }
+
+    def drain(self, agent_id=None, timeout=None):
+        """等待账号（为空时为全部账号）已提交的请求完成，返回超时后仍未完成的数量。"""
+        return self.scheduler.drain(agent_id, timeout)
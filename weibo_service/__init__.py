@@ -1,13 +1,15 @@
 from .WeiboAct import *
 from .WeiboBot import WeiboBot
 from .WeiboBots import WeiboBots
+from .driver_pool import DriverPool
 from .backend import create_app
 from agent.weibo_agent import create_weibo_langchain_agent, run_langchain_cli
-from agent.weibo_tools import WeiboActionTool, WeiboFeedbackTool, WeiboGetStateTool, WeiboRecordTool, WeiboServiceToolkit
+from agent.weibo_tools import WeiboActionTool, WeiboFeedbackTool, WeiboGetStateTool, WeiboRecordTool, WeiboSearchTool, WeiboServiceToolkit
 
 __all__ = [
     "WeiboBot",
     "WeiboBots",
+    "DriverPool",
     "create_app",
     "create_weibo_langchain_agent",
     "run_langchain_cli",
@@ -16,4 +18,5 @@ __all__ = [
     "WeiboActionTool",
     "WeiboFeedbackTool",
     "WeiboRecordTool",
+    "WeiboSearchTool",
 ]
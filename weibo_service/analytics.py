@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+本地统计查询：只读 WeiboAct.db 中预先汇总好的数据，不占用任何 bot 的浏览器。
+
+- 每个账号每天的动作数（ActionDaily）、互动最多的作者（AuthorInteraction）、粉丝增长（FanDaily）
+  由触发器在写入原始记录时增量维护；单条微博的互动数据取自 EngagementDaily。
+- 所有查询都按排序键做游标分页：返回 next_cursor，下一页带上它即可继续，
+  翻页代价与页码无关，iterate() 沿游标逐页读取，供 NDJSON 流式输出使用。
+"""
+import base64
+import json
+
+from weibo_service.repository import COMMENT, FOLLOW, LIKE, POST, REPOST, UNFOLLOW, get_repository
+
+ACTION_NAMES = {
+    POST: 'post',
+    LIKE: 'like',
+    COMMENT: 'comment',
+    REPOST: 'repost',
+    FOLLOW: 'follow',
+    UNFOLLOW: 'unfollow',
+}
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"无效的游标: {cursor}")
+    return values
+
+
+class AnalyticsStore:
+    def __init__(self, db_path=None):
+        self.repository = get_repository(db_path)
+
+    def _page(self, source, keys, conditions, params, cursor, limit, descending=False, row=None):
+        """
+        在 source（表名或子查询）上按 keys 做游标分页，返回 {'data': [...], 'next_cursor': ...}。
+        row 把一行结果（前几列为 keys）转换为输出的 dict。
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        conditions, params = list(conditions), list(params)
+        if cursor:
+            values = decode_cursor(cursor)
+            if len(values) != len(keys):
+                raise ValueError(f"无效的游标: {cursor}")
+            # 行值比较，可以直接利用 keys 上的主键或索引
+            conditions.append(f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' * len(keys))})")
+            params.extend(values)
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        order = ', '.join(f"{key} {'DESC' if descending else 'ASC'}" for key in keys)
+
+        rows = self.repository.query(
+            f'SELECT * FROM {source} {where} ORDER BY {order} LIMIT ?', params + [limit + 1]
+        )
+        next_cursor = encode_cursor(list(rows[limit - 1][:len(keys)])) if len(rows) > limit else None
+        return {'data': [row(item) for item in rows[:limit]], 'next_cursor': next_cursor}
+
+    def actions_per_day(self, account_id=None, since=None, until=None, cursor=None, limit=100):
+        """每个账号每天各类动作的次数，按 (日期, 账号, 动作) 排序。"""
+        conditions, params = [], []
+        if account_id:
+            conditions.append('uid = ?')
+            params.append(str(account_id))
+        if since:
+            conditions.append('day >= ?')
+            params.append(since[:10])
+        if until:
+            conditions.append('day < ?')
+            params.append(until[:10])
+        return self._page(
+            '(SELECT day, uid, action, count FROM ActionDaily)', ('day', 'uid', 'action'),
+            conditions, params, cursor, limit,
+            row=lambda r: {'day': r[0], 'account_id': r[1], 'action': ACTION_NAMES.get(r[2], r[2]), 'count': r[3]},
+        )
+
+    def post_engagement(self, uid=None, weibo_id=None, since=None, until=None, cursor=None, limit=100):
+        """单条微博每天的互动计数与增量，按 (日期, uid, weibo_id) 排序。"""
+        conditions, params = [], []
+        if uid:
+            conditions.append('uid = ?')
+            params.append(str(uid))
+        if weibo_id:
+            conditions.append('weibo_id = ?')
+            params.append(str(weibo_id))
+        if since:
+            conditions.append('bucket >= ?')
+            params.append(since[:10])
+        if until:
+            conditions.append('bucket < ?')
+            params.append(until[:10])
+        return self._page(
+            '''(SELECT bucket, uid, weibo_id, like, comment, repost, like_gain, comment_gain, repost_gain, samples
+                FROM EngagementDaily)''',
+            ('bucket', 'uid', 'weibo_id'),
+            conditions, params, cursor, limit,
+            row=lambda r: {
+                'day': r[0],
+                'object_id': f'{r[1]}/{r[2]}',
+                'like': r[3],
+                'comment': r[4],
+                'repost': r[5],
+                'gain': {'like': r[6], 'comment': r[7], 'repost': r[8]},
+                'samples': r[9],
+            },
+        )
+
+    def fan_growth(self, account_id=None, since=None, until=None, cursor=None, limit=100):
+        """每个账号每天的新增关注、取关以及当天最后一次快照的粉丝数。"""
+        conditions, params = [], []
+        if account_id:
+            conditions.append('account_id = ?')
+            params.append(str(account_id))
+        if since:
+            conditions.append('day >= ?')
+            params.append(since[:10])
+        if until:
+            conditions.append('day < ?')
+            params.append(until[:10])
+        return self._page(
+            '(SELECT day, account_id, follows, unfollows, fans_number FROM FanDaily)', ('day', 'account_id'),
+            conditions, params, cursor, limit,
+            row=lambda r: {
+                'day': r[0],
+                'account_id': r[1],
+                'follows': r[2],
+                'unfollows': r[3],
+                'net': r[2] - r[3],
+                'fans_number': r[4],
+            },
+        )
+
+    def top_authors(self, account_id=None, cursor=None, limit=50):
+        """互动次数最多的作者，按总次数降序；account_id 为空时统计所有账号。"""
+        conditions, params = [], []
+        if account_id:
+            conditions.append('account_id = ?')
+            params.append(str(account_id))
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        source = f'''(
+            SELECT SUM(count) AS total, author_uid,
+                   {', '.join(f"SUM(CASE WHEN action = {action} THEN count ELSE 0 END)"
+                              for action in (LIKE, COMMENT, REPOST, FOLLOW, UNFOLLOW))},
+                   MAX(last_time)
+            FROM AuthorInteraction {where} GROUP BY author_uid
+        )'''
+        # 过滤条件已经放进子查询，这里的参数要排在游标参数前面
+        return self._page(
+            source, ('total', 'author_uid'), [], params, cursor, limit, descending=True,
+            row=lambda r: {
+                'author_uid': r[1],
+                'total': r[0],
+                'actions': {
+                    ACTION_NAMES[action]: r[2 + index]
+                    for index, action in enumerate((LIKE, COMMENT, REPOST, FOLLOW, UNFOLLOW))
+                },
+                'last_time': r[7],
+            },
+        )
+
+    def iterate(self, query, **filters):
+        """沿游标逐页读取 query（本类的查询方法名）的全部结果。"""
+        method = getattr(self, query)
+        cursor = None
+        while True:
+            page = method(cursor=cursor, limit=MAX_PAGE_SIZE, **filters)
+            yield from page['data']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return
@@ -1,12 +1,15 @@
+import json
 import logging
 import os
+import sqlite3
 import sys
 import time
 from logging.handlers import RotatingFileHandler
 from typing import Any, Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 if __package__ in (None, ""):
@@ -15,8 +18,10 @@ if __package__ in (None, ""):
     if PARENT_DIR not in sys.path:
         sys.path.append(PARENT_DIR)
     from WeiboBots import WeiboBots  # type: ignore
+    from driver_pool import DriverPool  # type: ignore
 else:
     from .WeiboBots import WeiboBots
+    from .driver_pool import DriverPool
 
 
 def _setup_logger() -> logging.Logger:
@@ -80,6 +85,10 @@ class ActionPayload(BaseModel):
         None,
         description="目标 uid 或 uid/weibo_id",
     )
+    idempotency_key: Optional[str] = Field(
+        None,
+        description="幂等键，可选；重试时使用同一个键不会重复执行，也可通过 Idempotency-Key 请求头传入",
+    )
 
 
 class FeedbackPayload(BaseModel):
@@ -88,6 +97,14 @@ class FeedbackPayload(BaseModel):
         None,
         description="微博 ID，可选",
     )
+    max_age: Optional[float] = Field(
+        None,
+        description="秒；该时间内观测过的微博直接返回库中的数据，缺省取 WEIBO_FEEDBACK_MAX_AGE",
+    )
+    full: Optional[bool] = Field(
+        None,
+        description="粉丝列表是否完整扫描（完整扫描才能发现取关），缺省时按 WEIBO_FANS_FULL_SCAN_INTERVAL 定期完整扫描",
+    )
 
 
 class RecordPayload(BaseModel):
@@ -98,7 +115,13 @@ def create_app(account_list: List[Dict[str, Any]]) -> FastAPI:
     if not account_list:
         raise ValueError("account_list cannot be empty.")
 
-    bots = WeiboBots(account_list)
+    # WEIBO_DRIVER_POOL_SIZE > 0 时预启动浏览器池，账号按需租借
+    pool_size = int(os.getenv("WEIBO_DRIVER_POOL_SIZE", "0"))
+    driver_pool = (
+        DriverPool(size=pool_size, profile=os.getenv("WEIBO_RESOURCE_PROFILE", "scrape"))
+        if pool_size > 0 else None
+    )
+    bots = WeiboBots(account_list, driver_pool=driver_pool)
     LOGGER.info("Backend initialized with %d accounts: %s", len(account_list), [acct["account_id"] for acct in account_list])
 
     app = FastAPI(title="Weibo Service Backend", version="1.0.0")
@@ -127,7 +150,41 @@ def create_app(account_list: List[Dict[str, Any]]) -> FastAPI:
 
     @app.get("/health")
     def health():
-        return {"status": "ok", "accounts": [acct["account_id"] for acct in account_list]}
+        return {
+            "status": "ok",
+            "accounts": [acct["account_id"] for acct in account_list],
+            "active_accounts": bots.active_accounts(),
+        }
+
+    @app.get("/waits")
+    def wait_stats():
+        """各账号每个步骤的实际等待耗时，用于调整超时预算。"""
+        return {"success": True, "data": bots.wait_stats()}
+
+    @app.get("/writer")
+    def writer_stats():
+        """后台写入队列的深度、背压和批量提交指标。"""
+        return {"success": True, "data": bots.writer_stats()}
+
+    @app.get("/cache")
+    def detail_cache_stats():
+        """微博详情缓存的命中率、条目数和等待其他 bot 抓取的次数。"""
+        return {"success": True, "data": bots.detail_cache_stats()}
+
+    @app.get("/scheduler")
+    def scheduler_stats():
+        """各账号队列的深度、排队等待时间，以及全局浏览器名额的占用和等待时间。"""
+        return {"success": True, "data": bots.scheduler_stats()}
+
+    @app.on_event("shutdown")
+    def shutdown():
+        # 关闭浏览器并把尚未提交的记录写入数据库
+        bots.close()
+
+    @app.get("/selectors")
+    def selector_stats():
+        """各逻辑元素当前命中的候选选择器及全部未命中的次数。"""
+        return {"success": True, "data": bots.selector_stats()}
 
     @app.post("/state")
     def get_state(payload: StatePayload):
@@ -150,28 +207,36 @@ def create_app(account_list: List[Dict[str, Any]]) -> FastAPI:
             raise HTTPException(status_code=500, detail=str(exc)) from exc
 
     @app.post("/action")
-    def do_action(payload: ActionPayload):
+    def do_action(payload: ActionPayload, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
         agent_id = _normalize_agent_id(payload.agent_id)
         action = {
             "agent_id": agent_id,
             "type": payload.action_type,
             "action_content": payload.action_content,
             "object": payload.target_object,
+            "idempotency_key": payload.idempotency_key or idempotency_key,
         }
         try:
             LOGGER.info("Do action %s", action)
             result = bots.update_state(action)
             return {"success": bool(result), "data": result, "action": action}
         except Exception as exc:
-            LOGGER.exception("Action failed: %s", action)
-            raise HTTPException(status_code=500, detail=str(exc)) from exc
+            # 幂等键冲突或仍在执行时返回 409/422，客户端不应直接重试
+            status_code = getattr(exc, "status_code", 500)
+            if status_code == 500:
+                LOGGER.exception("Action failed: %s", action)
+            else:
+                LOGGER.warning("Action rejected: %s -> %s", action, exc)
+            raise HTTPException(status_code=status_code, detail=str(exc)) from exc
 
     @app.post("/feedback")
     def get_feedback(payload: FeedbackPayload):
         try:
             agent_id = _normalize_agent_id(payload.agent_id)
             LOGGER.info("Get feedback agent_id=%s weibo_id=%s", agent_id, payload.weibo_id)
-            result = bots.get_feedback(agent_id, weibo_id=payload.weibo_id)
+            result = bots.get_feedback(
+                agent_id, weibo_id=payload.weibo_id, max_age=payload.max_age, full=payload.full
+            )
             if result is None:
                 raise HTTPException(status_code=404, detail="未获取到反馈")
             return {"success": True, "data": result}
@@ -181,6 +246,113 @@ def create_app(account_list: List[Dict[str, Any]]) -> FastAPI:
             LOGGER.exception("Get feedback failed agent_id=%s weibo_id=%s", payload.agent_id, payload.weibo_id)
             raise HTTPException(status_code=500, detail=str(exc)) from exc
 
+    @app.get("/fans/{agent_id}/deltas")
+    def get_fans_deltas(agent_id: str, since: Optional[str] = None):
+        """从粉丝快照库读取关注/取关变化，不占用浏览器。"""
+        agent_id = _normalize_agent_id(agent_id)
+        return {"success": True, "data": bots.get_fans_deltas(agent_id, since)}
+
+    @app.get("/engagement/growth")
+    def get_engagement_growth(
+        granularity: str = Query("day", pattern="^(hour|day)$"),
+        since: Optional[str] = None,
+        metric: str = Query("like", pattern="^(like|comment|repost)$"),
+        limit: int = Query(20, ge=1, le=500),
+    ):
+        """since 之后互动增长最多的微博。"""
+        return {"success": True, "data": bots.get_engagement_growth(granularity, since, metric, limit)}
+
+    @app.get("/engagement/{uid}/{weibo_id}")
+    def get_engagement(
+        uid: str,
+        weibo_id: str,
+        granularity: str = Query("hour", pattern="^(hour|day)$"),
+        since: Optional[str] = None,
+    ):
+        """单条微博的互动曲线及相对 since（缺省为上一次观测）的变化，不占用浏览器。"""
+        result = bots.get_engagement(uid, weibo_id, granularity, since)
+        if result["latest"] is None:
+            raise HTTPException(status_code=404, detail="没有该微博的互动记录")
+        return {"success": True, "data": result}
+
+    def _analytics(query: str, cursor: Optional[str], limit: int, stream: bool, **filters):
+        """分页返回统计结果；stream 为真时沿游标读取全部结果，以 NDJSON 逐行输出。"""
+        if stream:
+            rows = bots.analytics.iterate(query, **filters)
+            return StreamingResponse(
+                (json.dumps(row, ensure_ascii=False) + "\n" for row in rows),
+                media_type="application/x-ndjson",
+            )
+        try:
+            page = getattr(bots.analytics, query)(cursor=cursor, limit=limit, **filters)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        return {"success": True, **page}
+
+    @app.get("/analytics/actions")
+    def analytics_actions(
+        account_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        stream: bool = False,
+    ):
+        """每个账号每天的动作次数。"""
+        return _analytics("actions_per_day", cursor, limit, stream, account_id=account_id, since=since, until=until)
+
+    @app.get("/analytics/engagement")
+    def analytics_engagement(
+        uid: Optional[str] = None,
+        weibo_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        stream: bool = False,
+    ):
+        """微博每天的互动计数与增量。"""
+        return _analytics(
+            "post_engagement", cursor, limit, stream, uid=uid, weibo_id=weibo_id, since=since, until=until
+        )
+
+    @app.get("/analytics/fans")
+    def analytics_fans(
+        account_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        stream: bool = False,
+    ):
+        """每个账号每天的粉丝增长。"""
+        return _analytics("fan_growth", cursor, limit, stream, account_id=account_id, since=since, until=until)
+
+    @app.get("/analytics/authors")
+    def analytics_authors(
+        account_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = Query(50, ge=1, le=1000),
+        stream: bool = False,
+    ):
+        """互动次数最多的作者。"""
+        return _analytics("top_authors", cursor, limit, stream, account_id=account_id)
+
+    @app.get("/search")
+    def search(
+        q: str,
+        limit: int = Query(20, ge=1, le=200),
+        offset: int = Query(0, ge=0),
+        source: Optional[str] = Query(None, pattern="^(text|comment)$"),
+        uid: Optional[str] = None,
+    ):
+        """在浏览过的微博正文和评论中全文检索，按相关度排序。"""
+        try:
+            data = bots.search(q, limit=limit, offset=offset, source=source, uid=uid)
+        except sqlite3.OperationalError as exc:
+            raise HTTPException(status_code=400, detail=f"无效的检索词: {exc}") from exc
+        return {"success": True, "data": data}
+
     @app.post("/record")
     def get_record(payload: RecordPayload):
         try:
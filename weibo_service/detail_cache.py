@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+微博详情缓存：以 uid/weibo_id 为键，在所有 bot 之间共享抓取到的微博详情，热门微博不再被重复抓取。
+
+- 字段按变化频率分为三类，各自有独立的有效期：
+  正文、作者、图片、视频等静态字段（WEIBO_DETAIL_STATIC_TTL，默认 86400 秒），
+  点赞/评论/转发计数（WEIBO_DETAIL_COUNTER_TTL，默认 300 秒），
+  评论列表（WEIBO_DETAIL_COMMENT_TTL，默认 600 秒）。三类都在有效期内才算命中；
+  只有计数或评论过期时沿用缓存的静态字段，交给 refresh 只刷新过期的类别。
+- 内存中保留最近 WEIBO_DETAIL_CACHE_SIZE 条（默认 5000），未命中时再从库中拼出：
+  静态字段取自 BrowseInformation（按 fetch_time），计数取自 Engagement，评论取自 WeiboComment，
+  进程重启后依然有效。
+- 同一条微博同时被多个 bot 请求时只抓取一次，其余请求等待结果。
+- 缓存返回的结果带 cached=[沿用的字段类别]，browse_time 为这次浏览的时间，fetch_time 为静态字段的抓取时间：
+  调用方只把刷新过的类别当作新的观测写入，沿用的计数和评论不再写入，否则这些记录会让缓存永远显得新鲜。
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from time import time
+
+from weibo_service.repository import get_repository
+
+STATIC, COUNTERS, COMMENTS = 'static', 'counters', 'comments'
+FIELD_CLASSES = {
+    STATIC: ('username', 'user_tag', 'time', 'text', 'imgs', 'video'),
+    COUNTERS: ('like_num', 'comment_num', 'repost_num'),
+    COMMENTS: ('comment',),
+}
+
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _key(uid, weibo_id):
+    return f'{uid}/{weibo_id}'
+
+
+def _timestamp(value):
+    return datetime.strptime(str(value)[:19], _TIME_FORMAT).timestamp()
+
+
+def _format(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime(_TIME_FORMAT)
+
+
+class DetailCache:
+    def __init__(self, db_path=None, static_ttl=None, counter_ttl=None, comment_ttl=None, max_entries=None,
+                 wait_timeout=120):
+        self.repository = get_repository(db_path)
+        self.ttl = {
+            STATIC: static_ttl if static_ttl is not None else float(os.getenv("WEIBO_DETAIL_STATIC_TTL", "86400")),
+            COUNTERS: counter_ttl if counter_ttl is not None else float(os.getenv("WEIBO_DETAIL_COUNTER_TTL", "300")),
+            COMMENTS: comment_ttl if comment_ttl is not None else float(os.getenv("WEIBO_DETAIL_COMMENT_TTL", "600")),
+        }
+        self.max_entries = max_entries or int(os.getenv("WEIBO_DETAIL_CACHE_SIZE", "5000"))
+        self.wait_timeout = wait_timeout
+
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'db_hits': 0, 'partial': 0, 'misses': 0, 'waits': 0}
+
+    def _stale(self, entry, now):
+        return [name for name in FIELD_CLASSES if now - entry['times'][name] > self.ttl[name]]
+
+    @staticmethod
+    def _result(entry, reused=tuple(FIELD_CLASSES)):
+        """条目的副本，调用方需持有锁。"""
+        info = dict(entry['info'])
+        info['comment'] = list(info['comment'])
+        info['cached'] = list(reused)
+        info['fetch_time'] = _format(entry['times'][STATIC])
+        info['browse_time'] = datetime.now().strftime(_TIME_FORMAT)
+        return info
+
+    def _load(self, uid, weibo_id):
+        """从库中拼出一条详情，没有记录时返回 None。"""
+        static = self.repository.query_one('''
+            SELECT user_name, user_tag, time, text, img, video, fetch_time FROM BrowseInformation
+            WHERE uid = ? AND weibo_id = ? ORDER BY fetch_time DESC LIMIT 1
+        ''', (uid, weibo_id))
+        if static is None:
+            return None
+        counters = self.repository.query_one('''
+            SELECT like, comment, repost, time FROM Engagement
+            WHERE uid = ? AND weibo_id = ? ORDER BY time DESC LIMIT 1
+        ''', (uid, weibo_id))
+        if counters is None:
+            return None
+        comments = self.repository.query('''
+            SELECT content, fetch_time FROM WeiboComment WHERE uid = ? AND weibo_id = ? ORDER BY position
+        ''', (uid, weibo_id))
+
+        return {
+            'info': {
+                'account_id': uid,
+                'weibo_id': weibo_id,
+                'username': static[0],
+                'user_tag': static[1],
+                'time': static[2],
+                'text': static[3],
+                'imgs': json.loads(static[4]) if static[4] else [],
+                'video': static[5],
+                'like_num': counters[0],
+                'comment_num': counters[1],
+                'repost_num': counters[2],
+                'comment': [row[0] for row in comments],
+            },
+            'times': {
+                STATIC: _timestamp(static[6]),
+                COUNTERS: _timestamp(counters[3]),
+                # 没抓到评论时不会写 WeiboComment，以最近一次浏览时间为准
+                COMMENTS: _timestamp(comments[0][1]) if comments else _timestamp(static[6]),
+            },
+        }
+
+    def lookup(self, uid, weibo_id):
+        """
+        返回 (条目, 过期的字段类别)。没有缓存或静态字段已过期时条目为 None，需要完整抓取；
+        条目只能在持有锁时读取。
+        """
+        key = _key(uid, weibo_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        from_db = entry is None
+        if from_db:
+            entry = self._load(str(uid), str(weibo_id))
+
+        stale = self._stale(entry, time()) if entry is not None else list(FIELD_CLASSES)
+        with self._lock:
+            if entry is None or STATIC in stale:
+                self._metrics['misses'] += 1
+                return None, stale
+            if from_db:
+                self._store(key, entry)
+            if stale:
+                self._metrics['partial'] += 1
+            else:
+                self._metrics['db_hits' if from_db else 'hits'] += 1
+        return entry, stale
+
+    def get(self, uid, weibo_id):
+        """三类字段都在有效期内时返回详情的副本，否则返回 None。"""
+        entry, stale = self.lookup(uid, weibo_id)
+        if entry is None or stale:
+            return None
+        with self._lock:
+            return self._result(entry)
+
+    def _refreshed(self, weibo, entry, fields, stale):
+        """把刷新过的字段写回条目，只更新这些类别的时间，返回合并后的详情。"""
+        now = time()
+        with self._lock:
+            entry['info'].update(fields)
+            for name in stale:
+                entry['times'][name] = now
+            self._store(_key(weibo['account_id'], weibo['weibo_id']), entry)
+            return self._result(entry, [name for name in FIELD_CLASSES if name not in stale])
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, info):
+        if info is None:
+            return
+        now = time()
+        with self._lock:
+            self._store(_key(info['account_id'], info['weibo_id']), {
+                'info': dict(info, comment=list(info['comment'])),
+                'times': {name: now for name in FIELD_CLASSES},
+            })
+
+    def fetch_many(self, weibos, fetch, refresh=None):
+        """
+        按输入顺序返回 weibos 的详情：命中缓存的直接返回，其余交给 fetch(未命中的列表) 一次抓取；
+        正在被其他 bot 抓取的微博等待其结果。
+
+        只有计数或评论过期时交给 refresh([(微博, 过期的字段类别), ...])，它按顺序返回各条刷新后的字段
+        （失败项为 None，改为完整抓取）；未提供 refresh 时与未命中相同。
+        """
+        results = [None] * len(weibos)
+        owned, partial, claimed, waiting = [], [], [], []
+        for index, weibo in enumerate(weibos):
+            entry, stale = self.lookup(weibo['account_id'], weibo['weibo_id'])
+            if entry is not None and not stale:
+                with self._lock:
+                    results[index] = self._result(entry)
+                continue
+            key = _key(weibo['account_id'], weibo['weibo_id'])
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    claimed.append(index)
+                    if entry is not None and refresh is not None:
+                        partial.append((index, entry, stale))
+                    else:
+                        owned.append(index)
+                else:
+                    waiting.append((index, event))
+
+        try:
+            if partial:
+                refreshed = refresh([(weibos[index], stale) for index, _, stale in partial])
+                for (index, entry, stale), fields in zip(partial, refreshed):
+                    if fields is None:
+                        owned.append(index)
+                    else:
+                        results[index] = self._refreshed(weibos[index], entry, fields, stale)
+            if owned:
+                for index, info in zip(owned, fetch([weibos[index] for index in owned])):
+                    self.put(info)
+                    results[index] = info
+        finally:
+            with self._lock:
+                for index in claimed:
+                    self._inflight.pop(_key(weibos[index]['account_id'], weibos[index]['weibo_id'])).set()
+
+        for index, event in waiting:
+            with self._lock:
+                self._metrics['waits'] += 1
+            event.wait(self.wait_timeout)
+            key = _key(weibos[index]['account_id'], weibos[index]['weibo_id'])
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and not self._stale(entry, time()):
+                    results[index] = self._result(entry)
+            if results[index] is None:
+                # 另一个 bot 没有抓到，自己再试一次
+                results[index] = fetch([weibos[index]])[0]
+                self.put(results[index])
+        return results
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['entries'] = len(self._entries)
+            metrics['inflight'] = len(self._inflight)
+        lookups = metrics['hits'] + metrics['db_hits'] + metrics['partial'] + metrics['misses']
+        metrics['hit_rate'] = round((metrics['hits'] + metrics['db_hits']) / lookups, 3) if lookups else 0
+        return metrics
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_detail_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DetailCache()
+        return _cache
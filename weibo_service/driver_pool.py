@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Firefox 驱动池：预先启动若干无头浏览器，按需租借给 WeiboBot，
+并在操作次数或内存超过阈值后回收重建。
+
+- 池大小可通过 WEIBO_DRIVER_POOL_SIZE 配置（默认 2）。
+- 单个驱动最多执行 WEIBO_DRIVER_MAX_OPS 次操作（默认 200）后重建。
+- 浏览器进程内存超过 WEIBO_DRIVER_MAX_MEMORY_MB（默认 1024）后重建，需要安装 psutil。
+- 归还时清除所有域名（weibo.com、sina.com.cn、passport 等）的 cookie 和本地存储并关闭旧标签页，
+  清理失败的浏览器直接关闭，不会带着上一个账号的登录状态租借给其他账号。
+"""
+import os
+import queue
+import threading
+
+from selenium import webdriver
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.support.ui import WebDriverWait
+
+from weibo_service.resource_profiles import PROFILE_PREFERENCES, get_profile, pac_preferences, profile_preferences
+
+try:
+    import psutil  # type: ignore
+except ImportError:
+    psutil = None
+
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0"
+PROXY_PREFERENCES = (
+    'network.proxy.type',
+    'network.proxy.http',
+    'network.proxy.http_port',
+    'network.proxy.ssl',
+    'network.proxy.ssl_port',
+    'network.proxy.autoconfig_url',
+)
+
+
+def proxy_preferences(proxy, profile='scrape'):
+    """
+    返回代理对应的 Firefox 首选项，取值为 None 的项表示恢复默认。
+
+    资源配置带拦截列表时改用 PAC 脚本，由它同时负责拦截和转发到账号代理。
+    """
+    prefs = {name: None for name in PROXY_PREFERENCES}
+
+    pac = pac_preferences(get_profile(profile), proxy)
+    if pac is not None:
+        prefs.update(pac)
+        return prefs
+
+    if proxy is None:
+        return prefs
+
+    host, port = proxy.split(":")
+    prefs.update({
+        'network.proxy.type': 1,
+        'network.proxy.http': host,
+        'network.proxy.http_port': int(port),
+        'network.proxy.ssl': host,
+        'network.proxy.ssl_port': int(port),
+    })
+    return prefs
+
+
+def build_firefox_options(proxy=None, profile='scrape', profile_dir=None):
+    firefox_options = FirefoxOptions()
+    if profile_dir is not None:
+        # 账号专属的配置目录，缓存和本地存储在重启后保留
+        firefox_options.add_argument('-profile')
+        firefox_options.add_argument(profile_dir)
+    # 会话不等待页面加载，由 WeiboBot 按操作的资源配置决定等待到哪一步
+    firefox_options.page_load_strategy = 'none'
+
+    for name, value in profile_preferences(get_profile(profile)).items():
+        firefox_options.set_preference(name, value)
+    firefox_options.set_preference('dom.webnotifications.enabled', False)
+
+    firefox_options.set_preference("general.useragent.override", USER_AGENT)
+    firefox_options.set_preference("intl.accept_languages", "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7")
+
+    firefox_options.set_preference("dom.webdriver.enabled", False)
+    firefox_options.set_preference('useAutomationExtension', False)
+
+    firefox_options.set_preference("privacy.resistFingerprinting", True)
+
+    firefox_options.add_argument("--disable-dev-shm-usage")
+    firefox_options.add_argument("--disable-web-security")
+    firefox_options.add_argument("--disable-blink-features")
+    firefox_options.add_argument("--disable-blink-features=AutomationControlled")
+    firefox_options.set_preference('security.enterprise_roots.enabled', True)
+
+    firefox_options.add_argument('--headless')
+
+    firefox_options.add_argument('--disable-gpu')
+    firefox_options.add_argument("--disable-images")
+
+    for name, value in proxy_preferences(proxy, profile).items():
+        if value is not None:
+            firefox_options.set_preference(name, value)
+    # 被拦截的请求指向不可用的代理，不能让 Firefox 在代理失败后改为直连；
+    # PAC 默认只能看到 https 请求的域名，按 URL 拦截需要完整路径
+    firefox_options.set_preference('network.proxy.failover_direct', False)
+    firefox_options.set_preference('network.proxy.autoconfig_url.include_path', True)
+
+    return firefox_options
+
+
+def runtime_preferences(proxy, profile='scrape'):
+    """租借时写入的首选项：资源配置（未启用的项恢复默认）加代理，取值为 None 的项表示恢复默认。"""
+    prefs = {name: None for name in PROFILE_PREFERENCES}
+    prefs.update(profile_preferences(get_profile(profile)))
+    prefs.update(proxy_preferences(proxy, profile))
+    return prefs
+
+
+def apply_profile(driver, proxy, profile='scrape'):
+    """在已启动的浏览器中切换资源配置和代理，写入的首选项与启动时相同。"""
+    with driver.context(driver.CONTEXT_CHROME):
+        driver.execute_script("""
+            var prefs = arguments[0];
+            for (var name in prefs) {
+                var value = prefs[name];
+                if (value === null) Services.prefs.clearUserPref(name);
+                else if (typeof value === 'boolean') Services.prefs.setBoolPref(name, value);
+                else if (typeof value === 'number') Services.prefs.setIntPref(name, value);
+                else Services.prefs.setStringPref(name, value);
+            }
+        """, runtime_preferences(proxy, profile))
+
+
+# 在 chrome 上下文中清除全部 cookie 和 DOM 存储，回调后返回剩余的 cookie 数量
+CLEAR_DATA_SCRIPT = """
+    var done = arguments[arguments.length - 1];
+    var flags = Ci.nsIClearDataService.CLEAR_COOKIES | Ci.nsIClearDataService.CLEAR_DOM_STORAGES;
+    Services.clearData.deleteData(flags, function() { done(Services.cookies.cookies.length); });
+"""
+
+
+def clear_browsing_data(driver):
+    """
+    清除浏览器中所有域名的 cookie、localStorage 和 sessionStorage。
+
+    delete_all_cookies 只作用于当前页面的域名；sessionStorage 跟随标签页，
+    因此先换到新标签页并关闭旧的，再在 chrome 上下文中统一清除。
+    """
+    handles = driver.window_handles
+    driver.switch_to.new_window('tab')
+    fresh = driver.current_window_handle
+    for handle in handles:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(fresh)
+
+    with driver.context(driver.CONTEXT_CHROME):
+        remaining = driver.execute_async_script(CLEAR_DATA_SCRIPT)
+    if remaining:
+        raise RuntimeError(f"仍有 {remaining} 个 cookie 未清除")
+
+
+def apply_cookies(driver, cookie):
+    """清空浏览器中的 cookie，并注入账号的 cookie 字符串。"""
+    driver.get('https://weibo.com/')
+    # 会话不等待页面加载，需要等到 weibo.com 的文档生效后才能写入 cookie
+    WebDriverWait(driver, 30).until(
+        lambda d: d.execute_script("return document.domain;").endswith('weibo.com')
+    )
+    driver.delete_all_cookies()
+
+    for element in cookie.split('; '):
+        name, value = element.split('=', 1)
+        driver.add_cookie({
+            'domain': '.weibo.com',
+            'name': name,
+            'value': value,
+            "expires": '',
+            'path': '/',
+            'httpOnly': True,
+            'HostOnly': False,
+            'Secure': False
+        })
+
+
+def apply_cookie_jar(driver, jar):
+    """注入浏览器导出的 cookie 列表，保留原有的过期时间等属性。"""
+    driver.get('https://weibo.com/')
+    WebDriverWait(driver, 30).until(
+        lambda d: d.execute_script("return document.domain;").endswith('weibo.com')
+    )
+    driver.delete_all_cookies()
+
+    for cookie in jar:
+        cookie = {key: value for key, value in cookie.items() if key != 'sameSite' or value}
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            print("写入 cookie 发生错误:", cookie.get('name'), str(e))
+
+
+class DriverPool:
+    def __init__(self, size=None, max_ops=None, max_memory_mb=None, profile='scrape'):
+        self.profile = profile
+        self.size = size if size is not None else int(os.getenv("WEIBO_DRIVER_POOL_SIZE", "2"))
+        self.max_ops = max_ops if max_ops is not None else int(os.getenv("WEIBO_DRIVER_MAX_OPS", "200"))
+        self.max_memory_mb = (
+            max_memory_mb if max_memory_mb is not None
+            else float(os.getenv("WEIBO_DRIVER_MAX_MEMORY_MB", "1024"))
+        )
+
+        self._idle = queue.Queue()
+        self._ops = {}
+        # 每个浏览器当前生效的 (代理, 资源配置)
+        self._settings = {}
+        self._lock = threading.Lock()
+        self._spawning = 0
+        self._closed = False
+
+        self.fill()
+
+    def _spawn(self):
+        firefox_options = build_firefox_options(profile=self.profile)
+        # Firefox 138+ 需要该参数才允许在 chrome 上下文中切换代理
+        firefox_options.add_argument('-remote-allow-system-access')
+
+        driver = webdriver.Firefox(options=firefox_options)
+        driver.maximize_window()
+        driver.implicitly_wait(10)
+
+        with self._lock:
+            self._ops[id(driver)] = 0
+            self._settings[id(driver)] = (None, self.profile)
+        return driver
+
+    def _spawn_idle(self):
+        try:
+            driver = self._spawn()
+            if self._closed:
+                self._quit(driver)
+            else:
+                self._idle.put(driver)
+        except Exception as e:
+            print("预启动浏览器发生错误:", str(e))
+        finally:
+            with self._lock:
+                self._spawning -= 1
+
+    def fill(self):
+        """在后台补齐空闲浏览器，直到空闲数加启动中的数量达到池大小。"""
+        with self._lock:
+            missing = self.size - self._idle.qsize() - self._spawning
+            if self._closed or missing <= 0:
+                return
+            self._spawning += missing
+
+        for _ in range(missing):
+            threading.Thread(target=self._spawn_idle, daemon=True).start()
+
+    def lease(self, cookie=None, proxy=None, profile=None):
+        """租借一个浏览器；profile 为账号的资源配置（默认为池的配置），与浏览器当前配置不同时重新写入。"""
+        if self._closed:
+            raise RuntimeError("驱动池已关闭")
+
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            driver = self._spawn()
+        self.fill()
+
+        settings = (proxy, profile or self.profile)
+        if self._settings.get(id(driver)) != settings:
+            apply_profile(driver, *settings)
+            self._settings[id(driver)] = settings
+        if cookie is not None:
+            apply_cookies(driver, cookie)
+            driver.refresh()
+
+        return driver
+
+    def release(self, driver):
+        """归还浏览器；超出池大小或需要回收时直接关闭。"""
+        if self._closed or self.should_recycle(driver) or self._idle.qsize() >= self.size:
+            self._quit(driver)
+            return
+
+        try:
+            clear_browsing_data(driver)
+        except Exception as e:
+            # 清理不干净的浏览器不再租借
+            print("清理浏览器发生错误:", str(e))
+            self._quit(driver)
+            return
+        self._idle.put(driver)
+
+    def tick(self, driver):
+        """记录一次操作，返回该浏览器是否需要回收。"""
+        with self._lock:
+            self._ops[id(driver)] = self._ops.get(id(driver), 0) + 1
+        return self.should_recycle(driver)
+
+    def should_recycle(self, driver):
+        if self._ops.get(id(driver), 0) >= self.max_ops:
+            return True
+        memory_mb = self.memory_mb(driver)
+        return memory_mb is not None and memory_mb >= self.max_memory_mb
+
+    def recycle(self, driver, cookie=None, proxy=None, profile=None):
+        """关闭旧浏览器并租借一个新的，重新应用 cookie、代理和资源配置。"""
+        self._quit(driver)
+        return self.lease(cookie=cookie, proxy=proxy, profile=profile)
+
+    def memory_mb(self, driver):
+        if psutil is None:
+            return None
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except Exception:
+            return None
+
+    def _quit(self, driver):
+        with self._lock:
+            self._ops.pop(id(driver), None)
+            self._settings.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            print("关闭浏览器发生错误:", str(e))
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(driver)
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+互动时间序列：每次看到一条微博的点赞/评论/转发数时记录一行观测值，
+并增量维护按小时和按天的汇总表，互动曲线、“上次查看以来的变化”和增长排行都直接从库中计算。
+
+- Engagement：原始观测，(uid, weibo_id, time) 为主键，不带 rowid。
+- EngagementHourly / EngagementDaily：每个时间桶内最后一次观测的计数、观测次数，
+  以及相对上一次观测的增量之和（跨桶的增长记在后一次观测所在的桶里）。
+- 汇总由 Engagement 上的触发器在原始观测插入时更新，重复写入的观测不会重复计数。
+- 观测来自浏览记录和 get_feedback，与其他记录一样交给后台写入线程批量提交。
+"""
+from datetime import datetime, timedelta
+
+from weibo_service.repository import get_repository, parse_count
+
+METRICS = ('like', 'comment', 'repost')
+# 粒度 -> (汇总表, 由观测时间得到时间桶的 SQL 表达式)
+GRANULARITIES = {
+    'hour': ('EngagementHourly', "strftime('%Y-%m-%d %H:00:00', {time})"),
+    'day': ('EngagementDaily', 'substr({time}, 1, 10)'),
+}
+
+OBSERVATION_INSERT = '''
+    INSERT OR IGNORE INTO Engagement (uid, weibo_id, time, like, comment, repost)
+    VALUES (:uid, :weibo_id, :time, :like, :comment, :repost)
+'''
+
+# 增量取自同一条微博在本次之前的最近一次观测。{uid}、{time} 等为一次观测的各列，
+# 在触发器中是 NEW.uid，重建汇总时是命名参数
+_ROLLUP_UPSERT = '''
+    INSERT INTO {table} (uid, weibo_id, bucket, samples, last_time, like, comment, repost,
+                         like_gain, comment_gain, repost_gain)
+    SELECT {uid}, {weibo_id}, {bucket}, 1, {time}, {like}, {comment}, {repost},
+           {like} - COALESCE(p.like, {like}), {comment} - COALESCE(p.comment, {comment}),
+           {repost} - COALESCE(p.repost, {repost})
+    FROM (SELECT 1) LEFT JOIN (
+        SELECT like, comment, repost FROM Engagement
+        WHERE uid = {uid} AND weibo_id = {weibo_id} AND time < {time}
+        ORDER BY time DESC LIMIT 1
+    ) AS p
+    WHERE true
+    ON CONFLICT(uid, weibo_id, bucket) DO UPDATE SET
+        samples = samples + 1,
+        like_gain = like_gain + excluded.like_gain,
+        comment_gain = comment_gain + excluded.comment_gain,
+        repost_gain = repost_gain + excluded.repost_gain,
+        like = CASE WHEN excluded.last_time >= last_time THEN excluded.like ELSE like END,
+        comment = CASE WHEN excluded.last_time >= last_time THEN excluded.comment ELSE comment END,
+        repost = CASE WHEN excluded.last_time >= last_time THEN excluded.repost ELSE repost END,
+        last_time = MAX(last_time, excluded.last_time)
+'''
+
+
+def rollup_upsert(granularity, column):
+    """granularity 汇总表的更新语句，column 把列名转换为取值的表达式，如 'NEW.{}' 或 ':{}'。"""
+    table, bucket = GRANULARITIES[granularity]
+    values = {name: column.format(name) for name in ('uid', 'weibo_id', 'time') + METRICS}
+    return _ROLLUP_UPSERT.format(table=table, bucket=bucket.format(time=values['time']), **values)
+
+
+# 汇总只在原始观测真正插入时更新：同一条观测重复写入被 INSERT OR IGNORE 忽略，不会重复计数
+ROLLUP_TRIGGER = (
+    'CREATE TRIGGER IF NOT EXISTS trg_engagement_rollup AFTER INSERT ON Engagement BEGIN\n'
+    + ''.join(rollup_upsert(granularity, 'NEW.{}') + ';\n' for granularity in GRANULARITIES)
+    + 'END'
+)
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def observation_items(uid, weibo_id, like, comment, repost, time=None):
+    """一次观测对应的写入项；各粒度的汇总由 Engagement 上的触发器维护。"""
+    return [(OBSERVATION_INSERT, {
+        'uid': str(uid),
+        'weibo_id': str(weibo_id),
+        'time': time or _now(),
+        'like': parse_count(like),
+        'comment': parse_count(comment),
+        'repost': parse_count(repost),
+    })]
+
+
+def engagement_items(infos):
+    """浏览到的微博详情中的计数也作为观测记录。"""
+    items = []
+    for info in infos:
+        if info is None:
+            continue
+        items.extend(observation_items(
+            info['account_id'],
+            info['weibo_id'],
+            info['like_num'],
+            info['comment_num'],
+            info['repost_num'],
+            info.get('browse_time'),
+        ))
+    return items
+
+
+def rebuild_rollups(conn):
+    """根据 Engagement 中的原始观测重新生成全部汇总。"""
+    for table, _ in GRANULARITIES.values():
+        conn.execute(f'DELETE FROM {table}')
+
+    upserts = [rollup_upsert(granularity, ':{}') for granularity in GRANULARITIES]
+    cursor = conn.execute('SELECT uid, weibo_id, time, like, comment, repost FROM Engagement ORDER BY time')
+    for rows in iter(lambda: cursor.fetchmany(500), []):
+        for row in rows:
+            params = dict(zip(('uid', 'weibo_id', 'time') + METRICS, row))
+            for sql in upserts:
+                conn.execute(sql, params)
+
+
+def _counts(row, offset=0):
+    return {metric: row[offset + index] for index, metric in enumerate(METRICS)}
+
+
+class EngagementStore:
+    def __init__(self, db_path=None):
+        self.repository = get_repository(db_path)
+
+    def latest(self, uid, weibo_id, before=None):
+        """最近一次观测（before 给定时取该时间及之前的最近一次），没有时返回 None。"""
+        query = 'SELECT time, like, comment, repost FROM Engagement WHERE uid = ? AND weibo_id = ?'
+        params = [str(uid), str(weibo_id)]
+        if before is not None:
+            query += ' AND time <= ?'
+            params.append(before)
+        row = self.repository.query_one(query + ' ORDER BY time DESC LIMIT 1', params)
+        if row is None:
+            return None
+        return dict(_counts(row, 1), time=row[0])
+
+    def fresh(self, uid, weibo_id, max_age):
+        """最近一次观测不超过 max_age 秒时返回它，否则返回 None。"""
+        if not max_age:
+            return None
+        latest = self.latest(uid, weibo_id)
+        if latest is None:
+            return None
+        age = datetime.now() - datetime.strptime(latest['time'], "%Y-%m-%d %H:%M:%S")
+        return latest if age <= timedelta(seconds=max_age) else None
+
+    def delta(self, uid, weibo_id, since=None):
+        """
+        最近一次观测相对基准的变化。基准为 since 及之前的最近一次观测，
+        未给出 since 时为上一次观测。
+        """
+        current = self.latest(uid, weibo_id)
+        if current is None:
+            return None
+        if since is not None:
+            previous = self.latest(uid, weibo_id, before=since)
+        else:
+            row = self.repository.query_one('''
+                SELECT time, like, comment, repost FROM Engagement
+                WHERE uid = ? AND weibo_id = ? AND time < ? ORDER BY time DESC LIMIT 1
+            ''', (str(uid), str(weibo_id), current['time']))
+            previous = dict(_counts(row, 1), time=row[0]) if row else None
+        return self._delta(current, previous)
+
+    @staticmethod
+    def _delta(current, previous):
+        result = dict(current)
+        result['previous_time'] = previous['time'] if previous else None
+        result['delta'] = {
+            metric: current[metric] - (previous[metric] if previous else current[metric]) for metric in METRICS
+        }
+        return result
+
+    def observe(self, uid, weibo_id, like, comment, repost, writer):
+        """记录一次新的观测，返回计数及相对上一次观测的变化。"""
+        previous = self.latest(uid, weibo_id)
+        items = observation_items(uid, weibo_id, like, comment, repost)
+        writer.submit(items)
+        current = {key: items[0][1][key] for key in METRICS + ('time',)}
+        return self._delta(current, previous)
+
+    def comments(self, uid, weibo_id):
+        rows = self.repository.query(
+            'SELECT content FROM WeiboComment WHERE uid = ? AND weibo_id = ? ORDER BY position', (str(uid), str(weibo_id))
+        )
+        return [row[0] for row in rows]
+
+    def history(self, uid, weibo_id, granularity='hour', since=None, until=None):
+        """互动曲线：每个时间桶的最后计数、增量和观测次数。"""
+        table, _ = GRANULARITIES[granularity]
+        query = f'''
+            SELECT bucket, last_time, like, comment, repost, like_gain, comment_gain, repost_gain, samples
+            FROM {table} WHERE uid = ? AND weibo_id = ?
+        '''
+        params = [str(uid), str(weibo_id)]
+        if since is not None:
+            query += ' AND bucket >= ?'
+            params.append(since)
+        if until is not None:
+            query += ' AND bucket < ?'
+            params.append(until)
+        rows = self.repository.query(query + ' ORDER BY bucket', params)
+        return [{
+            'bucket': row[0],
+            'time': row[1],
+            **_counts(row, 2),
+            'gain': _counts(row, 5),
+            'samples': row[8],
+        } for row in rows]
+
+    def top_growth(self, granularity='day', since=None, metric='like', limit=20):
+        """since 之后指定指标增长最多的微博。"""
+        if metric not in METRICS:
+            raise ValueError(f"未知的指标: {metric}")
+        table, _ = GRANULARITIES[granularity]
+        query = f'''
+            SELECT uid, weibo_id, SUM(like_gain), SUM(comment_gain), SUM(repost_gain), MAX(last_time)
+            FROM {table}
+        '''
+        params = []
+        if since is not None:
+            query += ' WHERE bucket >= ?'
+            params.append(since)
+        query += f' GROUP BY uid, weibo_id ORDER BY SUM({metric}_gain) DESC LIMIT ?'
+        params.append(int(limit))
+        rows = self.repository.query(query, params)
+        return [{
+            'object_id': f'{row[0]}/{row[1]}',
+            'gain': _counts(row, 2),
+            'last_time': row[5],
+        } for row in rows]
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+列式导出：把浏览、动作、评论和互动记录流式导出为 Parquet（或 Arrow IPC）文件，供离线分析使用。
+
+- 按固定行数（WEIBO_EXPORT_BATCH，默认 50000）从库中取出一批、转换为 RecordBatch 后立即写出，内存占用与表大小无关。
+- 增量导出：每张表（及账号过滤条件）记录已导出的高水位，下一次只导出之后新增的行。
+  ActionLog 按自增 id 推进；其余表按 (时间, 主键) 推进并留出 lag 秒避开仍在写入的数据。
+  不使用隐式 rowid：删除后重新插入会复用 rowid，VACUUM 也可能重新编号，会漏导或重复导出。
+- 输出目录 WEIBO_EXPORT_DIR（默认项目根目录下的 export），每次导出生成
+  <表名>/[account=<账号>/]part-<时间>.parquet，先写临时文件再改名，写完后才推进高水位。
+- 依赖 pyarrow（可选，未安装时导出会报错，其余功能不受影响）。
+
+命令行：python -m weibo_service.exporter [表名 ...] [--account 账号] [--since 时间] [--until 时间] [--format parquet|arrow] [--full]
+"""
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖
+    pa = pq = None
+
+from weibo_service.repository import DEFAULT_DB_PATH, get_repository
+
+# 表名 -> (高水位列, 时间列, 账号列)；高水位列以时间列开头时按时间推进并留出 lag
+TABLES = {
+    'BrowseInformation': (('browse_time', 'uid', 'weibo_id', 'browser_uid', 'browse_type'), 'browse_time', 'browser_uid'),
+    'ActionLog': (('id',), 'time', 'uid'),
+    'WeiboComment': (('fetch_time', 'uid', 'weibo_id', 'position'), 'fetch_time', None),
+    'Engagement': (('time', 'uid', 'weibo_id'), 'time', 'uid'),
+}
+
+
+def _arrow_type(declared):
+    declared = (declared or '').upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    return pa.string()
+
+
+class ColumnarExporter:
+    def __init__(self, db_path=None, out_dir=None, batch_size=None, file_format='parquet', lag=60):
+        if pa is None:
+            raise ImportError("列式导出需要安装 pyarrow")
+        if file_format not in ('parquet', 'arrow'):
+            raise ValueError(f"未知的导出格式: {file_format}")
+        self.repository = get_repository(db_path)
+        self.out_dir = out_dir or os.getenv(
+            "WEIBO_EXPORT_DIR", os.path.join(os.path.dirname(DEFAULT_DB_PATH), 'export')
+        )
+        self.batch_size = batch_size or int(os.getenv("WEIBO_EXPORT_BATCH", "50000"))
+        self.file_format = file_format
+        self.lag = lag
+
+    def _schema(self, conn, table):
+        columns = conn.execute(f'PRAGMA table_info({table})').fetchall()
+        return pa.schema([(column[1], _arrow_type(column[2])) for column in columns])
+
+    @staticmethod
+    def _state_name(table, account_id):
+        return f'{table}:{account_id}' if account_id else table
+
+    def high_water(self, table, account_id=None):
+        """返回高水位（与高水位列一一对应的列表），没有导出过时返回 None。"""
+        row = self.repository.query_one(
+            'SELECT high_water FROM ExportState WHERE name = ?', (self._state_name(table, account_id),)
+        )
+        if row is None or not isinstance(row[0], str):
+            return None
+        try:
+            mark = json.loads(row[0])
+        except ValueError:
+            return None
+        # 旧版本按 rowid 或单列记录的高水位无法换算，重新完整导出一次
+        return mark if isinstance(mark, list) and len(mark) == len(TABLES[table][0]) else None
+
+    def _writer(self, path, schema):
+        if self.file_format == 'parquet':
+            return pq.ParquetWriter(path, schema, compression='zstd')
+        return pa.ipc.new_file(path, schema)
+
+    def export_table(self, table, account_id=None, since=None, until=None, incremental=True):
+        """
+        导出一张表，返回 {'rows': 行数, 'path': 文件路径或 None, 'high_water': 新的高水位}。
+        since/until 按时间列过滤；incremental 为 False 时忽略并且不更新高水位。
+        """
+        mark_columns, time_column, account_column = TABLES[table]
+        if account_id and account_column is None:
+            raise ValueError(f"{table} 不支持按账号导出")
+
+        conditions, params = [], []
+        previous = self.high_water(table, account_id) if incremental else None
+        if previous is not None:
+            conditions.append(f'({", ".join(mark_columns)}) > ({", ".join("?" * len(mark_columns))})')
+            params.extend(previous)
+        if mark_columns[0] == time_column and incremental:
+            # 按时间推进的表只导出已经写稳定的行，之后写入的行时间一定晚于高水位
+            ceiling = (datetime.now() - timedelta(seconds=self.lag)).strftime("%Y-%m-%d %H:%M:%S")
+            conditions.append(f'{time_column} <= ?')
+            params.append(ceiling)
+        if account_id:
+            conditions.append(f'{account_column} = ?')
+            params.append(str(account_id))
+        if since:
+            conditions.append(f'{time_column} >= ?')
+            params.append(since)
+        if until:
+            conditions.append(f'{time_column} < ?')
+            params.append(until)
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+        directory = os.path.join(self.out_dir, table, f'account={account_id}' if account_id else '')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"part-{datetime.now().strftime('%Y%m%d%H%M%S%f')}.{self.file_format}"
+        )
+        rows_written, high_water, writer = 0, previous, None
+        marks = len(mark_columns)
+
+        with self.repository.connect() as conn:
+            schema = self._schema(conn, table)
+            names = schema.names
+            cursor = conn.execute(
+                f'SELECT {", ".join(mark_columns + tuple(names))} FROM {table} {where} '
+                f'ORDER BY {", ".join(mark_columns)}', params
+            )
+            try:
+                for rows in iter(lambda: cursor.fetchmany(self.batch_size), []):
+                    batch = pa.RecordBatch.from_arrays(
+                        [pa.array([row[index + marks] for row in rows], type=field.type)
+                         for index, field in enumerate(schema)],
+                        schema=schema,
+                    )
+                    if writer is None:
+                        writer = self._writer(path + '.tmp', schema)
+                    writer.write_batch(batch)
+                    rows_written += len(rows)
+                    high_water = list(rows[-1][:marks])
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        if writer is None:
+            return {'rows': 0, 'path': None, 'high_water': previous}
+        os.replace(path + '.tmp', path)
+
+        if incremental:
+            with self.repository.transaction() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO ExportState (name, high_water, update_time) VALUES (?, ?, ?)
+                ''', (
+                    self._state_name(table, account_id),
+                    json.dumps(high_water, ensure_ascii=False),
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ))
+        return {'rows': rows_written, 'path': path, 'high_water': high_water}
+
+    def export(self, tables=None, account_id=None, since=None, until=None, incremental=True):
+        return {
+            table: self.export_table(table, account_id, since, until, incremental)
+            for table in (tables or TABLES)
+            if not (account_id and TABLES[table][2] is None)
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="把 WeiboAct.db 中的记录导出为 Parquet/Arrow 文件")
+    parser.add_argument('tables', nargs='*', help=f"要导出的表，默认全部：{' '.join(TABLES)}")
+    parser.add_argument('--db', default=None, help="数据库路径，默认取 WEIBO_DB_PATH 或项目根目录下的 WeiboAct.db")
+    parser.add_argument('--out', default=None, help="输出目录，默认取 WEIBO_EXPORT_DIR")
+    parser.add_argument('--account', default=None, help="只导出该账号的记录")
+    parser.add_argument('--since', default=None, help="起始时间（含），如 2024-01-01")
+    parser.add_argument('--until', default=None, help="结束时间（不含）")
+    parser.add_argument('--format', default='parquet', choices=['parquet', 'arrow'])
+    parser.add_argument('--full', action='store_true', help="忽略高水位完整导出，且不更新高水位")
+    args = parser.parse_args()
+    unknown = [table for table in args.tables if table not in TABLES]
+    if unknown:
+        parser.error(f"未知的表: {' '.join(unknown)}")
+
+    exporter = ColumnarExporter(args.db, args.out, file_format=args.format)
+    results = exporter.export(args.tables, args.account, args.since, args.until, incremental=not args.full)
+    for table, result in results.items():
+        print(f"  {table:<20} {result['rows']:>10} 行  {result['path'] or '-'}")
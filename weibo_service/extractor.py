@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+声明式字段提取：按字段规格一次 execute_script 取回页面上的全部字段。
+
+字段规格格式：
+    {
+        'selector': 选择器注册表中的逻辑元素名,
+        'attr': 读取的属性名，缺省时读取可见文本,
+        'many': 为 True 时返回所有匹配元素的列表,
+    }
+缺失的字段立即返回空字符串（many 时为空列表），不会等待超时。
+等待必需字段时与 element_located 一样，页面加载完成后 WEIBO_SELECTOR_GRACE 秒内仍缺少时立即失败。
+"""
+from time import perf_counter
+
+from selenium.common.exceptions import TimeoutException
+
+from weibo_service.selector_registry import QUERY_JS
+
+EXTRACT_SCRIPT = QUERY_JS + """
+    var specs = arguments[0];
+    if (window.__weiboStale) return [{}, Object.keys(specs), {}, null];
+    var result = {};
+    var missing = [];
+    var winners = {};
+    for (var name in specs) {
+        var spec = specs[name];
+        var race = __weiboRace(spec.candidates);
+        var values = [];
+        for (var i = 0; i < race[1].length; i++) {
+            var node = race[1][i];
+            var value = spec.attr ? node[spec.attr] || node.getAttribute(spec.attr) : node.innerText;
+            values.push((value || '').trim());
+            if (!spec.many) break;
+        }
+        if (race[0] === null) missing.push(name);
+        else winners[name] = race[0];
+        result[name] = spec.many ? values : (values.length ? values[0] : '');
+    }
+    return [result, missing, winners, document.readyState];
+"""
+
+WEIBO_DETAIL_FIELDS = {
+    'username': {'selector': 'detail.username'},
+    'time': {'selector': 'detail.time'},
+    'text': {'selector': 'detail.text'},
+    'user_tag': {'selector': 'detail.user_tag'},
+    'imgs': {'selector': 'detail.imgs', 'attr': 'src', 'many': True},
+    'video': {'selector': 'detail.video', 'attr': 'href'},
+    'repost_num': {'selector': 'detail.repost_num'},
+    'comment_num': {'selector': 'detail.comment_num'},
+    'like_num': {'selector': 'detail.like_num'},
+}
+
+WEIBO_DETAIL_REQUIRED = ('username', 'time', 'text', 'repost_num', 'comment_num', 'like_num')
+
+def _extract_fields(driver, specs, registry):
+    payload = {
+        name: dict(spec, candidates=registry.candidates(spec['selector'])) for name, spec in specs.items()
+    }
+    fields, missing, winners, ready_state = driver.execute_script(EXTRACT_SCRIPT, payload)
+    for name, index in winners.items():
+        registry.hit(specs[name]['selector'], index)
+    return fields, missing, ready_state
+
+
+def extract_fields(driver, specs, registry):
+    """返回 (字段值, 页面上不存在的字段名列表)，并把命中的候选记入注册表。"""
+    fields, missing, _ = _extract_fields(driver, specs, registry)
+    return fields, missing
+
+
+class fields_present:
+    """
+    等待条件：必需字段对应的元素都存在时返回提取结果，否则返回 False 继续等待。
+
+    页面加载完成后超过 grace 秒仍缺少必需字段，把缺失的选择器记入注册表并直接抛出 TimeoutException。
+    """
+
+    def __init__(self, specs, required, registry):
+        self.specs = specs
+        self.required = required
+        self.registry = registry
+        self.settled = None
+
+    def __call__(self, driver):
+        fields, missing, ready_state = _extract_fields(driver, self.specs, self.registry)
+        absent = [name for name in self.required if name in missing]
+        if not absent:
+            return fields
+
+        if ready_state != 'complete':
+            self.settled = None
+            return False
+        if self.settled is None:
+            self.settled = perf_counter()
+        elif perf_counter() - self.settled >= self.registry.grace:
+            for name in absent:
+                self.registry.hit(self.specs[name]['selector'], None)
+            raise TimeoutException(f"字段 {', '.join(absent)} 的所有候选均未命中")
+        return False
+
+
+# 一次取回当前已渲染的全部评论：[滚动高度, 是否已到底部, [{id, text}, ...], 命中的候选序号]
+COMMENT_SCRIPT = QUERY_JS + """
+    var processNode = function(node) {
+        var text = '';
+        if (node.nodeType === Node.TEXT_NODE) {
+            var trimmed = node.textContent.trim();
+            if (trimmed) text += trimmed + ' ';
+        }
+        else if (node.tagName === 'IMG') {
+            var alt = node.getAttribute('alt') || '';
+            if (alt) text += alt + ' ';
+        }
+        else if (node.nodeType === Node.ELEMENT_NODE) {
+            for (var i = 0; i < node.childNodes.length; i++) {
+                text += processNode(node.childNodes[i]);
+            }
+        }
+        return text;
+    };
+
+    var race = __weiboRace(arguments[0]);
+    var comments = [];
+    for (var i = 0; i < race[1].length; i++) {
+        var element = race[1][i];
+        var span = element.querySelector('.text > span');
+        if (!span) continue;
+        var holder = element.closest('[comment-id], [data-id], [mid]');
+        comments.push({
+            id: holder ? (holder.getAttribute('comment-id') || holder.getAttribute('data-id') || holder.getAttribute('mid')) : '',
+            text: processNode(span).replace(/\\s+/g, ' ').trim()
+        });
+    }
+
+    var root = document.documentElement;
+    var height = root.scrollHeight;
+    var atBottom = window.innerHeight + window.scrollY >= height - 10;
+    return [height, atBottom, comments, race[0]];
+"""
+
+
+def extract_comments(driver, registry):
+    height, at_bottom, comments, index = driver.execute_script(
+        COMMENT_SCRIPT, registry.candidates('comment.item')
+    )
+    if index is not None:
+        registry.hit('comment.item', index)
+    return height, at_bottom, comments
+
+
+# 一次取回逻辑元素匹配到的全部链接：[滚动高度, 是否已到底部, [href, ...], 命中的候选序号]
+LINKS_SCRIPT = QUERY_JS + """
+    var race = __weiboRace(arguments[0]);
+    var hrefs = [];
+    for (var i = 0; i < race[1].length; i++) {
+        var href = race[1][i].href;
+        if (href) hrefs.push(href);
+    }
+
+    var root = document.documentElement;
+    var height = root.scrollHeight;
+    var atBottom = window.innerHeight + window.scrollY >= height - 10;
+    return [height, atBottom, hrefs, race[0]];
+"""
+
+
+def extract_links(driver, registry, name):
+    height, at_bottom, hrefs, index = driver.execute_script(LINKS_SCRIPT, registry.candidates(name))
+    if index is not None:
+        registry.hit(name, index)
+    return height, at_bottom, hrefs
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+粉丝快照存储：每个账号当前的粉丝集合、关注/取关事件以及每次扫描的快照记录都保存在 SQLite 中，
+重启后无需重新完整滚动粉丝列表，关注/取关变化也可以直接从库中查询。
+"""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from weibo_service.repository import get_repository
+
+FOLLOW, UNFOLLOW = 1, 0
+
+
+class FanStore:
+    def __init__(self, db_path=None):
+        self.repository = get_repository(db_path)
+        self._lock = threading.Lock()
+
+    def fans(self, account_id):
+        rows = self.repository.query(
+            'SELECT fan_uid FROM Fans WHERE account_id = ?', (str(account_id),)
+        )
+        return {row[0] for row in rows}
+
+    def has_snapshot(self, account_id):
+        row = self.repository.query_one(
+            'SELECT 1 FROM FanSnapshot WHERE account_id = ? LIMIT 1', (str(account_id),)
+        )
+        return row is not None
+
+    def needs_full_scan(self, account_id, interval):
+        """没有完整扫描记录，或上一次完整扫描早于 interval 秒前时返回 True。"""
+        row = self.repository.query_one(
+            'SELECT MAX(time) FROM FanSnapshot WHERE account_id = ? AND full_scan = 1', (str(account_id),)
+        )
+        if row is None or row[0] is None:
+            return True
+        since = (datetime.now() - timedelta(seconds=interval)).strftime("%Y-%m-%d %H:%M:%S")
+        return row[0] <= since
+
+    def record(self, account_id, scanned, full_scan):
+        """
+        保存一次粉丝扫描结果并返回与上一快照的差异。
+
+        增量扫描只覆盖最新的一页粉丝，因此只能发现新增关注；取关只在完整扫描时计算。
+        """
+        account_id = str(account_id)
+        scanned = set(scanned)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self._lock:
+            baseline = not self.has_snapshot(account_id)
+            previous = self.fans(account_id)
+            follows = scanned - previous
+            unfollows = previous - scanned if full_scan else set()
+            current = (previous | follows) - unfollows
+
+            # 第一次快照只建立基线，不记为关注事件
+            events = set() if baseline else follows
+            try:
+                with self.repository.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        INSERT INTO FanSnapshot (account_id, time, fans_number, full_scan)
+                        VALUES (?, ?, ?, ?)
+                    ''', (account_id, now, len(current), int(full_scan)))
+                    snapshot_id = cursor.lastrowid
+
+                    cursor.executemany('''
+                        INSERT OR IGNORE INTO Fans (account_id, fan_uid, first_seen) VALUES (?, ?, ?)
+                    ''', [(account_id, fan, now) for fan in follows])
+                    cursor.executemany('''
+                        DELETE FROM Fans WHERE account_id = ? AND fan_uid = ?
+                    ''', [(account_id, fan) for fan in unfollows])
+                    cursor.executemany('''
+                        INSERT INTO FanEvent (snapshot_id, account_id, fan_uid, event, time) VALUES (?, ?, ?, ?, ?)
+                    ''', [(snapshot_id, account_id, fan, FOLLOW, now) for fan in events]
+                        + [(snapshot_id, account_id, fan, UNFOLLOW, now) for fan in unfollows])
+            except sqlite3.Error as e:
+                print("Database error:", e)
+            follows = events
+
+        return {
+            "fans": sorted(current),
+            "follows": sorted(follows),
+            "unfollows": sorted(unfollows),
+        }
+
+    def deltas(self, account_id, since=None):
+        """从库中读取 since 之后的关注/取关变化，不需要驱动浏览器。"""
+        query = 'SELECT fan_uid, event, time FROM FanEvent WHERE account_id = ?'
+        params = [str(account_id)]
+        if since is not None:
+            query += ' AND time > ?'
+            params.append(since)
+        query += ' ORDER BY id'
+
+        rows = self.repository.query(query, params)
+
+        return {
+            "follows": [{"uid": uid, "time": time} for uid, event, time in rows if event == FOLLOW],
+            "unfollows": [{"uid": uid, "time": time} for uid, event, time in rows if event == UNFOLLOW],
+        }
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+动作幂等：客户端为每个动作请求附带幂等键，重试时直接返回第一次的结果，不会再次驱动浏览器。
+
+- 第一次收到某个键时插入一条 pending 记录；动作成功后，ActionLog 与该记录的结果在同一事务中提交，
+  因此“已执行”与“已记录”要么同时成立，要么都不成立。
+- bot 在点击提交之前失败时删除记录，客户端可以用同一个键重试；点击提交之后才失败（例如没有等到生效确认）时，
+  动作可能已经发出，记录标记为 unknown，重试直接报告结果未知，需要人工核对。
+- 动作已在浏览器中完成但日志写入失败时，记录保持 pending；超过 WEIBO_IDEMPOTENCY_PENDING_TTL 秒（默认 600）
+  仍未完成的键视为结果未知，不会自动重试，需要人工确认后换一个新键。
+- 同一个键携带不同的请求内容时拒绝执行。
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from time import monotonic, sleep
+
+from weibo_service.repository import get_repository
+
+PENDING, DONE, UNKNOWN = 'pending', 'done', 'unknown'
+
+REQUEST_DONE = '''
+    UPDATE ActionRequest SET status = 'done', result = ?, finish_time = ? WHERE idempotency_key = ?
+'''
+
+
+class IdempotencyError(Exception):
+    status_code = 409
+
+
+class IdempotencyConflict(IdempotencyError):
+    """同一个幂等键对应了不同的请求内容。"""
+    status_code = 422
+
+
+class ActionInProgress(IdempotencyError):
+    """相同幂等键的请求仍在执行。"""
+
+
+class ActionOutcomeUnknown(IdempotencyError):
+    """动作可能已经执行，但结果没有被记录下来。"""
+
+
+class ActionLogError(Exception):
+    """动作已经执行成功，但写入 ActionLog 失败。"""
+
+
+def fingerprint(action):
+    return json.dumps(
+        [str(action['agent_id']), action['type'], action.get('action_content'), action.get('object')],
+        ensure_ascii=False,
+    )
+
+
+def request_done_item(key, info):
+    """与 ActionLog 放在同一事务中提交的结果记录。"""
+    return REQUEST_DONE, (
+        json.dumps(info, ensure_ascii=False, default=str),
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        key,
+    )
+
+
+class IdempotencyStore:
+    def __init__(self, db_path=None, pending_ttl=None, wait_timeout=30):
+        self.repository = get_repository(db_path)
+        self.pending_ttl = (
+            pending_ttl if pending_ttl is not None
+            else float(os.getenv("WEIBO_IDEMPOTENCY_PENDING_TTL", "600"))
+        )
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+
+    def _load(self, key):
+        return self.repository.query_one(
+            'SELECT fingerprint, status, result, create_time FROM ActionRequest WHERE idempotency_key = ?', (key,)
+        )
+
+    def begin(self, key, action):
+        """
+        登记一个新的幂等键并返回 None，调用方随后执行动作；
+        键已完成时返回第一次记录的动作结果（WeiboAct 返回的 info）。
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            with self.repository.transaction() as conn:
+                inserted = conn.execute('''
+                    INSERT OR IGNORE INTO ActionRequest
+                    (idempotency_key, agent_id, action_type, fingerprint, status, create_time)
+                    VALUES (?, ?, ?, ?, 'pending', ?)
+                ''', (key, str(action['agent_id']), action['type'], fingerprint(action), now)).rowcount
+        if inserted:
+            return None
+
+        deadline = monotonic() + self.wait_timeout
+        while True:
+            row = self._load(key)
+            if row is None:
+                # 第一次请求失败后记录已被删除，重新登记
+                return self.begin(key, action)
+            if row[0] != fingerprint(action):
+                raise IdempotencyConflict(f"幂等键 {key} 已用于不同的请求")
+            if row[1] == DONE:
+                return json.loads(row[2])
+            if row[1] == UNKNOWN:
+                raise ActionOutcomeUnknown(f"幂等键 {key} 的动作可能已经执行，请核对后使用新的幂等键")
+
+            age = datetime.now() - datetime.strptime(row[3], "%Y-%m-%d %H:%M:%S")
+            if age > timedelta(seconds=self.pending_ttl):
+                raise ActionOutcomeUnknown(f"幂等键 {key} 的动作结果未知，请确认后使用新的幂等键")
+            if monotonic() >= deadline:
+                raise ActionInProgress(f"幂等键 {key} 的请求仍在执行")
+            sleep(0.5)
+
+    def release(self, key):
+        """动作明确失败，删除记录以便用同一个键重试。"""
+        try:
+            with self.repository.transaction() as conn:
+                conn.execute("DELETE FROM ActionRequest WHERE idempotency_key = ? AND status = 'pending'", (key,))
+        except sqlite3.Error as e:
+            print("Database error:", e)
+
+
+    def mark_unknown(self, key):
+        """动作已经提交但没有确认结果，保留记录并标记为待核对，不允许用同一个键重试。"""
+        try:
+            with self.repository.transaction() as conn:
+                conn.execute(
+                    "UPDATE ActionRequest SET status = 'unknown', finish_time = ? "
+                    "WHERE idempotency_key = ? AND status = 'pending'",
+                    (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), key),
+                )
+        except sqlite3.Error as e:
+            print("Database error:", e)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IdempotencyStore()
+        return _store
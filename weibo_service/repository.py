@@ -0,0 +1,606 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 持久层：统一管理 WeiboAct.db 的连接、表结构和读写。
+
+- 数据库路径取自 WEIBO_DB_PATH，默认是项目根目录下的 WeiboAct.db，与启动目录无关。
+- 连接以 WAL 模式打开并放入连接池复用（WEIBO_DB_POOL_SIZE，默认 4），
+  多个 bot 并发写入时读写互不阻塞，写写冲突由 busy_timeout 排队等待。
+- 表结构迁移只在第一次打开数据库时执行，版本记录在 PRAGMA user_version 中。
+  也可以手动迁移已有的数据库：python repository.py migrate [--db 路径]
+
+表结构 v2：计数为整数，图片为 JSON 数组，评论存放在子表 WeiboComment 中，
+并为常用查询建立了 (browser_uid, browse_time)、(uid, weibo_id)、(action, time) 索引。
+表结构 v3：正文和评论的 FTS5 全文索引（SearchDocument / WeiboSearch，见 search.py）。
+表结构 v4：互动计数的时间序列及按小时/按天的汇总（见 engagement.py）。
+表结构 v5：列式导出的高水位（见 exporter.py）。
+表结构 v6：动作请求的幂等键及其结果（见 idempotency.py）。
+表结构 v7：由触发器维护的统计汇总 ActionDaily、AuthorInteraction、FanDaily（见 analytics.py）。
+表结构 v8：会话快照移到单独加密的 sessions.db（见 sessions.py），删除主库中明文保存 cookie 的 Session 表。
+表结构 v9：互动汇总由 Engagement 上的触发器维护，重复的观测不再重复计数。
+表结构 v10：BrowseInformation 增加 fetch_time，记录正文等静态字段实际抓取的时间（见 detail_cache.py）。
+"""
+import argparse
+import ast
+import itertools
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'WeiboAct.db')
+
+POST, LIKE, COMMENT, REPOST, FOLLOW, UNFOLLOW = 1, 2, 3, 4, 5, 6
+BROWSE_HOT, BROWSE_HOMEPAGE = 0, 1
+
+def parse_count(value):
+    """把页面上的计数转换为整数：'1.2万' -> 12000，'100万+' -> 1000000，'赞'/'转发' 等占位文字 -> 0。"""
+    if isinstance(value, int):
+        return value
+    match = re.search(r'(\d+(?:\.\d+)?)\s*(万|亿)?', str(value or '').replace(',', ''))
+    if match is None:
+        return 0
+    number = float(match.group(1))
+    if match.group(2) == '万':
+        number *= 10000
+    elif match.group(2) == '亿':
+        number *= 100000000
+    return int(number)
+
+
+def _parse_list(value):
+    """兼容 v1 中以 str(list) 保存的列表。"""
+    if not value:
+        return []
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return [value]
+    return list(parsed) if isinstance(parsed, (list, tuple)) else [parsed]
+
+
+def _migrate_v2(conn):
+    """v1 -> v2：计数转为整数，图片转为 JSON，评论移入 WeiboComment，并建立索引。"""
+    conn.execute('ALTER TABLE BrowseInformation RENAME TO BrowseInformation_v1')
+    conn.execute('''
+        CREATE TABLE BrowseInformation (
+            uid VARCHAR(12),
+            weibo_id VARCHAR(12),
+            user_name VARCHAR(30),
+            user_tag VARCHAR(100),
+            time TIMESTAMP,
+            text VARCHAR(2000),
+            img TEXT,
+            video VARCHAR(200),
+            repost INTEGER,
+            like INTEGER,
+            comment INTEGER,
+            browse_time TIMESTAMP,
+            browser_uid VARCHAR(12),
+            browse_type INTEGER,
+            fetch_time TIMESTAMP,
+            PRIMARY KEY(uid, weibo_id, browser_uid, browse_type)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS WeiboComment (
+            uid VARCHAR(12),
+            weibo_id VARCHAR(12),
+            position INTEGER,
+            content VARCHAR(2000),
+            fetch_time TIMESTAMP,
+            PRIMARY KEY(uid, weibo_id, position)
+        )
+    ''')
+
+    # 按浏览时间顺序转换，同一条微博最终保留最近一次抓取的评论
+    cursor = conn.execute('''
+        SELECT uid, weibo_id, user_name, user_tag, time, text, img, video, repost, like, comment,
+               comment_content, browse_time, browser_uid, browse_type
+        FROM BrowseInformation_v1 ORDER BY browse_time
+    ''')
+    for rows in iter(lambda: cursor.fetchmany(500), []):
+        infos = [{
+            'account_id': row[0],
+            'weibo_id': row[1],
+            'username': row[2],
+            'user_tag': row[3],
+            'time': row[4],
+            'text': row[5],
+            'imgs': _parse_list(row[6]),
+            'video': row[7],
+            'repost_num': row[8],
+            'like_num': row[9],
+            'comment_num': row[10],
+            'comment': _parse_list(row[11]),
+            'browse_time': row[12],
+        } for row in rows]
+        for info, row in zip(infos, rows):
+            for sql, params in browse_items([info], row[13], row[14]):
+                conn.execute(sql, params)
+
+    conn.execute('DROP TABLE BrowseInformation_v1')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_browse_browser_time ON BrowseInformation(browser_uid, browse_time)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_browse_weibo ON BrowseInformation(uid, weibo_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_action_action_time ON ActionLog(action, time)')
+
+
+def _build_search_index(conn):
+    """v3：为已有的正文和评论补建全文索引。"""
+    # search 模块依赖本模块的 get_repository，延迟导入避免循环引用
+    from weibo_service.search import rebuild
+    rebuild(conn)
+
+
+def _backfill_engagement(conn):
+    """v4：把已有浏览记录中的计数作为历史观测，并生成汇总。"""
+    from weibo_service.engagement import rebuild_rollups
+    conn.execute('''
+        INSERT OR IGNORE INTO Engagement (uid, weibo_id, time, like, comment, repost)
+        SELECT uid, weibo_id, browse_time, like, comment, repost FROM BrowseInformation
+        WHERE browse_time IS NOT NULL
+    ''')
+    rebuild_rollups(conn)
+
+
+def _engagement_trigger(conn):
+    """v9：汇总改由 Engagement 上的触发器维护，并按原始观测重建此前被重复观测放大的汇总。"""
+    from weibo_service.engagement import ROLLUP_TRIGGER, rebuild_rollups
+    conn.execute(ROLLUP_TRIGGER)
+    rebuild_rollups(conn)
+
+
+def _browse_fetch_time(conn):
+    """v10：浏览记录增加静态字段的抓取时间，命中详情缓存的浏览不再沿用第一次抓取的 browse_time。"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(BrowseInformation)')]
+    if 'fetch_time' not in columns:
+        conn.execute('ALTER TABLE BrowseInformation ADD COLUMN fetch_time TIMESTAMP')
+    conn.execute('UPDATE BrowseInformation SET fetch_time = browse_time WHERE fetch_time IS NULL')
+
+
+# (版本号, 语句或以连接为参数的迁移函数列表)，按版本顺序执行；已有数据库中的旧表用 IF NOT EXISTS 兼容
+MIGRATIONS = [
+    (1, [
+        '''
+        CREATE TABLE IF NOT EXISTS ActionLog (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action INTEGER,
+            uid VARCHAR(12),
+            user_name VARCHAR(30),
+            time TIMESTAMP,
+            action_content VARCHAR(2000),
+            object VARCHAR(12),
+            object_content VARCHAR(2000)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS BrowseInformation (
+            uid VARCHAR(12),
+            weibo_id VARCHAR(12),
+            user_name VARCHAR(30),
+            user_tag VARCHAR(100),
+            time TIMESTAMP,
+            text VARCHAR(2000),
+            img VARCHAR(200),
+            video VARCHAR(200),
+            repost VARCHAR(12),
+            like VARCHAR(12),
+            comment VARCHAR(12),
+            comment_content VARCHAR(50000),
+            browse_time TIMESTAMP,
+            browser_uid VARCHAR(12),
+            browse_type INTEGER,
+            PRIMARY KEY(uid, weibo_id, browser_uid, browse_type)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS Fans (
+            account_id VARCHAR(12),
+            fan_uid VARCHAR(12),
+            first_seen TIMESTAMP,
+            PRIMARY KEY(account_id, fan_uid)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS FanEvent (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            snapshot_id INTEGER,
+            account_id VARCHAR(12),
+            fan_uid VARCHAR(12),
+            event INTEGER,
+            time TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_fan_event_account_time ON FanEvent(account_id, time)',
+        '''
+        CREATE TABLE IF NOT EXISTS FanSnapshot (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id VARCHAR(12),
+            time TIMESTAMP,
+            fans_number INTEGER,
+            full_scan INTEGER
+        )
+        ''',
+    ]),
+    (2, [_migrate_v2]),
+    (3, [
+        '''
+        CREATE TABLE IF NOT EXISTS SearchDocument (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uid VARCHAR(12),
+            weibo_id VARCHAR(12),
+            source VARCHAR(8),
+            position INTEGER,
+            UNIQUE(uid, weibo_id, source, position)
+        )
+        ''',
+        # 中文在入库前已切分为二元组，这里只需按空格分词
+        'CREATE VIRTUAL TABLE IF NOT EXISTS WeiboSearch USING fts5(tokens)',
+        _build_search_index,
+    ]),
+    (4, [
+        '''
+        CREATE TABLE IF NOT EXISTS Engagement (
+            uid VARCHAR(12),
+            weibo_id VARCHAR(12),
+            time TIMESTAMP,
+            like INTEGER,
+            comment INTEGER,
+            repost INTEGER,
+            PRIMARY KEY(uid, weibo_id, time)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS EngagementHourly (
+            uid VARCHAR(12),
+            weibo_id VARCHAR(12),
+            bucket TIMESTAMP,
+            samples INTEGER,
+            last_time TIMESTAMP,
+            like INTEGER,
+            comment INTEGER,
+            repost INTEGER,
+            like_gain INTEGER,
+            comment_gain INTEGER,
+            repost_gain INTEGER,
+            PRIMARY KEY(uid, weibo_id, bucket)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_engagementhourly_bucket ON EngagementHourly(bucket)',
+        '''
+        CREATE TABLE IF NOT EXISTS EngagementDaily (
+            uid VARCHAR(12),
+            weibo_id VARCHAR(12),
+            bucket TIMESTAMP,
+            samples INTEGER,
+            last_time TIMESTAMP,
+            like INTEGER,
+            comment INTEGER,
+            repost INTEGER,
+            like_gain INTEGER,
+            comment_gain INTEGER,
+            repost_gain INTEGER,
+            PRIMARY KEY(uid, weibo_id, bucket)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_engagementdaily_bucket ON EngagementDaily(bucket)',
+        _backfill_engagement,
+    ]),
+    (5, [
+        '''
+        CREATE TABLE IF NOT EXISTS ExportState (
+            name VARCHAR(64) PRIMARY KEY,
+            high_water,
+            update_time TIMESTAMP
+        )
+        ''',
+    ]),
+    (6, [
+        '''
+        CREATE TABLE IF NOT EXISTS ActionRequest (
+            idempotency_key VARCHAR(128) PRIMARY KEY,
+            agent_id VARCHAR(12),
+            action_type VARCHAR(12),
+            fingerprint TEXT,
+            status VARCHAR(8),
+            result TEXT,
+            create_time TIMESTAMP,
+            finish_time TIMESTAMP
+        )
+        ''',
+    ]),
+    # 汇总由触发器在原始记录写入时增量更新，原始记录被归档后汇总仍然保留
+    (7, [
+        '''
+        CREATE TABLE IF NOT EXISTS ActionDaily (
+            uid VARCHAR(12),
+            day DATE,
+            action INTEGER,
+            count INTEGER,
+            PRIMARY KEY(uid, day, action)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS AuthorInteraction (
+            account_id VARCHAR(12),
+            author_uid VARCHAR(12),
+            action INTEGER,
+            count INTEGER,
+            last_time TIMESTAMP,
+            PRIMARY KEY(account_id, author_uid, action)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS FanDaily (
+            account_id VARCHAR(12),
+            day DATE,
+            follows INTEGER,
+            unfollows INTEGER,
+            fans_number INTEGER,
+            PRIMARY KEY(account_id, day)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO ActionDaily (uid, day, action, count)
+        SELECT uid, substr(time, 1, 10), action, COUNT(*) FROM ActionLog GROUP BY 1, 2, 3
+        ''',
+        # 发帖的 object 是自己的微博，不计入互动作者
+        '''
+        INSERT INTO AuthorInteraction (account_id, author_uid, action, count, last_time)
+        SELECT uid,
+               CASE WHEN instr(object, '/') > 0 THEN substr(object, 1, instr(object, '/') - 1) ELSE object END,
+               action, COUNT(*), MAX(time)
+        FROM ActionLog WHERE action != 1 AND object IS NOT NULL GROUP BY 1, 2, 3
+        ''',
+        '''
+        INSERT INTO FanDaily (account_id, day, follows, unfollows, fans_number)
+        SELECT account_id, substr(time, 1, 10), SUM(event = 1), SUM(event = 0), NULL FROM FanEvent GROUP BY 1, 2
+        ''',
+        '''
+        INSERT INTO FanDaily (account_id, day, follows, unfollows, fans_number)
+        SELECT account_id, substr(time, 1, 10), 0, 0, fans_number FROM FanSnapshot AS s
+        WHERE id = (SELECT MAX(id) FROM FanSnapshot WHERE account_id = s.account_id AND substr(time, 1, 10) = substr(s.time, 1, 10))
+        ON CONFLICT(account_id, day) DO UPDATE SET fans_number = excluded.fans_number
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_action_log_rollup AFTER INSERT ON ActionLog BEGIN
+            INSERT INTO ActionDaily (uid, day, action, count) VALUES (NEW.uid, substr(NEW.time, 1, 10), NEW.action, 1)
+            ON CONFLICT(uid, day, action) DO UPDATE SET count = count + 1;
+            INSERT INTO AuthorInteraction (account_id, author_uid, action, count, last_time)
+            SELECT NEW.uid,
+                   CASE WHEN instr(NEW.object, '/') > 0 THEN substr(NEW.object, 1, instr(NEW.object, '/') - 1)
+                        ELSE NEW.object END,
+                   NEW.action, 1, NEW.time
+            WHERE NEW.action != 1 AND NEW.object IS NOT NULL
+            ON CONFLICT(account_id, author_uid, action) DO UPDATE SET
+                count = count + 1, last_time = MAX(last_time, excluded.last_time);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fan_event_rollup AFTER INSERT ON FanEvent BEGIN
+            INSERT INTO FanDaily (account_id, day, follows, unfollows, fans_number)
+            VALUES (NEW.account_id, substr(NEW.time, 1, 10), NEW.event = 1, NEW.event = 0, NULL)
+            ON CONFLICT(account_id, day) DO UPDATE SET
+                follows = follows + excluded.follows, unfollows = unfollows + excluded.unfollows;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_fan_snapshot_rollup AFTER INSERT ON FanSnapshot BEGIN
+            INSERT INTO FanDaily (account_id, day, follows, unfollows, fans_number)
+            VALUES (NEW.account_id, substr(NEW.time, 1, 10), 0, 0, NEW.fans_number)
+            ON CONFLICT(account_id, day) DO UPDATE SET fans_number = excluded.fans_number;
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_author_interaction_author ON AuthorInteraction(author_uid)',
+    ]),
+    # 开发过程中创建的库可能留有明文 cookie 的 Session 表，直接删除，各账号下次启动时重新登录
+    (8, [
+        'DROP TABLE IF EXISTS Session',
+    ]),
+    (9, [_engagement_trigger]),
+    (10, [_browse_fetch_time]),
+]
+
+
+def default_db_path():
+    return os.getenv("WEIBO_DB_PATH") or DEFAULT_DB_PATH
+
+
+class Repository:
+    def __init__(self, db_path=None, pool_size=None):
+        self.db_path = db_path or default_db_path()
+        self.pool_size = pool_size if pool_size is not None else int(os.getenv("WEIBO_DB_POOL_SIZE", "4"))
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
+        self.migrate()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+        return conn
+
+    @contextmanager
+    def connect(self):
+        """从连接池借出一个连接，用完归还；池满时直接关闭。"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        with self.connect() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def query(self, sql, params=()):
+        with self.connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self.connect() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def schema_version(self):
+        return self.query_one('PRAGMA user_version')[0]
+
+    def migrate(self):
+        with self.connect() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for target, statements in MIGRATIONS:
+                if target <= version:
+                    continue
+                try:
+                    # 显式开启事务，DDL 和数据转换要么全部生效要么全部回滚
+                    conn.execute('BEGIN')
+                    for statement in statements:
+                        if callable(statement):
+                            statement(conn)
+                        else:
+                            conn.execute(statement)
+                    # PRAGMA 不支持参数绑定
+                    conn.execute(f'PRAGMA user_version = {int(target)}')
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                version = target
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def write_batch(self, items):
+        """
+        在一个事务中按顺序写入 [(sql, 参数), ...]，连续的相同语句合并为一次 executemany。
+
+        只合并相邻的语句：例如同一条微博先后两次“删除评论、写入评论”必须保持原来的先后顺序。
+        """
+        with self.transaction() as conn:
+            for sql, group in itertools.groupby(items, key=lambda item: item[0]):
+                conn.executemany(sql, [row for _, row in group])
+
+    def insert_action(self, action, uid, user_name, time, action_content=None, object=None, object_content=None):
+        self.write_batch([action_item(action, uid, user_name, time, action_content, object, object_content)])
+
+    def insert_browses(self, infos, browser_uid, browse_type):
+        """批量保存浏览到的微博，同一账号重复浏览同一条微博时忽略。"""
+        items = browse_items(infos, browser_uid, browse_type)
+        if items:
+            self.write_batch(items)
+
+
+ACTION_INSERT = '''
+    INSERT INTO ActionLog
+    (action, uid, user_name, time, action_content, object, object_content)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+BROWSE_INSERT = '''
+    INSERT OR IGNORE INTO BrowseInformation
+    (uid, weibo_id, user_name, user_tag, time, text, img, video, repost, like, comment, browse_time, browser_uid,
+     browse_type, fetch_time)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+COMMENT_DELETE = 'DELETE FROM WeiboComment WHERE uid = ? AND weibo_id = ?'
+
+COMMENT_INSERT = '''
+    INSERT OR REPLACE INTO WeiboComment (uid, weibo_id, position, content, fetch_time)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def action_item(action, uid, user_name, time, action_content=None, object=None, object_content=None):
+    return ACTION_INSERT, (action, uid, user_name, time, action_content, object, object_content)
+
+
+def browse_items(infos, browser_uid, browse_type):
+    """浏览记录及其评论；抓到评论时用最新一次的评论替换旧评论。"""
+    items = []
+    for info in infos:
+        if info is None:
+            continue
+        uid, weibo_id = str(info['account_id']), str(info['weibo_id'])
+        items.append((BROWSE_INSERT, (
+            uid,
+            weibo_id,
+            info['username'],
+            info['user_tag'],
+            info['time'],
+            info['text'],
+            json.dumps(info['imgs'], ensure_ascii=False),
+            info['video'],
+            parse_count(info['repost_num']),
+            parse_count(info['like_num']),
+            parse_count(info['comment_num']),
+            info['browse_time'],
+            browser_uid,
+            browse_type,
+            # 沿用缓存的详情时为静态字段实际抓取的时间
+            info.get('fetch_time') or info['browse_time'],
+        )))
+        if info['comment']:
+            items.append((COMMENT_DELETE, (uid, weibo_id)))
+            items.extend(
+                (COMMENT_INSERT, (uid, weibo_id, position, content, info['browse_time']))
+                for position, content in enumerate(info['comment'])
+            )
+    return items
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(db_path=None):
+    """同一数据库路径在进程内共用一个 Repository（及其连接池），迁移只执行一次。"""
+    path = os.path.abspath(db_path or default_db_path())
+    with _repositories_lock:
+        if path not in _repositories:
+            _repositories[path] = Repository(path)
+        return _repositories[path]
+
+
+if __name__ == '__main__':
+    # 以脚本方式运行时，迁移函数需要能导入 weibo_service 包
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    parser = argparse.ArgumentParser(description="WeiboAct.db 表结构迁移")
+    parser.add_argument('command', choices=['migrate', 'version'])
+    parser.add_argument('--db', default=None, help="数据库路径，默认取 WEIBO_DB_PATH 或项目根目录下的 WeiboAct.db")
+    args = parser.parse_args()
+
+    path = args.db or default_db_path()
+    conn = sqlite3.connect(path)
+    try:
+        before = conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+    if args.command == 'version':
+        print(f"{path}: 表结构版本 {before}，最新版本 {MIGRATIONS[-1][0]}")
+    else:
+        repository = Repository(path)
+        print(f"{path}: 表结构版本 {before} -> {repository.schema_version()}")
+        repository.close()
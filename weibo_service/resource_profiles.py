@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+资源拦截与页面加载策略配置。
+
+浏览器级别（作用于整个浏览器，启动时生效；驱动池租借时按账号的配置重新写入）：
+- block_hosts / block_urls：按主机名或完整 URL（shExpMatch 通配符）拦截的请求（广告、统计、视频流、字体等），
+  通过 PAC 脚本把匹配的请求指向一个不可用的代理实现，与账号代理共存。
+  浏览器启动时关闭了代理失败后直连的回退，并让 PAC 拿到 https 请求的完整路径，见 driver_pool.build_firefox_options。
+- block_images / block_fonts / block_media：对应的 Firefox 首选项。
+
+操作级别：
+- page_load_strategy：'none' 只等新页面开始加载，'eager' 等 DOMContentLoaded，
+  'normal' 等 load 事件。浏览器会话本身以 'none' 启动，由 WeiboBot 按操作决定等待到哪一步。
+"""
+from urllib.parse import quote
+
+# PAC 返回该地址时请求会立即失败，相当于拦截
+BLACKHOLE = "PROXY 127.0.0.1:9"
+
+AD_HOSTS = [
+    '*.doubleclick.net',
+    '*.googlesyndication.com',
+    '*.google-analytics.com',
+    '*.googletagmanager.com',
+    'beacon.sina.com.cn',
+    'sbeacon.sina.com.cn',
+    'log.mix.sina.com.cn',
+    'sax.sina.com.cn',
+    'wbclick.biz.weibo.com',
+]
+
+MEDIA_HOSTS = [
+    '*.video.weibocdn.com',
+]
+
+MEDIA_URLS = [
+    '*.mp4',
+    '*.mp4?*',
+    '*.m3u8',
+    '*.m3u8?*',
+    '*.flv',
+    '*.flv?*',
+]
+
+FONT_URLS = [
+    '*.woff',
+    '*.woff?*',
+    '*.woff2',
+    '*.woff2?*',
+    '*.ttf',
+    '*.ttf?*',
+]
+
+RESOURCE_PROFILES = {
+    'scrape': {
+        'page_load_strategy': 'none',
+        'block_hosts': AD_HOSTS + MEDIA_HOSTS,
+        'block_urls': MEDIA_URLS + FONT_URLS,
+        'block_images': True,
+        'block_fonts': True,
+        'block_media': True,
+    },
+    'post': {
+        'page_load_strategy': 'eager',
+        'block_hosts': AD_HOSTS,
+        'block_urls': FONT_URLS,
+        'block_images': True,
+        'block_fonts': True,
+        'block_media': True,
+    },
+}
+
+OPERATION_PROFILES = {
+    'login': 'post',
+    'post': 'post',
+    'repost': 'post',
+    'comment': 'post',
+    'like': 'post',
+    'follow': 'post',
+    'unfollow': 'post',
+    'detail': 'scrape',
+    'feed': 'scrape',
+    'fans': 'scrape',
+}
+
+
+def get_profile(name):
+    try:
+        return RESOURCE_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"未知的资源配置: {name}")
+
+
+def operation_profile(operation):
+    return RESOURCE_PROFILES[OPERATION_PROFILES.get(operation, 'scrape')]
+
+
+def pac_script(block_hosts, proxy=None, block_urls=()):
+    upstream = f"PROXY {proxy}" if proxy is not None else "DIRECT"
+    checks = [f"    if (shExpMatch(host, '{pattern}')) return '{BLACKHOLE}';" for pattern in block_hosts]
+    checks += [f"    if (shExpMatch(url, '{pattern}')) return '{BLACKHOLE}';" for pattern in block_urls]
+    return "function FindProxyForURL(url, host) {\n" + "\n".join(checks) + f"\n    return '{upstream}';\n}}"
+
+
+# profile_preferences 可能写入的全部首选项，切换配置时未出现的项恢复默认
+PROFILE_PREFERENCES = (
+    'permissions.default.image',
+    'gfx.downloadable_fonts.enabled',
+    'browser.display.use_document_fonts',
+    'media.autoplay.default',
+    'media.autoplay.blocking_policy',
+    'media.preload.default',
+    'media.preload.auto',
+)
+
+
+def profile_preferences(profile):
+    """返回资源配置对应的 Firefox 首选项（不含代理）。"""
+    prefs = {}
+    if profile.get('block_images'):
+        prefs['permissions.default.image'] = 2
+    if profile.get('block_fonts'):
+        prefs['gfx.downloadable_fonts.enabled'] = False
+        prefs['browser.display.use_document_fonts'] = 0
+    if profile.get('block_media'):
+        prefs['media.autoplay.default'] = 5
+        prefs['media.autoplay.blocking_policy'] = 2
+        prefs['media.preload.default'] = 0
+        prefs['media.preload.auto'] = 0
+    return prefs
+
+
+def pac_preferences(profile, proxy=None):
+    """有拦截列表时用 PAC 同时处理拦截和账号代理；返回 None 表示使用普通代理设置。"""
+    if not profile.get('block_hosts') and not profile.get('block_urls'):
+        return None
+    script = pac_script(profile.get('block_hosts', ()), proxy, profile.get('block_urls', ()))
+    return {
+        'network.proxy.type': 2,
+        'network.proxy.autoconfig_url': "data:application/x-ns-proxy-autoconfig," + quote(script),
+    }
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+数据保留与归档：按表配置保留天数，过期的行先写入按日期分区的压缩 JSONL 归档，再从库中删除，
+随后做增量 vacuum，让常用数据保持在页缓存能容纳的大小。
+
+- 保留天数默认见 DEFAULT_TTL_DAYS，可用 WEIBO_RETENTION_DAYS 覆盖，如 "BrowseInformation=14,ActionLog=365"，
+  0 表示永久保留。
+- 归档目录 WEIBO_ARCHIVE_DIR（默认项目根目录下的 archive），文件为 <表名>/<日期>.jsonl.zst；
+  未安装 zstandard 时使用 gzip（.jsonl.gz）。两种格式都可以直接追加，同一天的行分多次归档也没有问题。
+- 先写归档再删行：中途退出时最多在归档里重复一部分行，不会丢数据。
+- WEIBO_RETENTION_INTERVAL 大于 0 时 WeiboBots 每隔该秒数在后台执行一次。
+
+命令行：python -m weibo_service.retention stats|run|vacuum [--db 路径] [--dry-run]
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+from weibo_service.repository import DEFAULT_DB_PATH, get_repository
+
+# 表名 -> (时间列, 主键列)
+TABLES = {
+    'BrowseInformation': ('browse_time', ('uid', 'weibo_id', 'browser_uid', 'browse_type')),
+    'WeiboComment': ('fetch_time', ('uid', 'weibo_id', 'position')),
+    'ActionLog': ('time', ('id',)),
+    'Engagement': ('time', ('uid', 'weibo_id', 'time')),
+    'EngagementHourly': ('bucket', ('uid', 'weibo_id', 'bucket')),
+    'EngagementDaily': ('bucket', ('uid', 'weibo_id', 'bucket')),
+    'FanEvent': ('time', ('id',)),
+    'FanSnapshot': ('time', ('id',)),
+    'ActionRequest': ('create_time', ('idempotency_key',)),
+}
+
+DEFAULT_TTL_DAYS = {
+    'BrowseInformation': 30,
+    'WeiboComment': 30,
+    'ActionLog': 180,
+    'Engagement': 30,
+    'EngagementHourly': 90,
+    'EngagementDaily': 0,
+    'FanEvent': 365,
+    'FanSnapshot': 90,
+    'ActionRequest': 7,
+}
+
+# 按账号统计时使用的账号列
+ACCOUNT_COLUMNS = {
+    'BrowseInformation': 'browser_uid',
+    'ActionLog': 'uid',
+    'Fans': 'account_id',
+    'FanEvent': 'account_id',
+    'FanSnapshot': 'account_id',
+    'ActionRequest': 'agent_id',
+}
+
+
+def ttl_days():
+    ttl = dict(DEFAULT_TTL_DAYS)
+    for entry in os.getenv("WEIBO_RETENTION_DAYS", "").split(','):
+        if '=' not in entry:
+            continue
+        table, days = entry.split('=', 1)
+        if table.strip() not in TABLES:
+            raise ValueError(f"未知的表: {table.strip()}")
+        ttl[table.strip()] = int(days)
+    return ttl
+
+
+class _Archive:
+    """按 表名/日期 打开的追加写入文件。"""
+
+    def __init__(self, root, compression):
+        self.root = root
+        self.compression = compression
+        self._files = {}
+
+    def write(self, table, day, row):
+        key = (table, day)
+        if key not in self._files:
+            directory = os.path.join(self.root, table)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{day}.jsonl.{self.compression}')
+            if self.compression == 'zst':
+                raw = open(path, 'ab')
+                self._files[key] = (raw, zstandard.ZstdCompressor().stream_writer(raw))
+            else:
+                self._files[key] = (None, gzip.open(path, 'ab'))
+        self._files[key][1].write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def close(self):
+        for raw, stream in self._files.values():
+            stream.close()
+            if raw is not None:
+                raw.close()
+        self._files = {}
+
+
+class RetentionManager:
+    def __init__(self, db_path=None, archive_root=None, ttl=None, compression=None, chunk_size=5000):
+        self.repository = get_repository(db_path)
+        self.archive_root = archive_root or os.getenv(
+            "WEIBO_ARCHIVE_DIR", os.path.join(os.path.dirname(DEFAULT_DB_PATH), 'archive')
+        )
+        self.ttl = ttl if ttl is not None else ttl_days()
+        self.compression = compression or ('zst' if zstandard is not None else 'gz')
+        if self.compression == 'zst' and zstandard is None:
+            raise ValueError("zst 归档需要安装 zstandard")
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+
+    def _columns(self, conn, table):
+        return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+    def archive_table(self, table, cutoff, dry_run=False):
+        """归档并删除 table 中早于 cutoff 的行，返回行数。"""
+        time_column, keys = TABLES[table]
+        if dry_run:
+            return self.repository.query_one(
+                f'SELECT COUNT(*) FROM {table} WHERE {time_column} < ?', (cutoff,)
+            )[0]
+
+        archived = 0
+        while True:
+            archive = _Archive(self.archive_root, self.compression)
+            with self.repository.transaction() as conn:
+                columns = self._columns(conn, table)
+                rows = conn.execute(
+                    f'SELECT * FROM {table} WHERE {time_column} < ? ORDER BY {time_column} LIMIT ?',
+                    (cutoff, self.chunk_size),
+                ).fetchall()
+                if not rows:
+                    return archived
+
+                time_index = columns.index(time_column)
+                key_indexes = [columns.index(key) for key in keys]
+                try:
+                    for row in rows:
+                        archive.write(table, str(row[time_index])[:10], dict(zip(columns, row)))
+                finally:
+                    archive.close()
+
+                conn.executemany(
+                    f'DELETE FROM {table} WHERE ' + ' AND '.join(f'{key} = ?' for key in keys),
+                    [tuple(row[index] for index in key_indexes) for row in rows],
+                )
+            archived += len(rows)
+
+    def _prune_search(self):
+        """删除正文或评论已经不在库中的全文索引。"""
+        with self.repository.transaction() as conn:
+            orphans = '''
+                SELECT id FROM SearchDocument AS d WHERE
+                    (d.source = 'text' AND NOT EXISTS (
+                        SELECT 1 FROM BrowseInformation WHERE uid = d.uid AND weibo_id = d.weibo_id
+                    ))
+                    OR (d.source = 'comment' AND NOT EXISTS (
+                        SELECT 1 FROM WeiboComment WHERE uid = d.uid AND weibo_id = d.weibo_id AND position = d.position
+                    ))
+            '''
+            conn.execute(f'DELETE FROM WeiboSearch WHERE rowid IN ({orphans})')
+            return conn.execute(f'DELETE FROM SearchDocument WHERE id IN ({orphans})').rowcount
+
+    def run(self, dry_run=False, now=None):
+        """按保留天数归档所有表，返回 {表名: 行数}。"""
+        now = now or datetime.now()
+        result = {}
+        with self._lock:
+            for table, days in self.ttl.items():
+                if not days:
+                    continue
+                cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+                result[table] = self.archive_table(table, cutoff, dry_run)
+            if not dry_run and any(result.values()):
+                result['SearchDocument'] = self._prune_search()
+                self.vacuum()
+        return result
+
+    def vacuum(self, pages=None):
+        """
+        释放空闲页。第一次执行时把数据库切换为增量 vacuum 模式（需要一次完整 VACUUM），
+        之后每次只释放空闲页，不重写整个文件。
+        """
+        with self.repository.connect() as conn:
+            # 合并全文索引的分段，删除过的词条在这里才真正释放
+            conn.execute("INSERT INTO WeiboSearch(WeiboSearch) VALUES ('optimize')")
+            conn.commit()
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            else:
+                conn.execute(f'PRAGMA incremental_vacuum({int(pages or 0)})').fetchall()
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    def stats(self):
+        """每张表的行数与占用字节数，以及每个账号在各表中的行数。"""
+        with self.repository.connect() as conn:
+            tables = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )]
+            try:
+                # dbstat 需要 SQLite 编译时开启 SQLITE_ENABLE_DBSTAT_VTAB，索引大小计入所属的表
+                sizes = dict(conn.execute('''
+                    SELECT COALESCE(m.tbl_name, s.name), SUM(s.pgsize) FROM dbstat AS s
+                    LEFT JOIN sqlite_master AS m ON m.name = s.name
+                    GROUP BY 1
+                ''').fetchall())
+            except sqlite3.OperationalError:
+                sizes = {}
+
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            result = {
+                'file_bytes': os.path.getsize(self.repository.db_path),
+                'wal_bytes': (
+                    os.path.getsize(self.repository.db_path + '-wal')
+                    if os.path.exists(self.repository.db_path + '-wal') else 0
+                ),
+                'free_bytes': conn.execute('PRAGMA freelist_count').fetchone()[0] * page_size,
+                'tables': {},
+                'accounts': {},
+            }
+            for table in tables:
+                if table.startswith('WeiboSearch_'):
+                    continue
+                bytes_ = sizes.get(table)
+                if table == 'WeiboSearch':
+                    bytes_ = sum(size for name, size in sizes.items() if name.startswith('WeiboSearch_')) or None
+                result['tables'][table] = {
+                    'rows': conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0],
+                    'bytes': bytes_,
+                }
+
+            for table, column in ACCOUNT_COLUMNS.items():
+                if table not in tables:
+                    continue
+                for account_id, count in conn.execute(
+                    f'SELECT {column}, COUNT(*) FROM {table} GROUP BY {column}'
+                ):
+                    result['accounts'].setdefault(str(account_id), {})[table] = count
+        return result
+
+    def start(self, interval):
+        """每隔 interval 秒在后台线程中执行一次 run()。"""
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    print("数据归档:", self.run())
+                except Exception as e:
+                    print("数据归档发生错误:", str(e))
+
+        stop = threading.Event()
+        threading.Thread(target=loop, name="weibo-retention", daemon=True).start()
+        return stop
+
+
+def _format_bytes(value):
+    if value is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f'{value:.1f}{unit}' if unit != 'B' else f'{value}B'
+        value /= 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="WeiboAct.db 数据保留、归档与空间统计")
+    parser.add_argument('command', choices=['stats', 'run', 'vacuum'])
+    parser.add_argument('--db', default=None, help="数据库路径，默认取 WEIBO_DB_PATH 或项目根目录下的 WeiboAct.db")
+    parser.add_argument('--dry-run', action='store_true', help="只统计将要归档的行数")
+    args = parser.parse_args()
+
+    manager = RetentionManager(args.db)
+    if args.command == 'stats':
+        stats = manager.stats()
+        print(
+            f"文件 {_format_bytes(stats['file_bytes'])}，WAL {_format_bytes(stats['wal_bytes'])}，"
+            f"空闲 {_format_bytes(stats['free_bytes'])}"
+        )
+        for table, info in sorted(stats['tables'].items(), key=lambda item: -(item[1]['bytes'] or 0)):
+            print(f"  {table:<20} {info['rows']:>10} 行  {_format_bytes(info['bytes']):>10}")
+        print("按账号：")
+        for account_id, counts in sorted(stats['accounts'].items()):
+            print(f"  {account_id:<14} " + '  '.join(f"{table}={count}" for table, count in sorted(counts.items())))
+    elif args.command == 'run':
+        for table, count in manager.run(dry_run=args.dry_run).items():
+            print(f"  {table:<20} {count:>10} 行")
+    else:
+        print("空闲页:", manager.vacuum())
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+按账号调度：每个账号一个优先级队列和一个工作线程，同一账号的请求依次执行，账号之间互不阻塞。
+
+- 全局浏览器并发上限 WEIBO_BROWSER_CONCURRENCY（默认 10）只作用于真正驱动浏览器的代码段：
+  bot 先拿到自己的 seleniumLock 再占用全局名额，在自己账号队列里排队的请求不占名额。
+- 同一账号内动作优先于读取（ACTION < FEEDBACK < READ），同一优先级按提交顺序执行。
+- 工作线程空闲 WEIBO_SCHEDULER_IDLE 秒（默认 60）后退出，下次提交时重新启动。
+- stats() 给出每个账号的队列深度、排队等待时间，BrowserGate.stats() 给出全局名额的占用与等待时间。
+- submit 直接返回账号队列中的 Future，排队中的任务可以取消；所有账号未完成的任务超过
+  WEIBO_SCHEDULER_QUEUE 个（默认 1000）时 submit 阻塞，突发请求不会无限堆积内存。
+"""
+import itertools
+import os
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, wait
+from time import perf_counter
+
+ACTION, FEEDBACK, READ = 0, 1, 2
+
+_STOP = float('inf')
+
+
+def _wait_metrics():
+    return {'count': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_wait': 0.0}
+
+
+def _summary(metrics):
+    metrics = dict(metrics)
+    metrics['mean_wait'] = round(metrics['wait_seconds'] / metrics['count'], 3) if metrics['count'] else 0
+    metrics['wait_seconds'] = round(metrics['wait_seconds'], 3)
+    metrics['max_wait'] = round(metrics['max_wait'], 3)
+    return metrics
+
+
+class BrowserGate:
+    """所有 bot 共享的浏览器并发名额。"""
+
+    def __init__(self, limit=None):
+        self.limit = limit or int(os.getenv("WEIBO_BROWSER_CONCURRENCY", "10"))
+        self._semaphore = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._metrics = defaultdict(_wait_metrics)
+
+    def acquire(self, account_id=None):
+        start = perf_counter()
+        waited = not self._semaphore.acquire(blocking=False)
+        if waited:
+            self._semaphore.acquire()
+        elapsed = perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            for key in ('*', str(account_id)) if account_id is not None else ('*',):
+                metrics = self._metrics[key]
+                metrics['count'] += 1
+                metrics['waited'] += waited
+                metrics['wait_seconds'] += elapsed
+                metrics['max_wait'] = max(metrics['max_wait'], elapsed)
+
+    def release(self):
+        with self._lock:
+            self._in_use -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            metrics = {key: _summary(value) for key, value in self._metrics.items()}
+            total = metrics.pop('*', _summary(_wait_metrics()))
+            return dict(total, limit=self.limit, in_use=self._in_use, accounts=metrics)
+
+
+class BrowserLock:
+    """
+    bot 的 seleniumLock：先获取账号自己的锁，再占用全局名额；退出时按相反顺序释放。
+    等待自己浏览器的请求不会占着全局名额。
+    """
+
+    def __init__(self, gate=None, account_id=None):
+        self.gate = gate
+        self.account_id = account_id
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        self._lock.acquire()
+        if self.gate is not None:
+            try:
+                self.gate.acquire(self.account_id)
+            except BaseException:
+                self._lock.release()
+                raise
+        return True
+
+    def release(self):
+        if self.gate is not None:
+            self.gate.release()
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Lane:
+    def __init__(self):
+        self.queue = queue.PriorityQueue()
+        self.futures = set()
+        self.worker = None
+        self.running = False
+        self.metrics = dict(_wait_metrics(), completed=0, failed=0)
+
+
+class AccountScheduler:
+    def __init__(self, idle_timeout=None, max_pending=None):
+        self.idle_timeout = (
+            idle_timeout if idle_timeout is not None else float(os.getenv("WEIBO_SCHEDULER_IDLE", "60"))
+        )
+        self.max_pending = max_pending or int(os.getenv("WEIBO_SCHEDULER_QUEUE", "1000"))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._blocked_submits = 0
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._closed = False
+
+    def submit(self, account_id, fn, *args, priority=READ, **kwargs):
+        """
+        把 fn(*args, **kwargs) 放进账号的队列，返回 concurrent.futures.Future。
+        未完成的任务达到上限时阻塞，直到有任务完成或被取消。
+        """
+        key = str(account_id)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._blocked_submits += 1
+            self._slots.acquire()
+
+        future = Future()
+        with self._lock:
+            if self._closed:
+                self._slots.release()
+                raise RuntimeError("调度器已关闭")
+            lane = self._lanes.setdefault(key, _Lane())
+            lane.futures.add(future)
+            lane.queue.put((priority, next(self._sequence), perf_counter(), future, fn, args, kwargs))
+            if lane.worker is None:
+                lane.worker = threading.Thread(
+                    target=self._work, args=(key, lane), name=f"weibo-account-{key}", daemon=True
+                )
+                lane.worker.start()
+        # 完成、失败或被取消时都会回调，释放名额
+        future.add_done_callback(lambda done: self._finish(lane, done))
+        return future
+
+    def _finish(self, lane, future):
+        with self._lock:
+            lane.futures.discard(future)
+        self._slots.release()
+
+    def run(self, account_id, fn, *args, priority=READ, **kwargs):
+        """提交并等待结果，fn 抛出的异常原样抛出。"""
+        return self.submit(account_id, fn, *args, priority=priority, **kwargs).result()
+
+    def _work(self, key, lane):
+        while True:
+            try:
+                priority, _, queued_at, future, fn, args, kwargs = lane.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    # 加锁后再确认一次，避免与 submit 竞争导致任务无人执行
+                    if lane.queue.empty():
+                        lane.worker = None
+                        return
+                continue
+            if priority == _STOP:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            waited = perf_counter() - queued_at
+            with self._lock:
+                lane.running = True
+                lane.metrics['count'] += 1
+                lane.metrics['waited'] += waited > 0.001
+                lane.metrics['wait_seconds'] += waited
+                lane.metrics['max_wait'] = max(lane.metrics['max_wait'], waited)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                failed = True
+            else:
+                future.set_result(result)
+                failed = False
+            with self._lock:
+                lane.running = False
+                lane.metrics['failed' if failed else 'completed'] += 1
+
+    def drain(self, account_id=None, timeout=None):
+        """等待账号（为空时为全部账号）当前未完成的任务，返回超时后仍未完成的数量。"""
+        with self._lock:
+            if account_id is None:
+                futures = [future for lane in self._lanes.values() for future in lane.futures]
+            else:
+                lane = self._lanes.get(str(account_id))
+                futures = list(lane.futures) if lane is not None else []
+        return len(wait(futures, timeout).not_done)
+
+    def pending_stats(self):
+        with self._lock:
+            return {
+                'pending': sum(len(lane.futures) for lane in self._lanes.values()),
+                'max_pending': self.max_pending,
+                'blocked_submits': self._blocked_submits,
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                key: dict(
+                    _summary(lane.metrics),
+                    depth=lane.queue.qsize(),
+                    pending=len(lane.futures),
+                    running=lane.running,
+                    worker=lane.worker is not None,
+                )
+                for key, lane in self._lanes.items()
+            }
+
+    def close(self):
+        """不再接受新任务；各账号执行完已排队的任务后退出。"""
+        with self._lock:
+            self._closed = True
+            lanes = [lane for lane in self._lanes.values() if lane.worker is not None]
+            for lane in lanes:
+                lane.queue.put((_STOP, next(self._sequence), 0, None, None, (), {}))
+        for lane in lanes:
+            worker = lane.worker
+            if worker is not None and worker is not threading.current_thread():
+                worker.join()
+
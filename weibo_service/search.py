@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+全文检索：用 SQLite FTS5 为浏览过的微博正文和评论建立索引。
+
+- FTS5 自带的分词器不会切分中文，入库前先把连续的中日韩文字切成重叠的二元组
+  （'狗拿耗子' -> '狗拿 拿耗 耗子'），英文和数字按原样小写保留。
+- 查询按同样的方式切分，每个词作为短语匹配，相当于子串搜索；多个词之间为“且”。
+  单个汉字只能做前缀匹配（'猫' 能搜到 '猫咪'，搜不到 '小猫'）。
+- 索引由后台写入线程与浏览记录一起维护（见 search_items），已有数据在迁移 v3 中补建。
+"""
+import re
+import threading
+
+from weibo_service.repository import get_repository
+
+TEXT, COMMENT = 'text', 'comment'
+
+# 中日韩统一表意文字（含扩展 A 和兼容区）、日文假名、韩文音节
+_CJK = '㐀-䶿一-鿿豈-﫿぀-ヿ가-힯'
+_RUN = re.compile(f'[{_CJK}]+|[^\\W_]+')
+_CJK_RUN = re.compile(f'[{_CJK}]+')
+
+SEARCH_DOC_INSERT = '''
+    INSERT OR IGNORE INTO SearchDocument (uid, weibo_id, source, position)
+    VALUES (?, ?, ?, ?)
+'''
+
+SEARCH_INSERT = '''
+    INSERT OR REPLACE INTO WeiboSearch (rowid, tokens)
+    SELECT id, ? FROM SearchDocument WHERE uid = ? AND weibo_id = ? AND source = ? AND position = ?
+'''
+
+# 新抓到的评论比上次少时，删掉多出来的旧评论
+SEARCH_TRIM = '''
+    DELETE FROM WeiboSearch WHERE rowid IN (
+        SELECT id FROM SearchDocument WHERE uid = ? AND weibo_id = ? AND source = 'comment' AND position >= ?
+    )
+'''
+
+SEARCH_DOC_TRIM = '''
+    DELETE FROM SearchDocument WHERE uid = ? AND weibo_id = ? AND source = 'comment' AND position >= ?
+'''
+
+
+def tokenize(text):
+    """把文本切分为空格分隔的词：汉字按二元组，其余按单词。"""
+    tokens = []
+    for run in _RUN.findall(str(text or '')):
+        if _CJK_RUN.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return ' '.join(tokens)
+
+
+def match_expression(query):
+    """把用户输入转换为 FTS5 查询；没有可检索的词时返回 None。"""
+    phrases = []
+    for word in str(query or '').split():
+        tokens = tokenize(word).split()
+        if not tokens:
+            continue
+        if len(tokens) == 1 and len(tokens[0]) == 1 and _CJK_RUN.fullmatch(tokens[0]):
+            phrases.append(f'"{tokens[0]}"*')
+        else:
+            phrases.append('"' + ' '.join(tokens) + '"')
+    return ' AND '.join(phrases) or None
+
+
+def _document_items(uid, weibo_id, source, position, content):
+    return [
+        (SEARCH_DOC_INSERT, (uid, weibo_id, source, position)),
+        (SEARCH_INSERT, (tokenize(content), uid, weibo_id, source, position)),
+    ]
+
+
+def search_items(infos):
+    """与浏览记录一起提交给写入线程的索引更新：正文覆盖旧索引，抓到评论时替换旧评论。"""
+    items = []
+    for info in infos:
+        if info is None:
+            continue
+        uid, weibo_id = str(info['account_id']), str(info['weibo_id'])
+        if info['text']:
+            items.extend(_document_items(uid, weibo_id, TEXT, 0, info['text']))
+        if info['comment']:
+            for position, content in enumerate(info['comment']):
+                items.extend(_document_items(uid, weibo_id, COMMENT, position, content))
+            items.append((SEARCH_TRIM, (uid, weibo_id, len(info['comment']))))
+            items.append((SEARCH_DOC_TRIM, (uid, weibo_id, len(info['comment']))))
+    return items
+
+
+def rebuild(conn):
+    """从 BrowseInformation 和 WeiboComment 重新生成全部索引。"""
+    conn.execute('DELETE FROM WeiboSearch')
+    conn.execute('DELETE FROM SearchDocument')
+
+    # 同一条微博可能被多个账号浏览过，取最近一次的正文
+    cursor = conn.execute('''
+        SELECT uid, weibo_id, text FROM BrowseInformation AS b
+        WHERE browse_time = (
+            SELECT MAX(browse_time) FROM BrowseInformation WHERE uid = b.uid AND weibo_id = b.weibo_id
+        )
+        GROUP BY uid, weibo_id
+    ''')
+    for rows in iter(lambda: cursor.fetchmany(500), []):
+        for uid, weibo_id, text in rows:
+            if text:
+                for sql, params in _document_items(uid, weibo_id, TEXT, 0, text):
+                    conn.execute(sql, params)
+
+    cursor = conn.execute('SELECT uid, weibo_id, position, content FROM WeiboComment')
+    for rows in iter(lambda: cursor.fetchmany(500), []):
+        for uid, weibo_id, position, content in rows:
+            for sql, params in _document_items(uid, weibo_id, COMMENT, position, content):
+                conn.execute(sql, params)
+
+
+class SearchIndex:
+    def __init__(self, db_path=None):
+        self.repository = get_repository(db_path)
+
+    def search(self, query, limit=20, offset=0, source=None, uid=None):
+        """
+        按相关度返回命中的正文或评论，每条包含 uid、weibo_id、来源、位置和原文。
+        source 可限定为 'text' 或 'comment'，uid 可限定微博作者。
+        """
+        expression = match_expression(query)
+        if expression is None:
+            return []
+
+        conditions, params = ['WeiboSearch MATCH ?'], [expression]
+        if source:
+            conditions.append('d.source = ?')
+            params.append(source)
+        if uid:
+            conditions.append('d.uid = ?')
+            params.append(str(uid))
+        params.extend([int(limit), int(offset)])
+
+        rows = self.repository.query(f'''
+            SELECT d.uid, d.weibo_id, d.source, d.position, WeiboSearch.rank,
+                   CASE d.source
+                       WHEN 'text' THEN (
+                           SELECT text FROM BrowseInformation
+                           WHERE uid = d.uid AND weibo_id = d.weibo_id
+                           ORDER BY browse_time DESC LIMIT 1
+                       )
+                       ELSE (
+                           SELECT content FROM WeiboComment
+                           WHERE uid = d.uid AND weibo_id = d.weibo_id AND position = d.position
+                       )
+                   END
+            FROM WeiboSearch JOIN SearchDocument AS d ON d.id = WeiboSearch.rowid
+            WHERE {' AND '.join(conditions)}
+            ORDER BY WeiboSearch.rank
+            LIMIT ? OFFSET ?
+        ''', params)
+
+        return [{
+            'object_id': f'{row[0]}/{row[1]}',
+            'uid': row[0],
+            'weibo_id': row[1],
+            'source': row[2],
+            'position': row[3],
+            'score': round(-row[4], 4),
+            'content': row[5],
+        } for row in rows]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
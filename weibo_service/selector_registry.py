@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+选择器注册表：每个逻辑元素对应一组按优先级排列的候选选择器（数据文件 selectors.json），
+一次 execute_script 依次尝试全部候选，并记住上次命中的候选，下次优先尝试。
+
+- 候选格式：{"xpath": ...} 或 {"css": ...}。
+- 数据文件路径可通过 WEIBO_SELECTORS 配置。
+- 页面加载完成后 WEIBO_SELECTOR_GRACE 秒（默认 5）内仍没有候选命中时立即失败，
+  不再等满整个超时预算。
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+from time import perf_counter
+
+from selenium.common.exceptions import TimeoutException
+
+SELECTORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'selectors.json')
+
+# 供各提取脚本复用：__weiboRace 按顺序尝试候选，返回 [命中候选的原始序号, 匹配到的节点]
+QUERY_JS = """
+    var __weiboQuery = function(candidate) {
+        if (candidate.css) return Array.prototype.slice.call(document.querySelectorAll(candidate.css));
+        var snapshot = document.evaluate(
+            candidate.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+        );
+        var nodes = [];
+        for (var i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+        return nodes;
+    };
+    var __weiboRace = function(candidates) {
+        for (var i = 0; i < candidates.length; i++) {
+            var nodes = __weiboQuery(candidates[i]);
+            if (nodes.length) return [candidates[i].index, nodes];
+        }
+        return [null, []];
+    };
+"""
+
+LOCATE_SCRIPT = QUERY_JS + """
+    var result = __weiboRace(arguments[0]);
+    var found = arguments[1] ? result[1] : (result[1][0] || null);
+    return [result[0], found, window.__weiboStale ? null : document.readyState];
+"""
+
+
+class SelectorRegistry:
+    def __init__(self, path=None, grace=None):
+        self.path = path or os.getenv("WEIBO_SELECTORS") or SELECTORS_PATH
+        self.grace = grace if grace is not None else float(os.getenv("WEIBO_SELECTOR_GRACE", "5"))
+        with open(self.path, encoding='utf-8') as f:
+            self.selectors = json.load(f)
+
+        self._winners = {}
+        self._misses = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def candidates(self, name):
+        """按上次命中优先的顺序返回候选，每个候选带上它在数据文件中的序号。"""
+        try:
+            candidates = self.selectors[name]
+        except KeyError:
+            raise ValueError(f"未知的选择器: {name}")
+
+        ordered = [dict(candidate, index=index) for index, candidate in enumerate(candidates)]
+        winner = self._winners.get(name)
+        if winner:
+            ordered.insert(0, ordered.pop(winner))
+        return ordered
+
+    def hit(self, name, index):
+        """记录一次查找结果；index 为 None 表示所有候选都未命中。"""
+        with self._lock:
+            if index is None:
+                self._misses[name] += 1
+            elif self._winners.get(name, 0) != index:
+                print(f"选择器 {name} 改用第 {index + 1} 个候选")
+                self._winners[name] = index
+
+    def locate(self, name, many=False, clickable=False):
+        return element_located(self, name, many, clickable)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'winner': self._winners.get(name),
+                    'misses': self._misses.get(name, 0),
+                    'candidates': len(candidates),
+                }
+                for name, candidates in self.selectors.items()
+            }
+
+
+class element_located:
+    """
+    等待条件：一次脚本调用依次尝试全部候选，命中时返回元素（many 时为元素列表）。
+
+    页面加载完成后超过 grace 秒仍无候选命中，直接抛出 TimeoutException。
+    """
+
+    def __init__(self, registry, name, many=False, clickable=False):
+        self.registry = registry
+        self.name = name
+        self.many = many
+        self.clickable = clickable
+        self.settled = None
+
+    def __call__(self, driver):
+        index, found, ready_state = driver.execute_script(
+            LOCATE_SCRIPT, self.registry.candidates(self.name), self.many
+        )
+        if index is not None:
+            self.registry.hit(self.name, index)
+            if self.clickable and not (found.is_displayed() and found.is_enabled()):
+                return False
+            return found
+
+        if ready_state != 'complete':
+            self.settled = None
+            return False
+        if self.settled is None:
+            self.settled = perf_counter()
+        elif perf_counter() - self.settled >= self.registry.grace:
+            self.registry.hit(self.name, None)
+            raise TimeoutException(f"选择器 {self.name} 的所有候选均未命中")
+        return False
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def default_registry():
+    """进程内共享的注册表，一个账号发现的可用候选其他账号立即受益。"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = SelectorRegistry()
+        return _default_registry
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+会话快照存储：保存每个账号的用户名、验证过的 cookie 以及专属的 Firefox 配置目录，
+进程重启后 WeiboBot 可以直接恢复登录状态，在第一次真正操作时再验证会话。
+
+- 粉丝快照由 FanStore 保存在主数据库中；会话快照单独存放在 WEIBO_SESSION_DB
+  （默认 <配置目录根路径>/sessions.db），不进入受版本管理的 WeiboAct.db。
+- cookie 使用 Fernet 加密后保存，密钥取自 WEIBO_SESSION_KEY，未设置时读取（或生成）
+  WEIBO_SESSION_KEY_FILE（默认 <配置目录根路径>/session.key，权限 0600）。
+- 依赖 cryptography（可选，未安装时不保存也不恢复会话快照，每次启动都用账号 cookie 登录）。
+- 配置目录的根路径可通过 WEIBO_PROFILE_DIR 配置（默认 ./profiles）。
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # 可选依赖
+    Fernet = InvalidToken = None
+
+
+def cookie_string(jar):
+    """把浏览器导出的 cookie 列表转换为 'name=value; ...' 形式。"""
+    return '; '.join(f"{cookie['name']}={cookie['value']}" for cookie in jar)
+
+
+def _load_key(path):
+    """读取密钥文件，不存在时生成一个只有当前用户可读的新密钥。"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+
+    key = Fernet.generate_key()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # 其他进程刚刚生成了密钥
+        return _load_key(path)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+class SessionStore:
+    def __init__(self, db_path=None, profile_root=None, key=None):
+        self.profile_root = profile_root or os.getenv("WEIBO_PROFILE_DIR", "profiles")
+        self.db_path = db_path or os.getenv("WEIBO_SESSION_DB") or os.path.join(self.profile_root, 'sessions.db')
+        self._lock = threading.Lock()
+
+        self.fernet = None
+        if Fernet is None:
+            print("未安装 cryptography，不保存会话快照")
+            return
+        key = key or os.getenv("WEIBO_SESSION_KEY") or _load_key(
+            os.getenv("WEIBO_SESSION_KEY_FILE") or os.path.join(self.profile_root, 'session.key')
+        )
+        self.fernet = Fernet(key)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS Session (
+                    account_id VARCHAR(12) PRIMARY KEY,
+                    username TEXT,
+                    cookies BLOB,
+                    validated_time TIMESTAMP,
+                    update_time TIMESTAMP
+                )
+            ''')
+
+    def profile_dir(self, account_id):
+        path = os.path.abspath(os.path.join(self.profile_root, str(account_id)))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def load(self, account_id):
+        if self.fernet is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT username, cookies, validated_time FROM Session WHERE account_id = ?', (str(account_id),)
+            ).fetchone()
+
+        if row is None or not row[1]:
+            return None
+        try:
+            jar = json.loads(self.fernet.decrypt(row[1]))
+        except InvalidToken:
+            # 密钥已更换，旧快照无法解密，重新登录后会覆盖
+            print(f"{account_id} 的会话快照无法解密，忽略")
+            return None
+        return {
+            "username": row[0],
+            "cookies": jar,
+            "cookie": cookie_string(jar),
+            "validated_time": row[2],
+        }
+
+    def save(self, account_id, username, jar):
+        if self.fernet is None:
+            return
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cookies = self.fernet.encrypt(json.dumps(jar, ensure_ascii=False).encode('utf-8'))
+        try:
+            with self._lock, self._conn:
+                self._conn.execute('''
+                    INSERT OR REPLACE INTO Session (account_id, username, cookies, validated_time, update_time)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (str(account_id), username, cookies, now, now))
+        except sqlite3.Error as e:
+            print("Database error:", e)
+
+    def invalidate(self, account_id):
+        if self.fernet is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM Session WHERE account_id = ?', (str(account_id),))
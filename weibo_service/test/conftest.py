@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from weibo_service.repository import get_repository
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """每个测试使用一个新建的临时数据库，不会碰到项目根目录下的 WeiboAct.db。"""
+    path = str(tmp_path / 'WeiboAct.db')
+    monkeypatch.setenv('WEIBO_DB_PATH', path)
+    # 会话快照、密钥和浏览器配置目录同样放在临时目录中
+    monkeypatch.setenv('WEIBO_PROFILE_DIR', str(tmp_path / 'profiles'))
+    monkeypatch.delenv('WEIBO_SESSION_DB', raising=False)
+    monkeypatch.delenv('WEIBO_SESSION_KEY', raising=False)
+    monkeypatch.delenv('WEIBO_SESSION_KEY_FILE', raising=False)
+    return path
+
+
+@pytest.fixture
+def repository(db_path):
+    repository = get_repository(db_path)
+    yield repository
+    repository.close()
+
+
+class SyncWriter:
+    """代替后台写入线程，把提交的记录立即写入。"""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.items = []
+
+    def submit(self, items):
+        self.items.extend(items)
+        if items:
+            self.repository.write_batch(list(items))
+
+
+@pytest.fixture
+def writer(repository):
+    return SyncWriter(repository)
+
+
+def weibo_info(uid='1000000001', weibo_id='Nabc001', browse_time='2024-01-02 10:00:00', **fields):
+    info = {
+        'account_id': uid,
+        'weibo_id': weibo_id,
+        'username': '测试用户一',
+        'user_tag': '',
+        'time': '2024-01-02 09:00:00',
+        'text': '第一条测试微博',
+        'imgs': [],
+        'video': '',
+        'like_num': '100',
+        'comment_num': '2',
+        'repost_num': '3',
+        'comment': ['评论一', '评论二'],
+        'browse_time': browse_time,
+    }
+    info.update(fields)
+    return info
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+本地夹具服务：用固定数据模拟 HttpTransport 用到的 JSON 接口，方便不联网调试读传输层。
+
+    python fixture_server.py 8765
+
+然后在 bot_info 中设置 'http_base_url': 'http://127.0.0.1:8765'（或设置环境变量 WEIBO_HTTP_BASE_URL）。
+"""
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+USERS = {
+    '1000000001': {'id': 1000000001, 'idstr': '1000000001', 'screen_name': '测试用户一', 'verified_reason': '测试认证'},
+    '1000000002': {'id': 1000000002, 'idstr': '1000000002', 'screen_name': '测试用户二', 'verified_reason': ''},
+}
+
+STATUSES = {
+    'Nabc001': {
+        'id': 5000000000000001,
+        'mblogid': 'Nabc001',
+        'user': USERS['1000000001'],
+        'created_at': 'Tue Jan 02 10:00:00 +0800 2024',
+        'text_raw': '第一条测试微博',
+        'pic_ids': ['pic1'],
+        'pic_infos': {'pic1': {'large': {'url': 'https://example.invalid/pic1.jpg'}}},
+        'reposts_count': 3,
+        'comments_count': 2,
+        'attitudes_count': 10,
+    },
+    'Nabc002': {
+        'id': 5000000000000002,
+        'mblogid': 'Nabc002',
+        'user': USERS['1000000002'],
+        'created_at': 'Wed Jan 03 12:30:00 +0800 2024',
+        'text_raw': '第二条测试微博（摘要）',
+        'isLongText': True,
+        'page_info': {'page_url': 'https://video.weibo.com/show?fid=1034:0001'},
+        'reposts_count': 0,
+        'comments_count': 0,
+        'attitudes_count': 1,
+    },
+}
+
+LONG_TEXT = {
+    'Nabc002': '第二条测试微博的完整长文本',
+}
+
+COMMENTS = {
+    5000000000000001: [
+        {'id': 1, 'text_raw': '评论一'},
+        {'id': 2, 'text_raw': '评论二'},
+    ],
+}
+
+FANS = [str(2000000000 + i) for i in range(45)]
+FANS_PAGE_SIZE = 20
+
+
+def _status(params):
+    return STATUSES.get(params.get('id', ''))
+
+
+def _feed(params):
+    # 两条微博各占一页，max_id 为下一页的页码
+    page = int(params.get('max_id', '0') or 0)
+    statuses = list(STATUSES.values())[page:page + 1]
+    return {'ok': 1, 'statuses': statuses, 'max_id': page + 1 if statuses else 0}
+
+
+def _comments(params):
+    count = int(params.get('count', '10'))
+    return {'ok': 1, 'data': COMMENTS.get(int(params.get('id', '0')), [])[:count]}
+
+
+def _fans(params):
+    page = int(params.get('page', '1'))
+    uids = FANS[(page - 1) * FANS_PAGE_SIZE:page * FANS_PAGE_SIZE]
+    return {'ok': 1, 'users': [{'id': int(uid), 'idstr': uid} for uid in uids]}
+
+
+def _show(params):
+    status = _status(params)
+    return dict(status, ok=1) if status else None
+
+
+def _long_text(params):
+    text = LONG_TEXT.get(params.get('id', ''))
+    return {'ok': 1, 'data': {'longTextContent': text}} if text else None
+
+
+ROUTES = {
+    '/ajax/statuses/show': _show,
+    '/ajax/statuses/longtext': _long_text,
+    '/ajax/statuses/buildComments': _comments,
+    '/ajax/feed/hottimeline': _feed,
+    '/ajax/feed/unreadfriendstimeline': _feed,
+    '/ajax/friendships/friends': _fans,
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        route = ROUTES.get(url.path)
+        data = route(params) if route else None
+        if data is None:
+            data, status = {'ok': 0, 'message': 'not found'}, 404
+        else:
+            status = 200
+
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8765):
+    server = ThreadingHTTPServer(('127.0.0.1', port), FixtureHandler)
+    print(f"夹具服务已启动: http://127.0.0.1:{server.server_address[1]}")
+    return server
+
+
+if __name__ == '__main__':
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765).serve_forever()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from weibo_service.analytics import AnalyticsStore
+from weibo_service.repository import COMMENT, LIKE, POST, action_item
+
+
+@pytest.fixture
+def analytics(writer, db_path):
+    writer.submit([
+        action_item(POST, '1', '账号一', '2024-01-01 08:00:00', '发帖', 'Nown001'),
+        action_item(LIKE, '1', '账号一', '2024-01-01 09:00:00', None, 'A/N1'),
+        action_item(LIKE, '1', '账号一', '2024-01-02 09:00:00', None, 'A/N2'),
+        action_item(COMMENT, '1', '账号一', '2024-01-02 10:00:00', '评论', 'A/N2'),
+        action_item(LIKE, '2', '账号二', '2024-01-02 11:00:00', None, 'B/N3'),
+        action_item(LIKE, '2', '账号二', '2024-01-03 11:00:00', None, 'C/N4'),
+    ])
+    return AnalyticsStore(db_path)
+
+
+def test_actions_per_day_pages_with_cursor(analytics):
+    first = analytics.actions_per_day(limit=2)
+    assert [(row['day'], row['account_id'], row['action']) for row in first['data']] == [
+        ('2024-01-01', '1', 'post'), ('2024-01-01', '1', 'like'),
+    ]
+    second = analytics.actions_per_day(cursor=first['next_cursor'], limit=2)
+    assert [(row['day'], row['account_id'], row['action']) for row in second['data']] == [
+        ('2024-01-02', '1', 'like'), ('2024-01-02', '1', 'comment'),
+    ]
+    third = analytics.actions_per_day(cursor=second['next_cursor'], limit=2)
+    assert len(third['data']) == 2
+    assert third['next_cursor'] is None
+
+    assert list(analytics.iterate('actions_per_day')) == first['data'] + second['data'] + third['data']
+    assert [row['day'] for row in analytics.iterate('actions_per_day', account_id='2', since='2024-01-03')] == [
+        '2024-01-03',
+    ]
+
+
+def test_invalid_cursor(analytics):
+    with pytest.raises(ValueError):
+        analytics.actions_per_day(cursor='不是游标')
+    with pytest.raises(ValueError):
+        analytics.actions_per_day(cursor='WzFd')  # [1]，键的个数不对
+
+
+def test_top_authors_descending(analytics):
+    first = analytics.top_authors(limit=1)
+    assert [(row['author_uid'], row['total']) for row in first['data']] == [('A', 3)]
+    assert first['data'][0]['actions'] == {'like': 2, 'comment': 1, 'repost': 0, 'follow': 0, 'unfollow': 0}
+
+    # 总次数相同时按 author_uid 降序
+    rest = analytics.top_authors(cursor=first['next_cursor'], limit=10)
+    assert [(row['author_uid'], row['total']) for row in rest['data']] == [('C', 1), ('B', 1)]
+    assert rest['next_cursor'] is None
+    assert [row['author_uid'] for row in analytics.top_authors(account_id='2')['data']] == ['C', 'B']
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from weibo_service import WeiboAct
+from weibo_service.detail_cache import DetailCache
+from weibo_service.repository import BROWSE_HOT, browse_items
+from weibo_service.engagement import engagement_items
+from weibo_service.test.conftest import weibo_info
+
+
+def _ago(seconds):
+    return (datetime.now() - timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _store(repository, info):
+    repository.write_batch(browse_items([info], '2000000001', BROWSE_HOT) + engagement_items([info]))
+
+
+def test_load_from_db_keeps_fetch_time(repository, db_path):
+    info = weibo_info(browse_time=_ago(290))
+    _store(repository, info)
+
+    cached = DetailCache(db_path, counter_ttl=300).get(info['account_id'], info['weibo_id'])
+    assert cached['cached'] == ['static', 'counters', 'comments']
+    assert cached['fetch_time'] == info['browse_time']
+    assert cached['browse_time'] > info['browse_time']
+    assert cached['like_num'] == 100
+    assert cached['comment'] == ['评论一', '评论二']
+
+
+def test_cached_result_is_not_logged_as_new_observation(repository, db_path, writer, monkeypatch):
+    info = weibo_info(browse_time=_ago(290))
+    _store(repository, info)
+    cached = DetailCache(db_path, counter_ttl=300).get(info['account_id'], info['weibo_id'])
+
+    monkeypatch.setattr(WeiboAct, 'get_writer', lambda: writer)
+    WeiboAct._log_browses(SimpleNamespace(account_id='2000000002'), [([cached], BROWSE_HOT)])
+
+    assert repository.query_one('SELECT COUNT(*) FROM Engagement')[0] == 1
+    assert repository.query_one('SELECT COUNT(*) FROM WeiboComment')[0] == 2
+    # 这次浏览记为当前时间，静态字段的抓取时间保持不变
+    browse_time, fetch_time = repository.query_one(
+        "SELECT browse_time, fetch_time FROM BrowseInformation WHERE browser_uid = '2000000002'"
+    )
+    assert browse_time > info['browse_time']
+    assert fetch_time == info['browse_time']
+    # 计数仍然是 290 秒前的观测，不会因为再次记录而显得新鲜
+    assert DetailCache(db_path, counter_ttl=200).get(info['account_id'], info['weibo_id']) is None
+
+
+def test_expired_counters_miss_without_refresh(repository, db_path):
+    info = weibo_info(browse_time=_ago(600))
+    _store(repository, info)
+    assert DetailCache(db_path, counter_ttl=300).get(info['account_id'], info['weibo_id']) is None
+
+
+def test_stale_counters_refresh_only_counters(repository, db_path, writer, monkeypatch):
+    info = weibo_info(browse_time=_ago(600))
+    _store(repository, info)
+    cache = DetailCache(db_path, counter_ttl=300, comment_ttl=3600)
+    requested = []
+
+    def fetch(weibos):
+        raise AssertionError("静态字段仍在有效期内，不应完整抓取")
+
+    def refresh(items):
+        requested.extend(stale for _, stale in items)
+        return [{'like_num': '150', 'comment_num': '2', 'repost_num': '3'}]
+
+    weibos = [{'account_id': info['account_id'], 'weibo_id': info['weibo_id']}]
+    [result] = cache.fetch_many(weibos, fetch, refresh)
+    assert requested == [['counters']]
+    assert result['like_num'] == '150'
+    assert result['text'] == info['text']
+    assert result['cached'] == ['static', 'comments']
+    # 刷新后整条命中
+    assert cache.fetch_many(weibos, fetch, refresh)[0]['like_num'] == '150'
+    assert cache.stats()['partial'] == 1
+
+    monkeypatch.setattr(WeiboAct, 'get_writer', lambda: writer)
+    WeiboAct._log_browses(SimpleNamespace(account_id='2000000002'), [([result], BROWSE_HOT)])
+    # 刷新的计数作为新的观测写入，沿用的正文和评论不重写
+    assert repository.query('SELECT like FROM Engagement ORDER BY time') == [(100,), (150,)]
+    assert not [sql for sql, _ in writer.items if 'WeiboSearch' in sql or 'WeiboComment' in sql]
+
+
+def test_lru_evicts_oldest(db_path):
+    cache = DetailCache(db_path, max_entries=2)
+    for weibo_id in ('a', 'b', 'c'):
+        cache.put(weibo_info(weibo_id=weibo_id))
+    assert cache.stats()['entries'] == 2
+    assert cache.get('1000000001', 'c')['weibo_id'] == 'c'
+
+
+def test_fetch_many_single_flight(db_path):
+    cache = DetailCache(db_path)
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch(weibos):
+        calls.append([weibo['weibo_id'] for weibo in weibos])
+        started.set()
+        release.wait(5)
+        return [weibo_info(weibo_id=weibo['weibo_id']) for weibo in weibos]
+
+    weibos = [{'account_id': '1000000001', 'weibo_id': 'x'}]
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.fetch_many(weibos, fetch)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.fetch_many(weibos, fetch)))
+    waiter.start()
+    # 等第二个调用进入等待后再放行第一次抓取
+    time.sleep(0.2)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+
+    assert calls == [['x']]
+    assert [result[0]['weibo_id'] for result in results] == ['x', 'x']
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from contextlib import contextmanager
+
+from weibo_service.driver_pool import CLEAR_DATA_SCRIPT, DriverPool
+
+
+class FakeSwitch:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        self.driver.opened += 1
+        handle = f'tab-{self.driver.opened}'
+        self.driver.handles.append(handle)
+        self.driver.current_window_handle = handle
+
+    def window(self, handle):
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """记录驱动池对浏览器的清理操作。"""
+
+    CONTEXT_CHROME = 'chrome'
+
+    def __init__(self, remaining=0):
+        self.handles = ['tab-0', 'tab-1']
+        self.current_window_handle = 'tab-0'
+        self.opened = 1
+        self.switch_to = FakeSwitch(self)
+        self.remaining = remaining
+        self.scripts = []
+        self.quit_called = False
+
+    @property
+    def window_handles(self):
+        return list(self.handles)
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+    @contextmanager
+    def context(self, name):
+        assert name == self.CONTEXT_CHROME
+        yield
+
+    def execute_script(self, script, *args):
+        # 租借时写入资源配置首选项
+        self.scripts.append('prefs')
+
+    def execute_async_script(self, script):
+        self.scripts.append(script)
+        return self.remaining
+
+    def quit(self):
+        self.quit_called = True
+
+
+def pool():
+    pool = DriverPool(size=0)
+    pool.size = 1
+    return pool
+
+
+def test_release_clears_all_domains_and_tabs():
+    driver_pool = pool()
+    driver = FakeDriver()
+    driver_pool.release(driver)
+
+    # 旧标签页（及其 sessionStorage）全部关闭，只留下新的空白标签页
+    assert driver.window_handles == ['tab-2']
+    assert driver.current_window_handle == 'tab-2'
+    assert driver.scripts == [CLEAR_DATA_SCRIPT]
+    assert not driver.quit_called
+    assert driver_pool.lease() is driver
+    assert driver.scripts == [CLEAR_DATA_SCRIPT, 'prefs']
+
+
+def test_dirty_driver_is_not_pooled():
+    driver_pool = pool()
+    driver = FakeDriver(remaining=3)
+    driver_pool.release(driver)
+
+    assert driver.quit_called
+    assert driver_pool._idle.empty()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from weibo_service.engagement import EngagementStore, observation_items, rebuild_rollups
+
+
+def observe(writer, like, time):
+    writer.submit(observation_items('1000000001', 'Nabc001', like, '2', '3', time))
+
+
+def test_repeated_observation_is_counted_once(writer, db_path):
+    observe(writer, '100', '2024-01-02 09:00:00')
+    observe(writer, '110', '2024-01-02 10:00:00')
+    # 同一条观测再次写入（例如同一条微博同时出现在首页和热门）
+    observe(writer, '110', '2024-01-02 10:00:00')
+
+    store = EngagementStore(db_path)
+    [day] = store.history('1000000001', 'Nabc001', 'day')
+    assert day['samples'] == 2
+    assert day['like'] == 110
+    assert day['gain'] == {'like': 10, 'comment': 0, 'repost': 0}
+    assert [hour['samples'] for hour in store.history('1000000001', 'Nabc001', 'hour')] == [1, 1]
+    assert store.top_growth()[0]['gain']['like'] == 10
+
+
+def test_rebuild_matches_trigger(writer, repository):
+    observe(writer, '100', '2024-01-02 09:00:00')
+    observe(writer, '1.2万', '2024-01-03 09:30:00')
+    before = repository.query('SELECT * FROM EngagementHourly ORDER BY bucket')
+
+    with repository.transaction() as conn:
+        rebuild_rollups(conn)
+    assert repository.query('SELECT * FROM EngagementHourly ORDER BY bucket') == before
+    assert repository.query('SELECT bucket, like_gain FROM EngagementDaily ORDER BY bucket') == [
+        ('2024-01-02', 0), ('2024-01-03', 11900),
+    ]
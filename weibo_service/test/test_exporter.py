@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+from weibo_service.repository import browse_items
+from weibo_service.test.conftest import weibo_info
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+from weibo_service.exporter import ColumnarExporter  # noqa: E402
+
+
+@pytest.fixture
+def exporter(repository, db_path, tmp_path):
+    return ColumnarExporter(db_path, str(tmp_path / 'export'), lag=60)
+
+
+def exported(result, column):
+    return pq.read_table(result['path']).column(column).to_pylist()
+
+
+def test_incremental_export_advances_high_water(exporter, writer):
+    writer.submit(browse_items([weibo_info(weibo_id='Nabc001'), weibo_info(weibo_id='Nabc002')], '1', 1))
+    first = exporter.export_table('BrowseInformation')
+    assert first['rows'] == 2
+    assert sorted(exported(first, 'weibo_id')) == ['Nabc001', 'Nabc002']
+    assert exporter.export_table('BrowseInformation')['rows'] == 0
+
+    # 同一时间、主键更大的行也要导出
+    writer.submit(browse_items([weibo_info(weibo_id='Nabc003')], '1', 1))
+    third = exporter.export_table('BrowseInformation')
+    assert exported(third, 'weibo_id') == ['Nabc003']
+
+
+def test_deleted_and_reinserted_rows_are_exported_once(exporter, repository, writer):
+    writer.submit(browse_items([weibo_info(weibo_id='Nabc001'), weibo_info(weibo_id='Nabc002')], '1', 1))
+    assert exporter.export_table('BrowseInformation')['rows'] == 2
+
+    # 删除后重新插入会复用 rowid，VACUUM 也会重新编号，高水位不能依赖 rowid
+    with repository.transaction() as conn:
+        conn.execute("DELETE FROM BrowseInformation WHERE weibo_id = 'Nabc002'")
+    with repository.connect() as conn:
+        conn.execute('VACUUM')
+    writer.submit(browse_items([weibo_info(weibo_id='Nabc002', browse_time='2024-01-03 10:00:00')], '1', 1))
+
+    result = exporter.export_table('BrowseInformation')
+    assert exported(result, 'weibo_id') == ['Nabc002']
+    assert exported(result, 'browse_time') == ['2024-01-03 10:00:00']
+
+
+def test_recent_rows_wait_for_lag(exporter, writer):
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    writer.submit(browse_items([weibo_info(browse_time=now)], '1', 1))
+    assert exporter.export_table('BrowseInformation')['rows'] == 0
+    assert exporter.export_table('BrowseInformation', incremental=False)['rows'] == 1
+
+
+def test_comments_exported_by_fetch_time(exporter, writer):
+    writer.submit(browse_items([weibo_info()], '1', 1))
+    result = exporter.export_table('WeiboComment')
+    assert exported(result, 'content') == ['评论一', '评论二']
+
+    writer.submit(browse_items([weibo_info(browse_time='2024-01-03 10:00:00', comment=['评论三'])], '1', 2))
+    result = exporter.export_table('WeiboComment')
+    assert exported(result, 'content') == ['评论三']
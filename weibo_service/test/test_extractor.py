@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from weibo_service.extractor import WEIBO_DETAIL_FIELDS, WEIBO_DETAIL_REQUIRED, fields_present
+from weibo_service.selector_registry import SelectorRegistry
+
+
+class FakeDriver:
+    """按顺序返回预先设定的 EXTRACT_SCRIPT 结果。"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def execute_script(self, script, *args):
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+
+def test_missing_fields_fail_after_grace():
+    registry = SelectorRegistry(grace=0)
+    ready = fields_present(WEIBO_DETAIL_FIELDS, WEIBO_DETAIL_REQUIRED, registry)
+    driver = FakeDriver(
+        [{}, ['text', 'user_tag'], {}, 'interactive'],
+        [{}, ['text', 'user_tag'], {}, 'complete'],
+    )
+
+    # 页面还没加载完成时继续等待，加载完成后开始计时，超过宽限时间才失败
+    assert ready(driver) is False
+    assert ready(driver) is False
+    with pytest.raises(TimeoutException):
+        ready(driver)
+    assert registry.stats()['detail.text']['misses'] == 1
+    # 非必需字段缺失不计入
+    assert registry.stats()['detail.user_tag']['misses'] == 0
+
+
+def test_present_fields_are_returned():
+    registry = SelectorRegistry(grace=0)
+    ready = fields_present(WEIBO_DETAIL_FIELDS, WEIBO_DETAIL_REQUIRED, registry)
+    fields = {'text': '正文'}
+    assert ready(FakeDriver([fields, ['user_tag'], {'text': 1}, 'complete'])) == fields
+    assert registry.stats()['detail.text']['winner'] == 1
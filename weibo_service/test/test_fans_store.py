@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from weibo_service.fans_store import FanStore
+
+
+def test_unfollows_only_reported_by_full_scan(db_path):
+    store = FanStore(db_path)
+    store.record(1, {'a', 'b', 'c'}, True)
+
+    incremental = store.record(1, {'d'}, False)
+    assert incremental['follows'] == ['d']
+    assert incremental['unfollows'] == []
+
+    full = store.record(1, {'a', 'd'}, True)
+    assert full['unfollows'] == ['b', 'c']
+    assert sorted(fan['uid'] for fan in store.deltas(1)['unfollows']) == ['b', 'c']
+
+
+def test_needs_full_scan_after_interval(db_path):
+    store = FanStore(db_path)
+    assert store.needs_full_scan(1, 3600)
+
+    store.record(1, {'a'}, True)
+    store.record(1, {'b'}, False)
+    assert not store.needs_full_scan(1, 3600)
+    assert store.needs_full_scan(1, 0)
+    assert store.needs_full_scan(2, 3600)
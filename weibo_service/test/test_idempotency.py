@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from weibo_service.idempotency import (
+    ActionInProgress,
+    ActionOutcomeUnknown,
+    IdempotencyConflict,
+    IdempotencyStore,
+    request_done_item,
+)
+
+ACTION = {'agent_id': 1, 'type': 'like', 'object': '1000000001/Nabc001'}
+
+
+@pytest.fixture
+def store(repository, db_path):
+    return IdempotencyStore(db_path, pending_ttl=600, wait_timeout=0)
+
+
+def status(repository, key):
+    row = repository.query_one('SELECT status FROM ActionRequest WHERE idempotency_key = ?', (key,))
+    return row and row[0]
+
+
+def test_done_key_returns_first_result(store, repository):
+    assert store.begin('k1', ACTION) is None
+    repository.write_batch([request_done_item('k1', {'weibo_id': 'Nabc001'})])
+    assert store.begin('k1', ACTION) == {'weibo_id': 'Nabc001'}
+
+
+def test_pending_key_is_in_progress(store):
+    assert store.begin('k1', ACTION) is None
+    with pytest.raises(ActionInProgress):
+        store.begin('k1', ACTION)
+
+
+def test_same_key_with_different_request_is_rejected(store):
+    store.begin('k1', ACTION)
+    with pytest.raises(IdempotencyConflict):
+        store.begin('k1', dict(ACTION, type='comment'))
+
+
+def test_release_allows_retry(store, repository):
+    store.begin('k1', ACTION)
+    store.release('k1')
+    assert status(repository, 'k1') is None
+    assert store.begin('k1', ACTION) is None
+
+
+def test_unknown_key_is_never_retried(store, repository):
+    store.begin('k1', ACTION)
+    store.mark_unknown('k1')
+    # 已标记为 unknown 的记录不会被 release 删除
+    store.release('k1')
+    assert status(repository, 'k1') == 'unknown'
+    with pytest.raises(ActionOutcomeUnknown):
+        store.begin('k1', ACTION)
+
+
+def test_stale_pending_key_is_unknown(store, repository):
+    store.begin('k1', ACTION)
+    repository.write_batch([(
+        "UPDATE ActionRequest SET create_time = '2000-01-01 00:00:00' WHERE idempotency_key = ?", ('k1',)
+    )])
+    with pytest.raises(ActionOutcomeUnknown):
+        store.begin('k1', ACTION)
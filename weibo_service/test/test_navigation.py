@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+import socket
+import subprocess
+from urllib.parse import unquote
+
+import pytest
+
+from weibo_service.WeiboBot import fragment_only
+from weibo_service.driver_pool import build_firefox_options, runtime_preferences
+from weibo_service.resource_profiles import BLACKHOLE, RESOURCE_PROFILES, get_profile, pac_preferences
+
+
+def test_same_url_reload_is_a_new_document():
+    url = 'https://weibo.com/u/1000000001'
+    assert not fragment_only(url, url)
+    assert not fragment_only(url, url + '#comment')
+
+
+def test_fragment_change_keeps_document():
+    url = 'https://weibo.com/u/1000000001'
+    assert fragment_only(url + '#comment', url)
+    assert fragment_only(url + '#repost', url + '#comment')
+
+
+def test_runtime_preferences_follow_account_profile(monkeypatch):
+    monkeypatch.setitem(RESOURCE_PROFILES, 'full', {
+        'page_load_strategy': 'normal',
+        'block_hosts': [],
+        'block_images': False,
+        'block_fonts': False,
+        'block_media': False,
+    })
+    full = runtime_preferences(None, 'full')
+    scrape = runtime_preferences('127.0.0.1:8080', 'scrape')
+
+    # 切到不拦截的配置时，拦截图片等首选项要恢复默认
+    assert full['permissions.default.image'] is None
+    assert full['gfx.downloadable_fonts.enabled'] is None
+    assert full['network.proxy.type'] is None
+    assert scrape['permissions.default.image'] == 2
+    assert scrape['gfx.downloadable_fonts.enabled'] is False
+    assert scrape['network.proxy.type'] == 2
+
+
+# 按 Firefox 的 shExpMatch 语义（* 与 ? 通配符）在 node 中执行 PAC 脚本
+PAC_RUNNER = """
+const shExpMatch = (s, p) => new RegExp('^' + p.replace(/[.+^${}()|[\\]\\\\]/g, '\\\\$&')
+    .replace(/\\*/g, '.*').replace(/\\?/g, '.') + '$').test(s);
+eval(process.argv[1]);
+const urls = JSON.parse(process.argv[2]);
+console.log(JSON.stringify(urls.map(u => FindProxyForURL(u, new URL(u).hostname))));
+"""
+
+
+def find_proxy(script, urls):
+    node = shutil.which('node')
+    if node is None:
+        pytest.skip("需要 node 执行 PAC 脚本")
+    output = subprocess.run(
+        [node, '-e', PAC_RUNNER, script, json.dumps(urls)], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def test_pac_blocks_hosts_and_urls():
+    prefs = pac_preferences(get_profile('scrape'), '10.0.0.1:3128')
+    script = unquote(prefs['network.proxy.autoconfig_url'].split(',', 1)[1])
+    assert find_proxy(script, [
+        'https://beacon.sina.com.cn/a.gif',
+        'https://f.video.weibocdn.com/o0/abc.mp4?label=mp4_hd',
+        'https://weibo.com/static/font/iconfont.woff2',
+        'https://weibo.com/ajax/statuses/show?id=1',
+    ]) == [BLACKHOLE, BLACKHOLE, BLACKHOLE, 'PROXY 10.0.0.1:3128']
+
+
+def test_blocked_requests_are_refused():
+    options = build_firefox_options(profile='scrape')
+    # 代理失败后不直连，PAC 能看到 https 请求的路径
+    assert options.preferences['network.proxy.failover_direct'] is False
+    assert options.preferences['network.proxy.autoconfig_url.include_path'] is True
+
+    # 拦截用的代理地址确实拒绝连接
+    host, port = BLACKHOLE.split()[1].split(':')
+    with pytest.raises(OSError):
+        socket.create_connection((host, int(port)), timeout=2).close()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import json
+import sqlite3
+
+import pytest
+
+from weibo_service.repository import LIKE, MIGRATIONS, POST, get_repository, parse_count
+from weibo_service.search import SearchIndex
+
+
+@pytest.mark.parametrize('value, expected', [
+    (12, 12),
+    ('100', 100),
+    ('1,234', 1234),
+    ('1.2万', 12000),
+    ('100万+', 1000000),
+    ('3亿', 300000000),
+    ('赞', 0),
+    (None, 0),
+])
+def test_parse_count(value, expected):
+    assert parse_count(value) == expected
+
+
+def tables(repository):
+    return {row[0] for row in repository.query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_fresh_database_is_at_latest_version(repository):
+    assert repository.schema_version() == MIGRATIONS[-1][0]
+    assert 'Session' not in tables(repository)
+    # 新库从不创建明文保存 cookie 的 Session 表
+    assert not [
+        sql for _, steps in MIGRATIONS for sql in steps
+        if isinstance(sql, str) and 'TABLE IF NOT EXISTS Session' in sql
+    ]
+    assert {'BrowseInformation', 'WeiboComment', 'WeiboSearch', 'Engagement', 'ExportState',
+            'ActionRequest', 'ActionDaily', 'AuthorInteraction', 'FanDaily'} <= tables(repository)
+
+
+def create_v1(path):
+    """按 v1 的表结构建一个旧库：计数是页面上的原始文字，列表以 str(list) 保存。"""
+    conn = sqlite3.connect(path)
+    with conn:
+        for sql in MIGRATIONS[0][1]:
+            conn.execute(sql)
+        conn.executemany('''
+            INSERT INTO BrowseInformation
+            (uid, weibo_id, user_name, user_tag, time, text, img, video, repost, like, comment,
+             comment_content, browse_time, browser_uid, browse_type)
+            VALUES (?, ?, '作者', '', '2024-01-02 09:00:00', ?, ?, '', ?, ?, ?, ?, ?, ?, 1)
+        ''', [
+            ('1000000001', 'Nabc001', '狗拿耗子', "['a.jpg']", '转发', '1.2万', '2',
+             "['评论一', '评论二']", '2024-01-02 10:00:00', '1'),
+            ('1000000001', 'Nabc001', '狗拿耗子', '', '5', '1.3万', '3',
+             "['较新的评论']", '2024-01-02 12:00:00', '2'),
+        ])
+        conn.executemany('''
+            INSERT INTO ActionLog (action, uid, user_name, time, object) VALUES (?, '1', '账号', ?, ?)
+        ''', [
+            (POST, '2024-01-02 08:00:00', 'Nown001'),
+            (LIKE, '2024-01-02 10:05:00', '1000000001/Nabc001'),
+            (LIKE, '2024-01-03 10:05:00', '1000000001/Nabc002'),
+        ])
+    conn.close()
+
+
+def test_migrates_v1_database(db_path):
+    create_v1(db_path)
+    repository = get_repository(db_path)
+    try:
+        assert repository.schema_version() == MIGRATIONS[-1][0]
+        assert 'Session' not in tables(repository)
+
+        rows = repository.query('''
+            SELECT browser_uid, img, repost, like, comment FROM BrowseInformation ORDER BY browser_uid
+        ''')
+        assert [(json.loads(row[1]),) + row[2:] for row in rows] == [(['a.jpg'], 0, 12000, 2), ([], 5, 13000, 3)]
+
+        # 同一条微博保留最近一次抓取的评论
+        assert repository.query('SELECT position, content FROM WeiboComment') == [(0, '较新的评论')]
+        assert [hit['source'] for hit in SearchIndex(db_path).search('耗子')] == ['text']
+        assert repository.query('SELECT time, like FROM Engagement ORDER BY time') == [
+            ('2024-01-02 10:00:00', 12000), ('2024-01-02 12:00:00', 13000),
+        ]
+
+        assert repository.query('SELECT day, action, count FROM ActionDaily ORDER BY day, action') == [
+            ('2024-01-02', POST, 1), ('2024-01-02', LIKE, 1), ('2024-01-03', LIKE, 1),
+        ]
+        # 发帖不计入互动作者，object 中的 weibo_id 被去掉
+        assert repository.query('SELECT author_uid, action, count FROM AuthorInteraction') == [
+            ('1000000001', LIKE, 2),
+        ]
+    finally:
+        repository.close()
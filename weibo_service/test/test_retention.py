@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from weibo_service.repository import LIKE, action_item, browse_items
+from weibo_service.retention import RetentionManager
+from weibo_service.search import SearchIndex, search_items
+from weibo_service.test.conftest import weibo_info
+
+NOW = datetime(2024, 3, 1)
+
+
+@pytest.fixture
+def manager(writer, db_path, tmp_path):
+    infos = [
+        weibo_info(weibo_id='Nold001', browse_time='2024-01-02 10:00:00', text='过期的微博'),
+        weibo_info(weibo_id='Nnew001', browse_time='2024-02-28 10:00:00', text='新的微博'),
+    ]
+    writer.submit(browse_items(infos, '1', 1) + search_items(infos) + [
+        action_item(LIKE, '1', '账号一', '2024-01-02 10:05:00', None, '1000000001/Nold001'),
+    ])
+    return RetentionManager(
+        db_path, archive_root=str(tmp_path / 'archive'),
+        ttl={'BrowseInformation': 30, 'WeiboComment': 30, 'ActionLog': 0}, compression='gz',
+    )
+
+
+def archived(root, table, day):
+    with gzip.open(os.path.join(root, table, f'{day}.jsonl.gz'), 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_dry_run_only_counts(manager, repository):
+    assert manager.run(dry_run=True, now=NOW) == {'BrowseInformation': 1, 'WeiboComment': 2}
+    assert repository.query_one('SELECT COUNT(*) FROM BrowseInformation')[0] == 2
+    assert not os.path.exists(manager.archive_root)
+
+
+def test_run_archives_then_deletes(manager, repository, db_path):
+    result = manager.run(now=NOW)
+    assert result['BrowseInformation'] == 1
+    assert result['WeiboComment'] == 2
+
+    assert [row['weibo_id'] for row in archived(manager.archive_root, 'BrowseInformation', '2024-01-02')] == [
+        'Nold001',
+    ]
+    assert len(archived(manager.archive_root, 'WeiboComment', '2024-01-02')) == 2
+    assert repository.query('SELECT weibo_id FROM BrowseInformation') == [('Nnew001',)]
+
+    # 已删除微博的全文索引一起清理，保留天数为 0 的表不动，汇总不受影响
+    assert [hit['weibo_id'] for hit in SearchIndex(db_path).search('微博')] == ['Nnew001']
+    assert repository.query_one('SELECT COUNT(*) FROM ActionLog')[0] == 1
+    assert repository.query_one('SELECT count FROM ActionDaily')[0] == 1
+
+    assert manager.run(now=NOW) == {'BrowseInformation': 0, 'WeiboComment': 0}
+
+
+def test_stats_counts_rows_per_account(manager):
+    stats = manager.stats()
+    assert stats['tables']['BrowseInformation']['rows'] == 2
+    assert stats['accounts']['1'] == {'BrowseInformation': 2, 'ActionLog': 1}
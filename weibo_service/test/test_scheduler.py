@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from weibo_service.scheduler import ACTION, FEEDBACK, READ, AccountScheduler, BrowserGate, BrowserLock
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = AccountScheduler(idle_timeout=1, max_pending=50)
+    yield scheduler
+    scheduler.close()
+
+
+def test_priority_within_account(scheduler):
+    gate = threading.Event()
+    order = []
+    scheduler.submit('1', gate.wait, 5)
+    futures = [scheduler.submit('1', order.append, p, priority=p) for p in (READ, FEEDBACK, ACTION)]
+    gate.set()
+    for future in futures:
+        future.result(5)
+    assert order == [ACTION, FEEDBACK, READ]
+
+
+def test_slow_account_does_not_block_others(scheduler):
+    release = threading.Event()
+    slow = [scheduler.submit('1', release.wait, 5) for _ in range(20)]
+
+    start = time.monotonic()
+    assert scheduler.submit('2', lambda: 'ok').result(2) == 'ok'
+    assert time.monotonic() - start < 1
+
+    release.set()
+    assert scheduler.drain('1', timeout=5) == 0
+    assert all(future.done() for future in slow)
+
+
+def test_exception_cancel_and_timeout(scheduler):
+    release = threading.Event()
+    running = scheduler.submit('1', release.wait, 5)
+    queued = scheduler.submit('1', lambda: 'never')
+
+    with pytest.raises(TimeoutError):
+        running.result(timeout=0.05)
+    assert queued.cancel()
+    release.set()
+    assert running.result(5) is True
+
+    with pytest.raises(ZeroDivisionError):
+        scheduler.submit('1', lambda: 1 / 0).result(5)
+    assert scheduler.pending_stats()['pending'] == 0
+
+
+def test_pending_bound_blocks_submit():
+    scheduler = AccountScheduler(idle_timeout=1, max_pending=2)
+    release = threading.Event()
+    scheduler.submit('1', release.wait, 5)
+    scheduler.submit('2', release.wait, 5)
+
+    submitted = threading.Event()
+    threading.Thread(target=lambda: (scheduler.submit('3', lambda: None), submitted.set()), daemon=True).start()
+    assert not submitted.wait(0.2)
+    release.set()
+    assert submitted.wait(5)
+    assert scheduler.pending_stats()['blocked_submits'] == 1
+    scheduler.close()
+
+
+def test_browser_gate_caps_browser_sections():
+    gate = BrowserGate(limit=2)
+    locks = [BrowserLock(gate, account_id) for account_id in range(4)]
+    active, peak = [0], [0]
+    counter = threading.Lock()
+
+    def work(lock):
+        with lock:
+            with counter:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with counter:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work, args=(lock,)) for lock in locks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert gate.stats()['count'] == 4
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from weibo_service.repository import browse_items
+from weibo_service.search import SearchIndex, match_expression, search_items, tokenize
+from weibo_service.test.conftest import weibo_info
+
+
+def test_tokenize_splits_cjk_into_bigrams():
+    assert tokenize('狗拿耗子') == '狗拿 拿耗 耗子'
+    assert tokenize('猫') == '猫'
+    assert tokenize('Hello 微博 2024') == 'hello 微博 2024'
+    assert tokenize(None) == ''
+
+
+def test_match_expression():
+    assert match_expression('猫') == '"猫"*'
+    assert match_expression('耗子 Cat') == '"耗子" AND "cat"'
+    assert match_expression('拿耗子') == '"拿耗 耗子"'
+    assert match_expression('  ，。 ') is None
+
+
+def index(writer, *infos):
+    infos = list(infos)
+    writer.submit(browse_items(infos, '1', 1) + search_items(infos))
+
+
+def test_search_text_and_comments(writer, db_path):
+    index(
+        writer,
+        weibo_info(weibo_id='Nabc001', text='狗拿耗子多管闲事', comment=['小猫', '耗子药']),
+        weibo_info(weibo_id='Nabc002', text='今天天气不错', comment=[]),
+    )
+    search = SearchIndex(db_path)
+
+    hits = search.search('耗子')
+    assert {(hit['weibo_id'], hit['source'], hit['content']) for hit in hits} == {
+        ('Nabc001', 'text', '狗拿耗子多管闲事'),
+        ('Nabc001', 'comment', '耗子药'),
+    }
+    assert [hit['content'] for hit in search.search('耗子', source='comment')] == ['耗子药']
+    # 单个汉字只做前缀匹配：'小猫' 的二元组只有 '小猫'
+    assert [hit['content'] for hit in search.search('猫')] == []
+    assert [hit['content'] for hit in search.search('小')] == ['小猫']
+    assert search.search('天气 不错')[0]['weibo_id'] == 'Nabc002'
+    assert search.search('天气 耗子') == []
+    assert search.search('耗子', uid='2000000002') == []
+
+
+def test_fewer_comments_replace_old_index(writer, db_path):
+    index(writer, weibo_info(comment=['评论一', '评论二']))
+    index(writer, weibo_info(browse_time='2024-01-02 11:00:00', comment=['新的评论']))
+    assert [hit['content'] for hit in SearchIndex(db_path).search('评论', source='comment')] == ['新的评论']
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+
+import pytest
+
+from weibo_service.WeiboBot import WeiboBot
+
+JAR = [
+    {'name': 'SUB', 'value': 'secret-sub', 'domain': '.weibo.com', 'path': '/'},
+    {'name': 'XSRF-TOKEN', 'value': 'token123', 'domain': '.weibo.com', 'path': '/'},
+]
+
+
+class FakeSessions:
+    """已有会话快照的存储，不依赖 cryptography。"""
+
+    def load(self, account_id):
+        return {'username': '测试用户一', 'cookies': JAR, 'cookie': 'SUB=secret-sub', 'validated_time': None}
+
+    def profile_dir(self, account_id):
+        raise AssertionError("使用驱动池时不需要配置目录")
+
+
+class FakePool:
+    def __init__(self):
+        self.leased = []
+        self.released = []
+
+    def lease(self, cookie=None, proxy=None, profile=None):
+        driver = object()
+        self.leased.append(driver)
+        return driver
+
+    def release(self, driver):
+        self.released.append(driver)
+
+
+def test_rehydrate_does_not_start_browser(db_path):
+    pool = FakePool()
+    bot = WeiboBot(
+        {'account_id': '1000000001', 'cookie': 'SUB=account', 'online_state': 'on', 'transport': 'selenium'},
+        driver_pool=pool, session_store=FakeSessions(),
+    )
+    assert bot.login()
+    assert bot.online_state == 'on' and pool.leased == []
+
+    # 第一次浏览器操作时才租借
+    driver = bot.bot
+    assert pool.leased == [driver] and bot.bot is driver
+
+    bot.close()
+    assert pool.released == [driver]
+
+
+def test_close_without_browser(db_path):
+    pool = FakePool()
+    bot = WeiboBot(
+        {'account_id': '1000000001', 'cookie': 'SUB=account', 'online_state': 'on', 'transport': 'selenium'},
+        driver_pool=pool, session_store=FakeSessions(),
+    )
+    bot.close()
+    assert pool.leased == [] and pool.released == []
+
+
+def test_cookies_encrypted_outside_main_db(db_path, tmp_path, repository):
+    pytest.importorskip('cryptography')
+    from weibo_service.sessions import SessionStore
+
+    store = SessionStore()
+    store.save('1000000001', '测试用户一', JAR)
+    assert store.load('1000000001')['cookie'] == 'SUB=secret-sub; XSRF-TOKEN=token123'
+
+    session_db = tmp_path / 'profiles' / 'sessions.db'
+    assert b'secret-sub' not in session_db.read_bytes()
+    assert oct(os.stat(tmp_path / 'profiles' / 'session.key').st_mode & 0o777) == '0o600'
+    # 主库中不再有会话表
+    assert repository.query_one("SELECT name FROM sqlite_master WHERE name = 'Session'") is None
+
+    # 换了密钥后旧快照无法解密，按没有快照处理
+    from cryptography.fernet import Fernet
+    assert SessionStore(key=Fernet.generate_key()).load('1000000001') is None
+    with sqlite3.connect(session_db) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM Session').fetchone()[0] == 1
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from weibo_service.WeiboBot import WeiboBot
+from weibo_service.fans_store import FanStore
+from weibo_service.test import fixture_server
+from weibo_service.transport import HttpTransport, TransportError
+from weibo_service.waits import WaitEngine
+
+COOKIE = 'SUB=abc; XSRF-TOKEN=token123'
+
+
+@pytest.fixture(scope='module')
+def base_url():
+    server = fixture_server.serve(0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def transport(base_url):
+    return HttpTransport(COOKIE, base_url=base_url)
+
+
+def test_weibo_info(transport):
+    info = transport.get_weibo_info('1000000001', 'Nabc001', max_num=10)
+    assert info['username'] == '测试用户一'
+    assert info['time'] == '2024-01-02 10:00:00'
+    assert info['imgs'] == ['https://example.invalid/pic1.jpg']
+    assert info['comment'] == ['评论一', '评论二']
+    assert (info['like_num'], info['comment_num'], info['repost_num']) == ('10', '2', '3')
+
+
+def test_long_text_and_video(transport):
+    info = transport.get_weibo_info('1000000002', 'Nabc002')
+    assert info['text'] == '第二条测试微博的完整长文本'
+    assert info['video'].startswith('https://video.weibo.com/')
+    assert info['comment'] == []
+
+
+def test_missing_weibo_raises(transport):
+    with pytest.raises(requests.HTTPError):
+        transport.get_weibo_info('1000000001', 'missing')
+
+
+def test_feed_follows_max_id(transport):
+    assert list(transport.iter_feed('hot', max_num=10)) == [('1000000001', 'Nabc001'), ('1000000002', 'Nabc002')]
+    assert list(transport.iter_feed('homepage', max_num=1)) == [('1000000001', 'Nabc001')]
+
+
+def test_scan_fans(transport):
+    fans, complete = transport.scan_fans('1000000001')
+    assert complete and fans == set(fixture_server.FANS)
+
+    # 增量扫描遇到已知粉丝即停止
+    fans, complete = transport.scan_fans('1000000001', known={fixture_server.FANS[25]})
+    assert not complete and fans == set(fixture_server.FANS[:25])
+
+
+def test_non_json_response_raises(transport, monkeypatch):
+    monkeypatch.setitem(fixture_server.ROUTES, '/ajax/statuses/show', lambda params: {'ok': 0})
+    with pytest.raises(TransportError):
+        transport.get_weibo_info('1000000001', 'Nabc001')
+
+
+def test_threads_use_own_sessions(transport):
+    sessions = set()
+
+    def read(_):
+        sessions.add(id(transport.session))
+        return transport.get_weibo_info('1000000001', 'Nabc001')['weibo_id']
+
+    with ThreadPoolExecutor(4) as executor:
+        assert set(executor.map(read, range(20))) == {'Nabc001'}
+    assert len(sessions) > 1
+
+
+def test_set_cookie_replaces_headers(transport):
+    headers = transport.headers
+    transport.set_cookie('SUB=new; XSRF-TOKEN=t2')
+    assert headers['Cookie'] == COOKIE
+    assert transport.headers['Cookie'] == 'SUB=new; XSRF-TOKEN=t2'
+    assert transport.headers['X-XSRF-TOKEN'] == 't2'
+
+
+@pytest.fixture
+def bot(transport):
+    """不启动浏览器的 WeiboBot，只保留 _read 用到的状态。"""
+    bot = WeiboBot.__new__(WeiboBot)
+    bot.username = 'test'
+    bot.online_state = 'on'
+    bot.transport = transport
+    bot.transport_cooldown = 60
+    bot._transport_failed_at = None
+    bot._transport_lock = threading.Lock()
+    bot.waits = WaitEngine()
+    return bot
+
+
+def read_info(transport):
+    return transport.get_weibo_info('1000000001', 'Nabc001')
+
+
+def test_read_requires_login(bot):
+    assert bot._read("微博信息", read_info)['weibo_id'] == 'Nabc001'
+    bot.online_state = 'off'
+    assert bot._read("微博信息", read_info) is None
+
+
+def test_read_failure_starts_cooldown(bot):
+    def fail(transport):
+        raise TransportError("失败")
+
+    assert bot._read("微博信息", fail) is None
+    # 冷却期间不再尝试传输层
+    assert bot._read("微博信息", read_info) is None
+    bot.transport_cooldown = 0
+    assert bot._read("微博信息", read_info)['weibo_id'] == 'Nabc001'
+    assert bot.waits.stats()['http.read']['timeouts'] == 1
+
+
+def test_get_comments(transport):
+    assert transport.get_comments('1000000001', 'Nabc001', max_num=1) == ['评论一']
+    assert transport.get_comments('1000000002', 'Nabc002') == []
+
+
+class NoBrowser:
+    """传输层读取成功时不应获取浏览器锁。"""
+
+    def __enter__(self):
+        raise AssertionError("不应占用浏览器")
+
+    def __exit__(self, *args):
+        return False
+
+
+def test_reads_do_not_take_browser(bot, db_path):
+    bot.account_id = '1000000001'
+    bot.fan_store = FanStore(db_path)
+    bot.seleniumLock = NoBrowser()
+
+    info = bot.update_fans_list(full=True)
+    assert set(info['fans']) == set(fixture_server.FANS)
+    assert list(bot.iter_comments('1000000001', 'Nabc001')) == ['评论一', '评论二']
+    assert list(bot.iter_feed_weibos('hot', max_num=1)) == [('1000000001', 'Nabc001')]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+from weibo_service import WeiboAct
+from weibo_service.repository import BROWSE_HOMEPAGE, BROWSE_HOT
+from weibo_service.test.conftest import weibo_info
+
+
+def count(repository, table):
+    return repository.query_one(f'SELECT COUNT(*) FROM {table}')[0]
+
+
+def test_weibo_in_both_feeds_is_logged_once(repository, writer, monkeypatch):
+    monkeypatch.setattr(WeiboAct, 'get_writer', lambda: writer)
+    shared = weibo_info(weibo_id='Nabc001')
+    other = weibo_info(weibo_id='Nabc002', comment=[])
+
+    WeiboAct._log_browses(
+        SimpleNamespace(account_id='2000000001'),
+        [([shared], BROWSE_HOMEPAGE), ([other, shared], BROWSE_HOT)],
+    )
+
+    assert repository.query('SELECT weibo_id, browse_type FROM BrowseInformation ORDER BY weibo_id, browse_type') == [
+        ('Nabc001', BROWSE_HOT), ('Nabc001', BROWSE_HOMEPAGE), ('Nabc002', BROWSE_HOT),
+    ]
+    assert count(repository, 'Engagement') == 2
+    assert count(repository, 'WeiboComment') == 2
+    assert count(repository, 'SearchDocument') == 4
+    # 写入项中每条微博的观测和评论只出现一次
+    assert sum('INTO Engagement' in sql for sql, _ in writer.items) == 2
+    assert sum('DELETE FROM WeiboComment' in sql for sql, _ in writer.items) == 1
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from weibo_service.WeiboBot import WeiboBot
+from weibo_service.scheduler import BrowserGate, BrowserLock
+from weibo_service.waits import WaitEngine
+
+
+class FakeDriver:
+    def __init__(self, url):
+        self.current_url = url
+
+
+@pytest.fixture
+def bot():
+    """不启动浏览器的 WeiboBot，只保留逐步迭代用到的状态。"""
+    bot = WeiboBot.__new__(WeiboBot)
+    bot.gate = BrowserGate(limit=1)
+    bot.seleniumLock = BrowserLock(bot.gate, 1)
+    bot.online_state = 'on'
+    bot.bot = FakeDriver('https://weibo.com/hot')
+    bot.reopened = []
+    bot._tick_driver = lambda: None
+    bot._validate_session = lambda: None
+    return bot
+
+
+def scan(bot, count=3):
+    for i in range(count):
+        # 每一步都应在持有锁和全局名额时执行
+        assert bot.seleniumLock.locked()
+        assert bot.gate.stats()['in_use'] == 1
+        yield i
+
+
+def test_lock_released_between_steps(bot):
+    for item in bot._iter_locked(scan(bot), bot.reopened.append):
+        assert not bot.seleniumLock.locked()
+        assert bot.gate.stats()['in_use'] == 0
+
+
+def test_abandoned_iteration_does_not_hold_lock(bot):
+    items = bot._iter_locked(scan(bot), bot.reopened.append)
+    assert next(items) == 0
+    del items
+    with bot.seleniumLock:
+        pass
+
+
+def test_resumes_on_page_left_by_other_operation(bot):
+    items = bot._iter_locked(scan(bot), bot.reopened.append)
+    assert next(items) == 0
+
+    bot.bot.current_url = 'https://weibo.com/1/abc'
+    assert next(items) == 1
+    assert bot.reopened == ['https://weibo.com/hot']
+
+
+def test_logged_out_between_steps(bot):
+    items = bot._iter_locked(scan(bot), bot.reopened.append)
+    next(items)
+    bot.online_state = 'off'
+    with pytest.raises(Exception, match="未登录"):
+        next(items)
+    assert not bot.seleniumLock.locked()
+
+
+def test_iter_feed_weibos_steps_under_lock(bot, monkeypatch):
+    bot.transport = None
+    monkeypatch.setattr(bot, '_iter_feed', lambda url, step, max_num: scan(bot, max_num), raising=False)
+    weibos = []
+    for weibo in bot.iter_feed_weibos('hot', max_num=2):
+        assert not bot.seleniumLock.locked()
+        weibos.append(weibo)
+    assert weibos == [0, 1]
+
+
+def test_iter_comments_steps_under_lock(bot, monkeypatch):
+    bot.transport = None
+    opened = []
+    monkeypatch.setattr(bot, '_iter_comments', lambda max_num: scan(bot, max_num), raising=False)
+    monkeypatch.setattr(bot, '_open', lambda url, operation: opened.append(url), raising=False)
+    monkeypatch.setattr(bot, 'waits', type('Waits', (), {'page_ready': lambda self, *args: None})(), raising=False)
+
+    comments = []
+    for comment in bot.iter_comments(1, 'abc', max_num=3):
+        assert not bot.seleniumLock.locked()
+        comments.append(comment)
+    assert comments == [0, 1, 2]
+    assert opened == ['https://weibo.com/1/abc']
+
+
+class FakeElement:
+    def __init__(self, html):
+        self.html = html
+
+    def get_attribute(self, name):
+        return self.html
+
+
+def test_toggle_waits_for_button_state(bot, monkeypatch):
+    button = FakeElement('<button>关注</button>')
+    checks = []
+
+    def locate(driver):
+        # 第三次检查时按钮才变为已关注
+        checks.append(1)
+        if len(checks) == 3:
+            button.html = '<button>已关注</button>'
+        return button
+
+    bot.selectors = type('Selectors', (), {'locate': lambda self, name: locate})()
+    bot.waits = WaitEngine(budgets={'follow.submit': 2}, poll_frequency=0.01)
+    monkeypatch.setattr(bot.waits, 'page_ready', lambda driver, step: True)
+
+    bot._await_toggle('profile.follow_button', 'follow.submit', '<button>关注</button>')
+    assert len(checks) == 3
+
+
+def test_unconfirmed_click_times_out(bot):
+    button = FakeElement('<button>赞</button>')
+    bot.selectors = type('Selectors', (), {'locate': lambda self, name: lambda driver: button})()
+    bot.waits = WaitEngine(budgets={'like.submit': 0.1}, poll_frequency=0.01)
+
+    with pytest.raises(TimeoutException):
+        bot._await_toggle('like.button', 'like.submit', '<button>赞</button>')
+    assert bot.waits.stats()['like.submit']['timeouts'] == 1
+
+
+class Composer:
+    def __init__(self, value, displayed=True):
+        self.value = value
+        self.displayed = displayed
+
+    def is_displayed(self):
+        return self.displayed
+
+    def get_attribute(self, name):
+        return self.value
+
+
+class ComposerDriver:
+    """execute_script 按顺序返回编辑框的查找结果：[命中候选序号, 元素, readyState]。"""
+
+    def __init__(self, *composers):
+        self.composers = list(composers)
+
+    def execute_script(self, script, *args):
+        composer = self.composers.pop(0) if len(self.composers) > 1 else self.composers[0]
+        return [None, None, 'complete'] if composer is None else [0, composer, 'complete']
+
+
+@pytest.fixture
+def composer_bot(bot):
+    bot.selectors = type('Selectors', (), {'candidates': lambda self, name: []})()
+    bot.waits = WaitEngine(budgets={'repost.submit': 0.2}, poll_frequency=0.01)
+    return bot
+
+
+def test_repost_confirmed_when_composer_closes(composer_bot):
+    composer_bot.bot = ComposerDriver(Composer(''), Composer(''), None)
+    composer_bot._await_closed('repost.textarea', 'repost.submit')
+    assert composer_bot.waits.stats()['repost.submit']['timeouts'] == 0
+
+
+def test_empty_composer_is_not_a_confirmation(composer_bot):
+    # 没有输入内容时输入框本来就是空的，不能当作已经发出
+    composer_bot.bot = ComposerDriver(Composer(''))
+    with pytest.raises(TimeoutException):
+        composer_bot._await_closed('repost.textarea', 'repost.submit')
+
+    composer_bot.bot = ComposerDriver(Composer('转发理由'), Composer(''))
+    composer_bot._await_closed('repost.textarea', 'repost.submit', cleared=True)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from weibo_service.WeiboBots import WeiboBots
+from weibo_service.idempotency import ActionOutcomeUnknown
+from weibo_service.scheduler import BrowserLock
+
+
+class FakeBot:
+    """只实现 WeiboBots 用到的接口，不启动浏览器。"""
+
+    def __init__(self, bot_info, gate, release):
+        self.account_id = bot_info['account_id']
+        self.username = str(self.account_id)
+        self.seleniumLock = BrowserLock(gate, self.account_id)
+        self.release = release
+        self.full_scans = []
+
+    def get_weibo_info(self, account_id, weibo_id, max_num=10):
+        with self.seleniumLock:
+            self.release.wait(5)
+        return None
+
+    def update_fans_list(self, full=False):
+        self.full_scans.append(full)
+        return {'fans': ['a'], 'follows': [], 'unfollows': []}
+
+    def like(self, account_id, weibo_id):
+        # weibo_id 为 'clicked' 时模拟点击提交后没有等到生效确认
+        if weibo_id == 'clicked':
+            self.action_submitted = True
+        return None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def bots(db_path, monkeypatch):
+    monkeypatch.setenv('WEIBO_BOT_IDLE_TTL', '0')
+    # 每个账号的浏览器操作在对应的事件被设置前一直阻塞
+    bots = WeiboBots([{'account_id': i, 'online_state': 'off'} for i in (1, 2)])
+    bots.release = {1: threading.Event(), 2: threading.Event()}
+    bots._start_bot = lambda info: FakeBot(info, bots.browser_gate, bots.release[info['account_id']])
+    yield bots
+    for event in bots.release.values():
+        event.set()
+    bots.close()
+
+
+def test_submit_does_not_starve_other_accounts(bots):
+    slow = [bots.submit_feedback(1, 'w', max_age=0) for _ in range(20)]
+
+    # 账号 1 排队的请求不占用任何线程，账号 2 的请求立即执行
+    bots.release[2].set()
+    assert bots.submit_feedback(2, 'w', max_age=0).result(2) is None
+    assert not any(future.done() for future in slow)
+
+    bots.release[1].set()
+    assert bots.drain(1, timeout=10) == 0
+    assert all(future.result() is None for future in slow)
+
+
+def test_queued_request_can_be_cancelled(bots):
+    running = bots.submit_feedback(1, 'w', max_age=0)
+    queued = bots.submit_feedback(1, 'w', max_age=0)
+    assert queued.cancel()
+    bots.release[1].set()
+    assert running.result(5) is None
+
+
+def test_unknown_account(bots):
+    assert bots.get_state(99) is None
+    with pytest.raises(KeyError):
+        bots.submit_action({'agent_id': 99, 'type': 'like', 'object': '1/2'})
+
+
+def test_fans_feedback_runs_periodic_full_scan(bots):
+    bots.fans_full_scan_interval = 3600
+    full_scans = []
+    start_bot = bots._start_bot
+
+    def start(info):
+        bot = start_bot(info)
+        bot.full_scans = full_scans
+        return bot
+    bots._start_bot = start
+
+    assert bots.get_feedback(1)['fans_number'] == 1
+    bots.fan_store.record(1, {'a'}, True)
+    bots.get_feedback(1)
+    bots.get_feedback(1, full=True)
+    assert full_scans == [True, False, True]
+
+
+def like_action(weibo_id, key):
+    return {'agent_id': 1, 'type': 'like', 'object': f'2/{weibo_id}', 'action_content': None, 'idempotency_key': key}
+
+
+def test_failure_before_submit_releases_key(bots):
+    assert bots.update_state(like_action('w', 'k1')) is False
+    # 记录已删除，同一个键可以重试
+    assert bots.update_state(like_action('w', 'k1')) is False
+
+
+def test_failure_after_submit_marks_key_unknown(bots):
+    assert bots.update_state(like_action('clicked', 'k2')) is False
+    with pytest.raises(ActionOutcomeUnknown):
+        bots.update_state(like_action('clicked', 'k2'))
+
+
+def test_submit_record_raises_through_future(bots):
+    future = bots.submit_record('malformed')
+    with pytest.raises(ValueError):
+        future.result(2)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+from weibo_service.repository import browse_items
+from weibo_service.test.conftest import weibo_info
+from weibo_service.writer import WriteBehind
+
+
+def comments(repository):
+    return [row[0] for row in repository.query('SELECT content FROM WeiboComment ORDER BY position')]
+
+
+def test_write_batch_keeps_submission_order(repository):
+    # 同一批次中同一条微博抓取了两次：第二次的删除必须在第一次的写入之后执行
+    items = (
+        browse_items([weibo_info(comment=['评论一', '评论二', '评论三'])], '1', 1)
+        + browse_items([weibo_info(browse_time='2024-01-02 11:00:00', comment=['新评论'])], '2', 1)
+    )
+    repository.write_batch(items)
+    assert comments(repository) == ['新评论']
+
+
+class FlakyRepository:
+    """第一次写入抛出非数据库异常，其余照常写入。"""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.calls = 0
+
+    def write_batch(self, items):
+        self.calls += 1
+        if any(row == ('bad',) for _, row in items):
+            raise ValueError("无法写入")
+        self.repository.write_batch(items)
+
+
+def test_writer_survives_unexpected_errors(repository):
+    repository.write_batch([('CREATE TABLE IF NOT EXISTS WriterTest (value TEXT)', ())])
+    insert = 'INSERT INTO WriterTest (value) VALUES (?)'
+    writer = WriteBehind(FlakyRepository(repository), flush_interval=0.01)
+    try:
+        writer.submit([(insert, ('ok1',)), (insert, ('bad',)), (insert, ('ok2',))])
+        writer.flush()
+        writer.submit([(insert, ('ok3',))])
+        writer.flush()
+
+        assert writer._thread.is_alive()
+        values = [row[0] for row in repository.query('SELECT value FROM WriterTest ORDER BY rowid')]
+        assert values == ['ok1', 'ok2', 'ok3']
+        stats = writer.stats()
+        assert stats['failed'] == 1 and stats['errors'] == 2 and stats['written'] == 3
+    finally:
+        writer.close()
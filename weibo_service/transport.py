@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+只读操作的 HTTP 传输层：复用账号 cookie，通过连接池直接调用站点的 JSON 接口，
+失败时由 WeiboBot 回退到浏览器。写操作始终留在浏览器中完成。
+
+- 接口地址默认 https://weibo.com，可通过 WEIBO_HTTP_BASE_URL 或 bot_info['http_base_url']
+  指向本地夹具服务（见 test/fixture_server.py）。
+- 同一个 bot 的读取可能来自多个线程（例如多标签页抓取详情）：每个线程使用自己的 Session，
+  共享同一个连接池；请求头每次整体替换，不在其他线程使用时原地修改。
+"""
+import os
+import threading
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from weibo_service.driver_pool import USER_AGENT
+
+
+class TransportError(Exception):
+    pass
+
+
+class HttpTransport:
+    name = 'http'
+
+    def __init__(self, cookie, base_url=None, proxy=None, timeout=10, pool_size=10):
+        self.base_url = (base_url or os.getenv("WEIBO_HTTP_BASE_URL") or "https://weibo.com").rstrip("/")
+        self.timeout = timeout
+        self.proxies = {'http': f'http://{proxy}', 'https': f'http://{proxy}'} if proxy is not None else None
+
+        # urllib3 的连接池是线程安全的，由各线程的 Session 共享
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._local = threading.local()
+        self.headers = {}
+        self.set_cookie(cookie)
+
+    @property
+    def session(self):
+        """当前线程的 Session。"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+            if self.proxies is not None:
+                session.proxies = dict(self.proxies)
+            self._local.session = session
+        return session
+
+    def set_cookie(self, cookie):
+        cookies = dict(item.split('=', 1) for item in cookie.split('; ') if '=' in item)
+        self.headers = {
+            'User-Agent': USER_AGENT,
+            'Accept': 'application/json, text/plain, */*',
+            'Referer': self.base_url + '/',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Cookie': cookie,
+            'X-XSRF-TOKEN': cookies.get('XSRF-TOKEN', ''),
+        }
+
+    def _get(self, path, params=None):
+        response = self.session.get(
+            self.base_url + path, params=params, headers=self.headers, timeout=self.timeout
+        )
+        response.raise_for_status()
+        try:
+            data = response.json()
+        except ValueError:
+            raise TransportError(f"{path} 返回的不是 JSON，可能需要重新登录")
+        if not isinstance(data, dict) or data.get('ok') not in (1, True):
+            raise TransportError(f"{path} 返回异常: {str(data)[:200]}")
+        return data
+
+    def get_weibo_info(self, account_id, weibo_id, max_num=10):
+        status = self._get('/ajax/statuses/show', {'id': weibo_id})
+
+        text = status.get('text_raw', '')
+        if status.get('isLongText'):
+            long_text = self._get('/ajax/statuses/longtext', {'id': weibo_id}).get('data') or {}
+            text = long_text.get('longTextContent') or text
+
+        comments = self._comments(account_id, weibo_id, status, max_num)
+
+        pic_infos = status.get('pic_infos') or {}
+        imgs = [pic_infos[pid]['large']['url'] for pid in status.get('pic_ids', []) if pid in pic_infos]
+
+        page_url = (status.get('page_info') or {}).get('page_url', '')
+        video = page_url if 'video' in page_url else ''
+
+        created_at = datetime.strptime(status['created_at'], "%a %b %d %H:%M:%S %z %Y")
+        user = status.get('user') or {}
+
+        return {
+            "account_id": account_id,
+            "weibo_id": weibo_id,
+
+            "username": user.get('screen_name', ''),
+            "user_tag": user.get('verified_reason', ''),
+            "time": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+
+            "text": text,
+            "imgs": imgs,
+            "video": video,
+
+            "repost_num": str(status.get('reposts_count', 0)),
+            "comment_num": str(status.get('comments_count', 0)),
+            "comment": comments,
+            "like_num": str(status.get('attitudes_count', 0)),
+
+            "browse_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _comments(self, account_id, weibo_id, status, max_num):
+        if max_num <= 0 or not status.get('comments_count'):
+            return []
+        data = self._get('/ajax/statuses/buildComments', {
+            'id': status.get('id', weibo_id),
+            'uid': account_id,
+            'is_show_bulletin': 2,
+            'flow': 0,
+            'is_reload': 1,
+            'count': max_num,
+        })
+        return [item.get('text_raw', '') for item in data.get('data', [])][:max_num]
+
+    def get_comments(self, account_id, weibo_id, max_num=10):
+        """微博的前 max_num 条评论；评论接口需要数字 id，先读取微博本身。"""
+        status = self._get('/ajax/statuses/show', {'id': weibo_id})
+        return self._comments(account_id, weibo_id, status, max_num)
+
+    def iter_feed(self, feed, max_num=10):
+        """逐个产出信息流中的 (account_id, weibo_id)；feed 为 'hot' 或 'homepage'。"""
+        if feed == 'hot':
+            path = '/ajax/feed/hottimeline'
+            params = {'since_id': 0, 'refresh': 0, 'group_id': '102803', 'containerid': '102803',
+                      'extparam': 'discover|new_feed', 'max_id': 0, 'count': 10}
+        else:
+            path = '/ajax/feed/unreadfriendstimeline'
+            params = {'list_id': '', 'refresh': 4, 'since_id': 0, 'max_id': 0, 'count': 10}
+
+        seen = set()
+        while True:
+            data = self._get(path, params)
+            new_items = 0
+            for status in data.get('statuses', []):
+                user = status.get('user') or {}
+                weibo = (str(user.get('idstr') or user.get('id')), status.get('mblogid'))
+                if weibo in seen or not weibo[1]:
+                    continue
+                seen.add(weibo)
+                new_items += 1
+                yield weibo
+
+                if len(seen) == max_num:
+                    return
+
+            max_id = data.get('max_id')
+            if new_items == 0 or not max_id:
+                return
+            params['max_id'] = max_id
+
+    def scan_fans(self, account_id, known=None):
+        """与 WeiboBot._scan_fans 语义相同：返回 (粉丝集合, 是否读到了列表末尾)。"""
+        scanned = set()
+        page = 1
+        while True:
+            data = self._get('/ajax/friendships/friends', {
+                'relate': 'fans', 'page': page, 'uid': account_id, 'type': 'fans', 'newFollowerCount': 0,
+            })
+            users = data.get('users', [])
+            if not users:
+                return scanned, True
+
+            for user in users:
+                fan = str(user.get('idstr') or user.get('id'))
+                if known and fan in known:
+                    return scanned, False
+                scanned.add(fan)
+            page += 1
+
+
+TRANSPORTS = {
+    'http': HttpTransport,
+}
+
+
+def build_transport(name, cookie, **kwargs):
+    """按名称创建读传输层；'selenium' 或 None 表示只使用浏览器。"""
+    if name in (None, 'selenium'):
+        return None
+    try:
+        transport = TRANSPORTS[name]
+    except KeyError:
+        raise ValueError(f"未知的传输层: {name}")
+    return transport(cookie, **kwargs)
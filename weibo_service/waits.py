@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+等待引擎：用 DOM / 网络空闲条件替代固定 sleep，并记录每个步骤实际等待的时长。
+
+- 每个步骤有独立的超时预算，可通过 budgets 参数覆盖。
+- WEIBO_WAIT_JITTER="最小秒数,最大秒数" 可开启随机的拟人化最短耗时。
+"""
+import os
+import random
+import threading
+from collections import defaultdict, deque
+from time import perf_counter, sleep
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+DEFAULT_BUDGET = 20
+DEFAULT_BUDGETS = {
+    'login.refresh': 30,
+    'login.username': 50,
+    'login.validate': 30,
+    'post.submit': 30,
+    'post.idle': 10,
+    'like.submit': 20,
+    'like.idle': 10,
+    'follow.submit': 20,
+    'follow.idle': 10,
+    'unfollow.submit': 20,
+    'unfollow.idle': 10,
+    'repost.button': 20,
+    'repost.submit': 30,
+    'repost.idle': 10,
+    'comment.button': 20,
+    'comment.submit': 30,
+    'comment.idle': 10,
+    'detail.extract': 50,
+    'detail.tab': 50,
+    'comment.load': 30,
+    'comment.scroll': 5,
+    'hot.load': 30,
+    'homepage.load': 30,
+    'feed.scroll': 5,
+    'fans.scroll': 5,
+}
+
+
+def js_condition(script, *args):
+    """返回一个执行 JS 并以其结果作为判定的等待条件。"""
+    return lambda driver: driver.execute_script(script, *args)
+
+
+def document_ready():
+    return js_condition("return document.readyState === 'complete';")
+
+
+def scroll_height_grows(previous):
+    return js_condition("return document.documentElement.scrollHeight > arguments[0];", previous)
+
+
+# 跳转前给旧文档打上标记，新文档生效后标记自然消失，避免在旧页面上误判加载完成
+STALE_SCRIPT = "window.__weiboStale = true;"
+
+READY_STATES = {
+    'none': ['loading', 'interactive', 'complete'],
+    'eager': ['interactive', 'complete'],
+    'normal': ['complete'],
+}
+
+
+def page_loaded(strategy):
+    """新文档已生效，且 readyState 达到页面加载策略要求的阶段。"""
+    return js_condition(
+        "return !window.__weiboStale && arguments[0].indexOf(document.readyState) >= 0;",
+        READY_STATES[strategy]
+    )
+
+
+class network_idle:
+    """页面加载完成且资源请求数在 idle_time 秒内不再增加时成立。"""
+
+    SCRIPT = """
+        if (window.__weiboStale) return [null, 0];
+        return [document.readyState, performance.getEntriesByType('resource').length];
+    """
+
+    def __init__(self, idle_time=0.5):
+        self.idle_time = idle_time
+        self.last_count = None
+        self.last_change = perf_counter()
+
+    def __call__(self, driver):
+        ready_state, count = driver.execute_script(self.SCRIPT)
+        if ready_state is None:
+            return False
+        now = perf_counter()
+        if count != self.last_count:
+            self.last_count = count
+            self.last_change = now
+            return False
+        return ready_state == 'complete' and now - self.last_change >= self.idle_time
+
+
+class WaitEngine:
+    def __init__(self, budgets=None, jitter=None, poll_frequency=0.2, idle_time=0.5, history=200):
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+
+        if jitter is None and os.getenv("WEIBO_WAIT_JITTER"):
+            jitter = tuple(float(x) for x in os.getenv("WEIBO_WAIT_JITTER").split(","))
+        self.jitter = jitter
+
+        self.poll_frequency = poll_frequency
+        self.idle_time = idle_time
+
+        self._records = defaultdict(lambda: deque(maxlen=history))
+        self._timeouts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def budget(self, step):
+        return self.budgets.get(step, DEFAULT_BUDGET)
+
+    def until(self, driver, step, condition, timeout=None, message=''):
+        """等待条件成立，超时抛出 TimeoutException；无论成败都记录耗时。"""
+        start = perf_counter()
+        try:
+            result = WebDriverWait(
+                driver,
+                timeout if timeout is not None else self.budget(step),
+                poll_frequency=self.poll_frequency,
+            ).until(condition, message)
+        except TimeoutException:
+            self.record(step, perf_counter() - start, timed_out=True)
+            raise
+
+        self._jitter_floor(start)
+        self.record(step, perf_counter() - start)
+        return result
+
+    def try_until(self, driver, step, condition, timeout=None):
+        """与 until 相同，但超时返回 False 而不是抛出异常。"""
+        try:
+            return self.until(driver, step, condition, timeout)
+        except TimeoutException:
+            return False
+
+    def page_ready(self, driver, step, timeout=None):
+        """等待页面加载完成且网络空闲；超出预算时不报错，由后续的元素等待兜底。"""
+        return self.try_until(driver, step, network_idle(self.idle_time), timeout)
+
+    def _jitter_floor(self, start):
+        if not self.jitter:
+            return
+        remaining = random.uniform(*self.jitter) - (perf_counter() - start)
+        if remaining > 0:
+            sleep(remaining)
+
+    def record(self, step, elapsed, timed_out=False):
+        with self._lock:
+            self._records[step].append(elapsed)
+            if timed_out:
+                self._timeouts[step] += 1
+
+    def stats(self):
+        """按步骤汇总实际等待时长（秒），并给出建议的超时预算。"""
+        with self._lock:
+            records = {step: sorted(values) for step, values in self._records.items()}
+            timeouts = dict(self._timeouts)
+
+        stats = {}
+        for step, values in records.items():
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            stats[step] = {
+                'count': len(values),
+                'mean': round(sum(values) / len(values), 3),
+                'p95': round(p95, 3),
+                'max': round(values[-1], 3),
+                'timeouts': timeouts.get(step, 0),
+                'budget': self.budget(step),
+                'suggested_budget': round(max(p95 * 1.5, 1.0), 1),
+            }
+        return stats
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+异步批量写入：调用方把待写入的记录放进有界队列后立即返回，由后台线程按批次提交。
+
+- 队列长度 WEIBO_WRITE_QUEUE（默认 10000），队列满时调用方阻塞等待，形成背压。
+- 累计 WEIBO_WRITE_BATCH 条（默认 200）或距批次第一条超过 WEIBO_WRITE_INTERVAL 秒（默认 0.5）时提交，
+  一个批次在一个事务中按提交顺序执行，连续的相同语句合并为一次 executemany。
+- 写入出错（包括非数据库异常）时逐条重试并计入 failed，写入线程不会因此退出。
+- 进程退出时自动 flush；stats() 返回队列深度、阻塞次数、批次大小和提交耗时等指标。
+"""
+import atexit
+import os
+import queue
+import threading
+from time import perf_counter
+
+from weibo_service.repository import get_repository
+
+_STOP = object()
+
+
+class WriteBehind:
+    def __init__(self, repository=None, max_queue=None, batch_size=None, flush_interval=None):
+        self.repository = repository if repository is not None else get_repository()
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("WEIBO_WRITE_QUEUE", "10000"))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv("WEIBO_WRITE_BATCH", "200"))
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else float(os.getenv("WEIBO_WRITE_INTERVAL", "0.5"))
+        )
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._metrics = {
+            'enqueued': 0,
+            'written': 0,
+            'failed': 0,
+            'errors': 0,
+            'batches': 0,
+            'blocked_puts': 0,
+            'blocked_seconds': 0.0,
+            'last_batch_size': 0,
+            'commit_seconds': 0.0,
+            'max_depth': 0,
+        }
+
+        self._thread = threading.Thread(target=self._run, name="weibo-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, items):
+        """提交 [(sql, 参数), ...]；写入线程已停止时在当前线程同步写入。"""
+        if not items:
+            return
+        if self._closed:
+            self._write(list(items))
+            return
+
+        for item in items:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                start = perf_counter()
+                self._queue.put(item)
+                with self._lock:
+                    self._metrics['blocked_puts'] += 1
+                    self._metrics['blocked_seconds'] += perf_counter() - start
+
+        with self._lock:
+            self._metrics['enqueued'] += len(items)
+            self._metrics['max_depth'] = max(self._metrics['max_depth'], self._queue.qsize())
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            deadline = perf_counter() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in range(len(batch) + int(stop)):
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        start = perf_counter()
+        failed = errors = 0
+        try:
+            self.repository.write_batch(batch)
+        except Exception as e:
+            # 整批失败时逐条重试，只丢弃真正写不进去的记录；任何异常都不能让写入线程退出
+            print("写入发生错误:", e)
+            errors += 1
+            for item in batch:
+                try:
+                    self.repository.write_batch([item])
+                except Exception as e:
+                    print("写入发生错误:", e)
+                    errors += 1
+                    failed += 1
+
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['written'] += len(batch) - failed
+            self._metrics['failed'] += failed
+            self._metrics['errors'] += errors
+            self._metrics['last_batch_size'] = len(batch)
+            self._metrics['commit_seconds'] += perf_counter() - start
+
+    def flush(self):
+        """阻塞到目前已提交的记录全部写入。"""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        batches = metrics['batches']
+        metrics.update({
+            'depth': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            'mean_batch_size': round(metrics['written'] / batches, 1) if batches else 0,
+            'mean_commit_ms': round(metrics.pop('commit_seconds') * 1000 / batches, 2) if batches else 0,
+            'blocked_seconds': round(metrics['blocked_seconds'], 3),
+        })
+        return metrics
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """进程内共享的写入线程，第一次使用时启动，退出时自动 flush。"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehind()
+            atexit.register(_writer.close)
+        return _writer